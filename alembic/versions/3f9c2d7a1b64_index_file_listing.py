@@ -0,0 +1,45 @@
+"""index file listing
+
+Revision ID: 3f9c2d7a1b64
+Revises: cbc3c8fcf365
+Create Date: 2026-10-18 16:42:37.218394
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7a1b64'
+down_revision: Union[str, None] = 'cbc3c8fcf365'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_file_metadata_created_at_id', 'file_metadata', ['created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_file_metadata_content_type_created_at_id', 'file_metadata',
+        ['content_type', 'created_at', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_file_metadata_upload_state_created_at_id', 'file_metadata',
+        ['upload_state', 'created_at', 'id'], unique=False
+    )
+    op.drop_index('ix_file_metadata_original_name', table_name='file_metadata')
+    op.create_index(
+        'ix_file_metadata_original_name', 'file_metadata', ['original_name'], unique=False,
+        postgresql_ops={'original_name': 'varchar_pattern_ops'}
+    )
+    op.drop_index('ix_file_metadata_id', table_name='file_metadata')
+
+
+def downgrade() -> None:
+    op.create_index('ix_file_metadata_id', 'file_metadata', ['id'], unique=False)
+    op.drop_index('ix_file_metadata_original_name', table_name='file_metadata')
+    op.create_index('ix_file_metadata_original_name', 'file_metadata', ['original_name'], unique=False)
+    op.drop_index('ix_file_metadata_upload_state_created_at_id', table_name='file_metadata')
+    op.drop_index('ix_file_metadata_content_type_created_at_id', table_name='file_metadata')
+    op.drop_index('ix_file_metadata_created_at_id', table_name='file_metadata')
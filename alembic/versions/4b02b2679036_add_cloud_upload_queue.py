@@ -0,0 +1,41 @@
+"""add cloud upload queue
+
+Revision ID: 4b02b2679036
+Revises: 6a57c574611b
+Create Date: 2026-10-18 11:14:52.207133
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b02b2679036'
+down_revision: Union[str, None] = '6a57c574611b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('upload_state', sa.String(length=16), server_default='pending', nullable=False))
+    op.add_column('file_metadata', sa.Column('upload_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('file_metadata', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.add_column('file_metadata', sa.Column('upload_error', sa.String(), nullable=True))
+    op.create_index('ix_file_metadata_upload_queue', 'file_metadata', ['upload_state', 'next_attempt_at'], unique=False)
+
+    # Уже загруженные файлы считаем выполненными, остальные ставим в очередь.
+    op.execute("UPDATE file_metadata SET upload_state = 'done' WHERE storage_url IS NOT NULL")
+    op.execute(
+        "UPDATE file_metadata SET next_attempt_at = CURRENT_TIMESTAMP "
+        "WHERE storage_url IS NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_metadata_upload_queue', table_name='file_metadata')
+    op.drop_column('file_metadata', 'upload_error')
+    op.drop_column('file_metadata', 'next_attempt_at')
+    op.drop_column('file_metadata', 'upload_attempts')
+    op.drop_column('file_metadata', 'upload_state')
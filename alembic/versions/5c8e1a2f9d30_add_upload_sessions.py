@@ -0,0 +1,40 @@
+"""add upload sessions
+
+Revision ID: 5c8e1a2f9d30
+Revises: 9b1e6f0c4d27
+Create Date: 2026-10-18 18:03:12.557014
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e1a2f9d30'
+down_revision: Union[str, None] = '9b1e6f0c4d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('upload_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uid', sa.String(), nullable=False),
+    sa.Column('original_name', sa.String(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('length', sa.BigInteger(), nullable=False),
+    sa.Column('offset', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_sessions_uid'), 'upload_sessions', ['uid'], unique=True)
+    op.create_index('ix_upload_sessions_updated_at', 'upload_sessions', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_upload_sessions_updated_at', table_name='upload_sessions')
+    op.drop_index(op.f('ix_upload_sessions_uid'), table_name='upload_sessions')
+    op.drop_table('upload_sessions')
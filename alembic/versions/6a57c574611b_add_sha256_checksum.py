@@ -0,0 +1,26 @@
+"""add sha256 checksum
+
+Revision ID: 6a57c574611b
+Revises: 7523ddf8f14c
+Create Date: 2026-10-18 10:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a57c574611b'
+down_revision: Union[str, None] = '7523ddf8f14c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file_metadata', 'sha256')
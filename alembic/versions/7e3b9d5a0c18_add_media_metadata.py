@@ -0,0 +1,36 @@
+"""add media metadata
+
+Revision ID: 7e3b9d5a0c18
+Revises: 5c8e1a2f9d30
+Create Date: 2026-10-18 19:02:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e3b9d5a0c18'
+down_revision: Union[str, None] = '5c8e1a2f9d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('detected_type', sa.String(length=255), nullable=True))
+    op.add_column('file_metadata', sa.Column('media_info', sa.JSON(), nullable=True))
+    op.add_column('file_metadata', sa.Column('media_state', sa.String(length=16), nullable=True))
+    op.add_column('file_metadata', sa.Column('media_checked_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_file_metadata_media_queue', 'file_metadata', ['media_state', 'media_checked_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_metadata_media_queue', table_name='file_metadata')
+    op.drop_column('file_metadata', 'media_checked_at')
+    op.drop_column('file_metadata', 'media_state')
+    op.drop_column('file_metadata', 'media_info')
+    op.drop_column('file_metadata', 'detected_type')
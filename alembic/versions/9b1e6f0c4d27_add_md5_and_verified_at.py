@@ -0,0 +1,30 @@
+"""add md5 and verified_at
+
+Revision ID: 9b1e6f0c4d27
+Revises: 3f9c2d7a1b64
+Create Date: 2026-10-18 17:26:51.904127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1e6f0c4d27'
+down_revision: Union[str, None] = '3f9c2d7a1b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('md5', sa.String(length=32), nullable=True))
+    op.add_column('file_metadata', sa.Column('verified_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_file_metadata_verified_at', 'file_metadata', ['verified_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_metadata_verified_at', table_name='file_metadata')
+    op.drop_column('file_metadata', 'verified_at')
+    op.drop_column('file_metadata', 'md5')
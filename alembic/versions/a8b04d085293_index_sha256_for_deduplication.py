@@ -0,0 +1,26 @@
+"""index sha256 for deduplication
+
+Revision ID: a8b04d085293
+Revises: d08155c9ad5c
+Create Date: 2026-10-18 13:21:40.781220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8b04d085293'
+down_revision: Union[str, None] = 'd08155c9ad5c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_file_metadata_sha256', 'file_metadata', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_metadata_sha256', table_name='file_metadata')
@@ -0,0 +1,28 @@
+"""add stored size
+
+Revision ID: b6d2e8f1a947
+Revises: f2a7c9e4b615
+Create Date: 2026-10-19 11:02:15.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2e8f1a947'
+down_revision: Union[str, None] = 'f2a7c9e4b615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('stored_size', sa.BigInteger(), nullable=True))
+    # Несжатый блоб занимает столько же, сколько исходное содержимое.
+    op.execute("UPDATE file_metadata SET stored_size = size WHERE content_encoding IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('file_metadata', 'stored_size')
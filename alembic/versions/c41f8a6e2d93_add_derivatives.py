@@ -0,0 +1,40 @@
+"""add derivatives
+
+Revision ID: c41f8a6e2d93
+Revises: 7e3b9d5a0c18
+Create Date: 2026-10-18 20:14:05.730918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8a6e2d93'
+down_revision: Union[str, None] = '7e3b9d5a0c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('derivatives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('storage_url', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('source', 'kind', 'width', name='uq_derivatives_source_kind_width')
+    )
+    op.create_index('ix_derivatives_storage_url', 'derivatives', ['storage_url'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_derivatives_storage_url', table_name='derivatives')
+    op.drop_table('derivatives')
@@ -0,0 +1,28 @@
+"""add local cache tracking
+
+Revision ID: cbc3c8fcf365
+Revises: e5e5b59b5eec
+Create Date: 2026-10-18 14:48:02.335718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cbc3c8fcf365'
+down_revision: Union[str, None] = 'e5e5b59b5eec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('is_local', sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.add_column('file_metadata', sa.Column('last_accessed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file_metadata', 'last_accessed_at')
+    op.drop_column('file_metadata', 'is_local')
@@ -0,0 +1,28 @@
+"""add multipart upload id
+
+Revision ID: d08155c9ad5c
+Revises: 4b02b2679036
+Create Date: 2026-10-18 12:03:27.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd08155c9ad5c'
+down_revision: Union[str, None] = '4b02b2679036'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('multipart_upload_id', sa.String(), nullable=True))
+    op.alter_column('file_metadata', 'size', type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('file_metadata', 'size', type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=True)
+    op.drop_column('file_metadata', 'multipart_upload_id')
@@ -0,0 +1,28 @@
+"""index path and storage_url
+
+Revision ID: e5e5b59b5eec
+Revises: a8b04d085293
+Create Date: 2026-10-18 14:05:13.604871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5e5b59b5eec'
+down_revision: Union[str, None] = 'a8b04d085293'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_file_metadata_path', 'file_metadata', ['path'], unique=False)
+    op.create_index('ix_file_metadata_storage_url', 'file_metadata', ['storage_url'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_metadata_storage_url', table_name='file_metadata')
+    op.drop_index('ix_file_metadata_path', table_name='file_metadata')
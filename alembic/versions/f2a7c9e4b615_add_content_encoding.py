@@ -0,0 +1,26 @@
+"""add content encoding
+
+Revision ID: f2a7c9e4b615
+Revises: c41f8a6e2d93
+Create Date: 2026-10-18 22:41:37.204583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c9e4b615'
+down_revision: Union[str, None] = 'c41f8a6e2d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file_metadata', sa.Column('content_encoding', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file_metadata', 'content_encoding')
@@ -0,0 +1,312 @@
+import math
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Iterable, Tuple
+
+from fastapi.responses import JSONResponse
+
+from app.metrics import upload_rejections
+from app.configs import (
+    LOCAL_STORAGE_PATH,
+    UPLOAD_MAX_IN_FLIGHT,
+    UPLOAD_MAX_BYTES_IN_FLIGHT,
+    UPLOAD_MIN_FREE_BYTES,
+    UPLOAD_CLIENT_RATE,
+    UPLOAD_CLIENT_BURST,
+    UPLOAD_RETRY_AFTER,
+    UPLOAD_UNKNOWN_SIZE,
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Загрузка не принята: сервис перегружен или клиент превысил свой лимит.
+
+    :ivar status_code: HTTP-статус ответа (429 или 503).
+    :ivar reason: Причина отказа для метрик.
+    :ivar detail: Сообщение для клиента.
+    :ivar retry_after: Через сколько секунд стоит повторить запрос.
+    """
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity.
+
+    :ivar tokens: Оставшиеся токены.
+    :ivar updated_at: Время последнего пополнения.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = now
+
+    def take(self, now: float) -> float:
+        """
+        Забирает один токен.
+
+        :param now: Текущее время по time.monotonic.
+        :type now: float
+        :return: 0, если токен взят, иначе через сколько секунд он появится.
+        :rtype: float
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Решает, принимать ли загрузку, до того как прочитано её тело.
+
+    Загрузка отклоняется с 503, если уже идёт max_uploads загрузок, если
+    вместе с ней байтов в пути станет больше max_bytes или если после неё
+    свободного места на диске останется меньше min_free_bytes. Клиент,
+    исчерпавший свою корзину токенов, получает 429. Корзина проверяется
+    последней, чтобы отказ из-за перегрузки не тратил токены клиента.
+    Нулевой лимит выключает соответствующую проверку.
+
+    Работает только из event loop, поэтому обходится без блокировок.
+    Свободное место на диске перечитывается не чаще раза в disk_check_interval секунд.
+    Загрузка без Content-Length допускается с резервом unknown_size байтов,
+    который растёт (grow) по мере чтения тела.
+
+    :ivar uploads: Загрузок в пути.
+    :ivar bytes: Заявленных и прочитанных сверх заявленного байтов в пути.
+    :ivar buckets: Корзины токенов клиентов, LRU на max_clients записей.
+    :ivar clock: Источник времени.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_uploads: int = 0,
+        max_bytes: int = 0,
+        min_free_bytes: int = 0,
+        client_rate: float = 0,
+        client_burst: int = 1,
+        retry_after: int = 5,
+        max_clients: int = 10000,
+        disk_check_interval: float = 1.0,
+        unknown_size: int = 0
+    ):
+        self.path = path
+        self.max_uploads = max_uploads
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.client_rate = client_rate
+        self.client_burst = max(1, client_burst)
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        self.disk_check_interval = disk_check_interval
+        self.unknown_size = unknown_size
+        self.uploads = 0
+        self.bytes = 0
+        self.buckets: OrderedDict = OrderedDict()
+        self.clock = time.monotonic
+        self.free_bytes = 0
+        self.free_checked_at = -math.inf
+
+    def free_space(self, now: float) -> int:
+        """
+        Возвращает свободное место на диске хранилища.
+
+        :param now: Текущее время.
+        :type now: float
+        :return: Свободные байты.
+        :rtype: int
+        """
+        if now - self.free_checked_at >= self.disk_check_interval:
+            path = os.path.abspath(self.path)
+            while not os.path.exists(path):
+                path = os.path.dirname(path)
+            self.free_bytes = shutil.disk_usage(path).free
+            self.free_checked_at = now
+        return self.free_bytes
+
+    def take_client_token(self, client: str, now: float) -> float:
+        """
+        Забирает токен из корзины клиента.
+
+        :param client: Ключ клиента.
+        :type client: str
+        :param now: Текущее время.
+        :type now: float
+        :return: 0 или через сколько секунд появится токен.
+        :rtype: float
+        """
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+        return bucket.take(now)
+
+    def admit(self, client: str, size: int) -> None:
+        """
+        Принимает загрузку или отклоняет её.
+
+        Принятая загрузка должна быть отпущена вызовом release с тем же размером.
+
+        :param client: Ключ клиента для корзины токенов.
+        :type client: str
+        :param size: Заявленный размер тела запроса (0, если неизвестен).
+        :type size: int
+        :return: None
+        :rtype: None
+        :raises AdmissionRejected: Если загрузку нужно отклонить.
+        """
+        now = self.clock()
+        if self.max_uploads and self.uploads >= self.max_uploads:
+            raise AdmissionRejected(503, "uploads", "Too many uploads in progress", self.retry_after)
+        # Одна загрузка больше лимита всё же пройдёт, если кроме неё ничего нет.
+        if self.max_bytes and self.bytes and self.bytes + size > self.max_bytes:
+            raise AdmissionRejected(503, "bytes", "Too many bytes in flight", self.retry_after)
+        if self.min_free_bytes and self.free_space(now) - self.bytes - size < self.min_free_bytes:
+            raise AdmissionRejected(503, "disk", "Not enough free disk space", self.retry_after)
+        if self.client_rate:
+            wait = self.take_client_token(client, now)
+            if wait:
+                raise AdmissionRejected(429, "client_rate", "Upload rate limit exceeded", math.ceil(wait))
+        self.uploads += 1
+        self.bytes += size
+
+    def grow(self, size: int) -> None:
+        """
+        Увеличивает резерв принятой загрузки, тело которой оказалось больше заявленного.
+
+        Загрузка уже идёт, поэтому лимиты не проверяются: больший резерв
+        отклонит следующие загрузки.
+
+        :param size: На сколько байтов увеличить резерв.
+        :type size: int
+        :return: None
+        :rtype: None
+        """
+        self.bytes += size
+
+    def release(self, size: int) -> None:
+        """
+        Отпускает принятую загрузку.
+
+        :param size: Размер, с которым загрузка была принята.
+        :type size: int
+        :return: None
+        :rtype: None
+        """
+        self.uploads -= 1
+        self.bytes -= size
+
+    def stats(self) -> dict:
+        """
+        Возвращает загрузки и байты в пути.
+
+        :return: Счётчики.
+        :rtype: dict
+        """
+        return {"uploads": self.uploads, "bytes": self.bytes}
+
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware, которое пропускает загрузки через AdmissionController.
+
+    Проверка делается до чтения тела, так что отказ быстрый и не занимает
+    ни диск, ни память. Ключ клиента — заголовок X-API-Key, а без него
+    адрес клиента; ключи не проверяются, их подлинность должен обеспечить
+    стоящий перед сервисом прокси. Размер берётся из Content-Length, а для
+    потоковых загрузок без него (chunked /files/stream, PATCH без длины)
+    резервируется controller.unknown_size. Прочитанные байты считаются через
+    обёртку receive, и если тело больше резерва, резерв растёт вместе с ним.
+
+    :ivar app: Оборачиваемое ASGI-приложение.
+    :ivar controller: Контроллер допуска.
+    :ivar routes: Пары (метод, путь) загрузок; путь, оканчивающийся на /, — префикс.
+    """
+
+    def __init__(self, app, controller: AdmissionController, routes: Iterable[Tuple[str, str]]):
+        self.app = app
+        self.controller = controller
+        self.routes = tuple(routes)
+
+    def is_upload(self, scope) -> bool:
+        for method, path in self.routes:
+            if scope["method"] == method and (
+                scope["path"] == path or (path.endswith("/") and scope["path"].startswith(path))
+            ):
+                return True
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.is_upload(scope):
+            await self.app(scope, receive, send)
+            return
+
+        client, size = None, None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                client = "key:" + value.decode("latin-1")
+            elif name == b"content-length" and value.isdigit():
+                size = int(value)
+        if size is None:
+            size = self.controller.unknown_size
+        if client is None:
+            client = "addr:" + (scope["client"][0] if scope.get("client") else "-")
+
+        try:
+            self.controller.admit(client, size)
+        except AdmissionRejected as e:
+            upload_rejections.labels(e.reason).inc()
+            response = JSONResponse(
+                {"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        reserved = size
+        received = 0
+
+        async def counting_receive():
+            nonlocal reserved, received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > reserved:
+                    self.controller.grow(received - reserved)
+                    reserved = received
+            return message
+
+        try:
+            await self.app(scope, counting_receive, send)
+        finally:
+            self.controller.release(reserved)
+
+
+upload_admission = AdmissionController(
+    LOCAL_STORAGE_PATH,
+    max_uploads=UPLOAD_MAX_IN_FLIGHT,
+    max_bytes=UPLOAD_MAX_BYTES_IN_FLIGHT,
+    min_free_bytes=UPLOAD_MIN_FREE_BYTES,
+    client_rate=UPLOAD_CLIENT_RATE,
+    client_burst=UPLOAD_CLIENT_BURST,
+    retry_after=UPLOAD_RETRY_AFTER,
+    unknown_size=UPLOAD_UNKNOWN_SIZE
+)
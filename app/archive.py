@@ -0,0 +1,189 @@
+import os
+import tarfile
+import zipfile
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Iterable, Iterator, List, NamedTuple
+
+
+ARCHIVE_MEDIA_TYPES = {"zip": "application/zip", "tar": "application/x-tar"}
+
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+TAR_RECORD_SIZE = tarfile.RECORDSIZE
+
+
+class ArchiveEntry(NamedTuple):
+    """
+    Файл, который нужно положить в архив.
+
+    Атрибуты:
+        name: Имя файла внутри архива.
+        size: Размер файла в байтах.
+        modified_at: Время изменения файла (UTC).
+        open: Функция, открывающая содержимое на чтение.
+    """
+    name: str
+    size: int
+    modified_at: datetime
+    open: Callable[[], BinaryIO]
+
+
+class ArchiveBuffer:
+    """
+    Несдвигаемый поток, в который пишет архиватор; записанное забирает генератор ответа.
+
+    Отсутствие seek заставляет zipfile писать размеры файлов после их
+    содержимого (data descriptor), так что архив не нужно перематывать.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def archive_names(names: Iterable[str]) -> List[str]:
+    """
+    Превращает оригинальные имена файлов в уникальные имена внутри архива.
+
+    Каталоги из имени отбрасываются, совпадающие имена получают суффикс
+    « (2)», « (3)» и так далее перед расширением.
+
+    :param names: Оригинальные имена файлов.
+    :type names: Iterable[str]
+    :return: Имена в том же порядке.
+    :rtype: List[str]
+    """
+    used = set()
+    result = []
+    for name in names:
+        name = os.path.basename((name or "").replace("\\", "/")) or "file"
+        stem, extension = os.path.splitext(name)
+        candidate, number = name, 1
+        while candidate in used:
+            number += 1
+            candidate = f"{stem} ({number}){extension}"
+        used.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def iter_entry(entry: ArchiveEntry, chunk_size: int) -> Iterator[bytes]:
+    """
+    Читает содержимое файла чанками, проверяя, что размер совпал с заявленным.
+
+    :param entry: Файл архива.
+    :type entry: ArchiveEntry
+    :param chunk_size: Размер чанка.
+    :type chunk_size: int
+    :return: Итератор чанков.
+    :rtype: Iterator[bytes]
+    :raises OSError: Если размер содержимого отличается от entry.size.
+    """
+    remaining = entry.size
+    with closing(entry.open()) as source:
+        while True:
+            chunk = source.read(min(chunk_size, remaining) if remaining > 0 else 1)
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if remaining < 0:
+                break
+            yield chunk
+    if remaining != 0:
+        raise OSError(f"Size of {entry.name} does not match its record")
+
+
+def iter_zip(entries: Iterable[ArchiveEntry], chunk_size: int) -> Iterator[bytes]:
+    """
+    Строит zip-архив без сжатия по мере чтения файлов.
+
+    :param entries: Файлы архива.
+    :type entries: Iterable[ArchiveEntry]
+    :param chunk_size: Размер чанка чтения.
+    :type chunk_size: int
+    :return: Итератор байтов архива.
+    :rtype: Iterator[bytes]
+    """
+    buffer = ArchiveBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.name, date_time=max(entry.modified_at.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+            info.file_size = entry.size
+            with archive.open(info, "w") as target:
+                for chunk in iter_entry(entry, chunk_size):
+                    target.write(chunk)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def iter_tar(entries: Iterable[ArchiveEntry], chunk_size: int) -> Iterator[bytes]:
+    """
+    Строит tar-архив (POSIX pax) по мере чтения файлов.
+
+    Заголовки собирает tarfile.TarInfo, а содержимое пишется чанками
+    напрямую: TarFile.addfile копирует файл целиком за один вызов.
+
+    :param entries: Файлы архива.
+    :type entries: Iterable[ArchiveEntry]
+    :param chunk_size: Размер чанка чтения.
+    :type chunk_size: int
+    :return: Итератор байтов архива.
+    :rtype: Iterator[bytes]
+    """
+    written = 0
+    for entry in entries:
+        info = tarfile.TarInfo(entry.name)
+        info.size = entry.size
+        info.mode = 0o644
+        info.mtime = entry.modified_at.replace(tzinfo=timezone.utc).timestamp()
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        yield header
+        for chunk in iter_entry(entry, chunk_size):
+            yield chunk
+        padding = -entry.size % TAR_BLOCK_SIZE
+        yield b"\0" * padding
+        written += len(header) + entry.size + padding
+
+    end = b"\0" * (2 * TAR_BLOCK_SIZE)
+    written += len(end)
+    yield end + b"\0" * (-written % TAR_RECORD_SIZE)
+
+
+def iter_archive(entries: Iterable[ArchiveEntry], archive_format: str, chunk_size: int) -> Iterator[bytes]:
+    """
+    Строит архив на лету, не сохраняя его ни в памяти, ни на диске целиком.
+
+    В памяти одновременно находится не больше одного чанка содержимого.
+    Итератор синхронный и блокирующий: StreamingResponse выполняет его в пуле потоков.
+
+    :param entries: Файлы архива.
+    :type entries: Iterable[ArchiveEntry]
+    :param archive_format: Формат архива из ARCHIVE_MEDIA_TYPES.
+    :type archive_format: str
+    :param chunk_size: Размер чанка чтения.
+    :type chunk_size: int
+    :return: Итератор непустых кусков архива.
+    :rtype: Iterator[bytes]
+    :raises OSError: Если файл не удалось прочитать или его размер не совпал с записью.
+    """
+    chunks = iter_zip(entries, chunk_size) if archive_format == "zip" else iter_tar(entries, chunk_size)
+    for chunk in chunks:
+        if chunk:
+            yield chunk
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime
+
+from app.models import FileMetadata as FileModel
+from app.configs import METADATA_CACHE_SIZE, METADATA_CACHE_TTL, METADATA_CACHE_REDIS_URL, WEB_CONCURRENCY, logger
+
+
+datetime_columns = {column.name for column in FileModel.__table__.columns if isinstance(column.type, DateTime)}
+
+
+class MemoryBackend:
+    """
+    Хранилище кеша в памяти процесса: LRU на max_size записей с TTL.
+
+    Работает только из event loop, поэтому обходится без блокировок;
+    из других потоков записи удаляются через delete_sync.
+
+    :ivar loop: Event loop, в котором кладутся записи.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: dict) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        self.remove(keys)
+
+    def remove(self, keys) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def delete_sync(self, *keys: str) -> None:
+        # Записи меняются только в своём event loop; если записей ещё не было
+        # (или loop уже закрыт, как в командах manage), сбрасывать нечего.
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.remove, keys)
+
+
+class RedisBackend:
+    """
+    Общее для всех воркеров хранилище кеша в Redis.
+
+    Записи хранятся в JSON с истечением через TTL, вытеснение по памяти
+    настраивается на стороне Redis (maxmemory-policy allkeys-lru).
+    """
+
+    prefix = "file-metadata:"
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("METADATA_CACHE_REDIS_URL is set, but the redis package is not installed")
+        self.client = Redis.from_url(url)
+        self.url = url
+        self.ttl = ttl
+        self.sync_client = None
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = await self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: dict) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    def delete_sync(self, *keys: str) -> None:
+        if self.sync_client is None:
+            from redis import Redis
+            self.sync_client = Redis.from_url(self.url)
+        if keys:
+            self.sync_client.delete(*(self.prefix + key for key in keys))
+
+
+class MetadataCache:
+    """
+    Кеш метаданных файлов по uid поверх MemoryBackend или RedisBackend.
+
+    В кеше лежат снимки колонок FileMetadata, а не объекты сессии, так что
+    get возвращает отсоединённую запись: её можно читать, но не удалять или
+    менять через сессию. Записи сбрасываются при удалении файла, при
+    изменении storage_url и когда фоновые задачи меняют path, is_local или
+    upload_state (invalidate_sync), остальное устаревает по TTL. Ошибки хранилища
+    не ломают запросы: кеш просто считается промахом.
+
+    :ivar backend: Хранилище кеша или None, если кеш выключен.
+    :ivar hits: Количество попаданий.
+    :ivar misses: Количество промахов.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, uid: str) -> Optional[FileModel]:
+        """
+        Возвращает запись о файле из кеша.
+
+        :param uid: Уникальный идентификатор файла.
+        :type uid: str
+        :return: Отсоединённая запись файла или None при промахе.
+        :rtype: Optional[FileMetadata]
+        """
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(uid)
+        except Exception as e:
+            logger.warning(f"Metadata cache get failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return FileModel(**{
+            name: datetime.fromisoformat(value[name]) if name in datetime_columns and value[name] else value[name]
+            for name in value
+        })
+
+    async def set(self, file_record: FileModel) -> None:
+        """
+        Кладёт снимок записи о файле в кеш.
+
+        :param file_record: Запись файла.
+        :type file_record: FileMetadata
+        :return: None
+        :rtype: None
+        """
+        if self.backend is None:
+            return
+        value = {}
+        for column in FileModel.__table__.columns:
+            attribute = getattr(file_record, column.name)
+            value[column.name] = attribute.isoformat() if isinstance(attribute, datetime) else attribute
+        try:
+            await self.backend.set(file_record.uid, value)
+        except Exception as e:
+            logger.warning(f"Metadata cache set failed: {e}")
+
+    def invalidate_sync(self, *uids: str) -> None:
+        """
+        Удаляет записи о файлах из кеша из синхронного кода: фоновых задач
+        планировщика и команд manage.
+
+        :param uids: Уникальные идентификаторы файлов.
+        :type uids: str
+        :return: None
+        :rtype: None
+        """
+        if self.backend is None or not uids:
+            return
+        try:
+            self.backend.delete_sync(*uids)
+        except Exception as e:
+            logger.warning(f"Metadata cache invalidate failed: {e}")
+
+    async def invalidate(self, *uids: str) -> None:
+        """
+        Удаляет записи о файлах из кеша.
+
+        :param uids: Уникальные идентификаторы файлов.
+        :type uids: str
+        :return: None
+        :rtype: None
+        """
+        if self.backend is None:
+            return
+        try:
+            await self.backend.delete(*uids)
+        except Exception as e:
+            logger.warning(f"Metadata cache invalidate failed: {e}")
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики попаданий и промахов.
+
+        :return: Количество попаданий и промахов.
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_metadata_cache() -> MetadataCache:
+    """
+    Создаёт кеш метаданных по настройкам.
+
+    При заданном METADATA_CACHE_REDIS_URL кеш общий для всех воркеров,
+    иначе он в памяти процесса. METADATA_CACHE_SIZE=0 выключает кеш в памяти.
+    Кеш в памяти сбрасывается только в том процессе, который изменил запись,
+    поэтому при нескольких воркерах (WEB_CONCURRENCY > 1) без Redis кеш
+    выключается: иначе другие воркеры до METADATA_CACHE_TTL отдавали бы
+    удалённые файлы.
+
+    :return: Кеш метаданных.
+    :rtype: MetadataCache
+    """
+    if METADATA_CACHE_REDIS_URL:
+        return MetadataCache(RedisBackend(METADATA_CACHE_REDIS_URL, METADATA_CACHE_TTL))
+    if WEB_CONCURRENCY > 1:
+        logger.warning("Metadata cache is disabled: WEB_CONCURRENCY > 1 requires METADATA_CACHE_REDIS_URL")
+        return MetadataCache()
+    if METADATA_CACHE_SIZE > 0:
+        return MetadataCache(MemoryBackend(METADATA_CACHE_SIZE, METADATA_CACHE_TTL))
+    return MetadataCache()
+
+
+metadata_cache = create_metadata_cache()
@@ -1,14 +1,33 @@
 import os
+import math
+import base64
+import hashlib
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
 
-from sqlalchemy.orm import Session
 import boto3
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 
+from app.metrics import cloud_upload_duration
 from app.configs import (
     YANDEX_CLOUD_ACCESS_KEY,
     YANDEX_CLOUD_SECRET_KEY,
     YANDEX_CLOUD_BUCKET_NAME,
     YANDEX_CLOUD_ENDPOINT_URL,
+    CLOUD_STORAGE_WORKERS,
+    MULTIPART_THRESHOLD,
+    MULTIPART_PART_SIZE,
+    MULTIPART_MAX_CONCURRENCY,
+    CLOUD_UPLOAD_BANDWIDTH_LIMIT,
+    PRESIGNED_URL_EXPIRES,
+    logger,
 )
 
 
@@ -16,26 +35,135 @@ s3_client = boto3.client(
     "s3",
     endpoint_url=YANDEX_CLOUD_ENDPOINT_URL,
     aws_access_key_id=YANDEX_CLOUD_ACCESS_KEY,
-    aws_secret_access_key=YANDEX_CLOUD_SECRET_KEY
+    aws_secret_access_key=YANDEX_CLOUD_SECRET_KEY,
+    config=Config(max_pool_connections=CLOUD_STORAGE_WORKERS * MULTIPART_MAX_CONCURRENCY)
 )
 
+# boto3 блокирующий, поэтому все обращения к хранилищу из корутин идут через
+# отдельный ограниченный пул: медленный PUT не займёт event loop и не выест
+# общий пул потоков starlette, которым пользуются обработчики запросов.
+cloud_executor = ThreadPoolExecutor(
+    max_workers=CLOUD_STORAGE_WORKERS, thread_name_prefix="cloud-storage"
+)
+
+
+DELETE_OBJECTS_BATCH_SIZE = 1000
+
+
+async def run_in_cloud_executor(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Выполняет блокирующую операцию с облачным хранилищем в пуле cloud_executor.
+
+    :param func: Синхронная функция для выполнения.
+    :type func: Callable[..., Any]
+    :return: Результат выполнения функции.
+    :rtype: Any
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cloud_executor, partial(func, *args, **kwargs))
+
+
+def cloud_url(file_name: str) -> str:
+    """
+    Возвращает URL файла в облачном хранилище, который сохраняется в storage_url.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :return: URL файла.
+    :rtype: str
+    """
+    return f"{YANDEX_CLOUD_ENDPOINT_URL}/{YANDEX_CLOUD_BUCKET_NAME}/{file_name}"
+
+
+class RateLimiter:
+    """
+    Ограничитель скорости в единицах в секунду: байтах при отправке файла,
+    удалениях при очистке хранилища.
+
+    Потокобезопасен: при загрузке им пользуются все потоки, отправляющие части
+    одного файла. Каждый вызов consume резервирует следующий отрезок времени и
+    спит до его конца, так что средняя скорость не превышает заданную.
+    """
 
-def upload_file_to_cloud(file_path: str, file_name: str) -> str:
+    def __init__(self, rate: int) -> None:
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, amount: int) -> None:
+        """
+        Учитывает amount единиц и при необходимости притормаживает поток.
+
+        :param amount: Количество единиц.
+        :type amount: int
+        :return: None
+        :rtype: None
+        """
+        if self.rate <= 0 or amount <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._next_free = max(now, self._next_free) + amount / self.rate
+            delay = self._next_free - now
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+def upload_file_to_cloud(
+    file_path: str,
+    file_name: str,
+    upload_id: Optional[str] = None,
+    on_multipart_start: Optional[Callable[[str], None]] = None,
+    md5: Optional[str] = None,
+    on_progress: Optional[Callable[[], None]] = None
+) -> str:
     """
     Загружает файл в Yandex Cloud Object Storage.
 
+    Файлы меньше MULTIPART_THRESHOLD отправляются одним запросом, большие —
+    multipart-загрузкой с параллельной отправкой частей. Скорость отправки
+    одного файла ограничена CLOUD_UPLOAD_BANDWIDTH_LIMIT. Каждый запрос
+    несёт Content-MD5, поэтому хранилище отклонит искажённые в пути данные.
+
     :param file_path: Путь до файла на локальном диске.
     :type file_path: str
     :param file_name: Имя файла для сохранения в облаке.
     :type file_name: str
+    :param upload_id: UploadId прерванной multipart-загрузки, которую нужно продолжить.
+    :type upload_id: Optional[str]
+    :param on_multipart_start: Вызывается с UploadId новой multipart-загрузки,
+        чтобы его можно было сохранить до отправки частей.
+    :type on_multipart_start: Optional[Callable[[str], None]]
+    :param md5: MD5 содержимого в hex, посчитанный при приёме файла.
+        Для multipart-загрузки MD5 считается по каждой части.
+    :type md5: Optional[str]
+    :param on_progress: Вызывается по ходу отправки (после каждой части или
+        прочитанного куска файла); исключение из него прерывает загрузку.
+    :type on_progress: Optional[Callable[[], None]]
     :return: URL загруженного файла в облаке.
     :rtype: str
     :raises Exception: Если произошла ошибка при загрузке файла.
     """
+    limiter = RateLimiter(CLOUD_UPLOAD_BANDWIDTH_LIMIT)
+    started = time.perf_counter()
+
     try:
-        s3_client.upload_file(file_path, YANDEX_CLOUD_BUCKET_NAME, file_name)
-        file_url = f"{YANDEX_CLOUD_ENDPOINT_URL}/{YANDEX_CLOUD_BUCKET_NAME}/{file_name}"
-        return file_url
+        size = os.path.getsize(file_path)
+        if size < MULTIPART_THRESHOLD:
+            method = "single"
+            extra = {"ContentMD5": content_md5(bytes.fromhex(md5))} if md5 else {}
+            with open(file_path, "rb") as f:
+                s3_client.put_object(
+                    Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name,
+                    Body=ThrottledReader(f, limiter, on_progress), ContentLength=size, **extra
+                )
+        else:
+            method = "multipart"
+            upload_multipart(file_path, file_name, size, limiter, upload_id, on_multipart_start, on_progress)
+        cloud_upload_duration.labels(method).observe(time.perf_counter() - started)
+        return cloud_url(file_name)
     except FileNotFoundError:
         raise Exception("The file was not found")
     except NoCredentialsError:
@@ -44,6 +172,194 @@ def upload_file_to_cloud(file_path: str, file_name: str) -> str:
         raise Exception(f"Failed to upload to Yandex Cloud: {e}")
 
 
+def list_uploaded_parts(file_name: str, upload_id: str, part_size: int) -> Optional[Dict[int, str]]:
+    """
+    Возвращает уже загруженные части multipart-загрузки.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param upload_id: UploadId multipart-загрузки.
+    :type upload_id: str
+    :param part_size: Ожидаемый размер части.
+    :type part_size: int
+    :return: ETag частей по их номерам или None, если загрузку продолжить нельзя
+        (она уже прервана или была начата с другим размером части).
+    :rtype: Optional[Dict[int, str]]
+    """
+    parts = {}
+    sizes = {}
+    paginator = s3_client.get_paginator("list_parts")
+    try:
+        for page in paginator.paginate(Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = part["ETag"]
+                sizes[part["PartNumber"]] = part["Size"]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "NoSuchUpload":
+            return None
+        raise
+
+    if any(size != part_size for number, size in sizes.items() if number != max(sizes)):
+        abort_multipart_upload(file_name, upload_id)
+        return None
+    return parts
+
+
+class ThrottledReader:
+    """
+    Обёртка над открытым файлом, читающая его не быстрее ограничителя скорости.
+
+    После каждого чтения вызывает on_progress, если он передан.
+    Остальные методы файла (seek, tell) botocore получает от исходного объекта.
+    """
+
+    def __init__(self, file, limiter: RateLimiter, on_progress: Optional[Callable[[], None]] = None) -> None:
+        self._file = file
+        self._limiter = limiter
+        self._on_progress = on_progress
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self._limiter.consume(len(data))
+        if self._on_progress:
+            self._on_progress()
+        return data
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+
+def content_md5(digest: bytes) -> str:
+    """
+    Возвращает значение заголовка Content-MD5: MD5 в base64.
+
+    :param digest: MD5 в байтах.
+    :type digest: bytes
+    :return: Значение заголовка.
+    :rtype: str
+    """
+    return base64.b64encode(digest).decode()
+
+
+def upload_multipart(
+    file_path: str,
+    file_name: str,
+    size: int,
+    limiter: RateLimiter,
+    upload_id: Optional[str] = None,
+    on_multipart_start: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[], None]] = None
+) -> None:
+    """
+    Загружает файл multipart-загрузкой, отправляя до MULTIPART_MAX_CONCURRENCY частей параллельно.
+
+    Если передан upload_id, уже загруженные части пропускаются. В памяти
+    одновременно держится не больше MULTIPART_MAX_CONCURRENCY частей.
+
+    :param file_path: Путь до файла на локальном диске.
+    :type file_path: str
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param size: Размер файла в байтах.
+    :type size: int
+    :param limiter: Ограничитель скорости отправки.
+    :type limiter: RateLimiter
+    :param upload_id: UploadId прерванной загрузки.
+    :type upload_id: Optional[str]
+    :param on_multipart_start: Вызывается с UploadId новой загрузки.
+    :type on_multipart_start: Optional[Callable[[str], None]]
+    :param on_progress: Вызывается после каждой отправленной части; исключение
+        из него отменяет неотправленные части и прерывает загрузку.
+    :type on_progress: Optional[Callable[[], None]]
+    :return: None
+    :rtype: None
+    """
+    part_size = MULTIPART_PART_SIZE
+    uploaded = list_uploaded_parts(file_name, upload_id, part_size) if upload_id else None
+
+    if uploaded is None:
+        upload_id = s3_client.create_multipart_upload(
+            Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name
+        )["UploadId"]
+        uploaded = {}
+        if on_multipart_start:
+            on_multipart_start(upload_id)
+    else:
+        logger.info(f"Resuming multipart upload of {file_name}: {len(uploaded)} parts already uploaded")
+
+    def send_part(part_number: int) -> tuple:
+        with open(file_path, "rb") as f:
+            f.seek((part_number - 1) * part_size)
+            data = f.read(part_size)
+        limiter.consume(len(data))
+        response = s3_client.upload_part(
+            Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name, UploadId=upload_id,
+            PartNumber=part_number, Body=data, ContentMD5=content_md5(hashlib.md5(data).digest())
+        )
+        return part_number, response["ETag"]
+
+    part_count = max(1, math.ceil(size / part_size))
+    missing = [number for number in range(1, part_count + 1) if number not in uploaded]
+
+    with ThreadPoolExecutor(max_workers=MULTIPART_MAX_CONCURRENCY, thread_name_prefix="multipart") as pool:
+        try:
+            for part_number, etag in pool.map(send_part, missing):
+                uploaded[part_number] = etag
+                if on_progress:
+                    on_progress()
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    s3_client.complete_multipart_upload(
+        Bucket=YANDEX_CLOUD_BUCKET_NAME,
+        Key=file_name,
+        UploadId=upload_id,
+        MultipartUpload={
+            "Parts": [{"PartNumber": number, "ETag": uploaded[number]} for number in range(1, part_count + 1)]
+        }
+    )
+
+
+def abort_multipart_upload(file_name: str, upload_id: str) -> None:
+    """
+    Прерывает multipart-загрузку и освобождает её части в хранилище.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param upload_id: UploadId multipart-загрузки.
+    :type upload_id: str
+    :return: None
+    :rtype: None
+    """
+    try:
+        s3_client.abort_multipart_upload(Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name, UploadId=upload_id)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            raise Exception(f"Failed to abort multipart upload in Yandex Cloud: {e}")
+
+
+def abort_abandoned_multipart_uploads(older_than: timedelta) -> int:
+    """
+    Прерывает multipart-загрузки, начатые раньше, чем older_than назад.
+
+    :param older_than: Возраст, после которого загрузка считается брошенной.
+    :type older_than: timedelta
+    :return: Количество прерванных загрузок.
+    :rtype: int
+    """
+    threshold = datetime.now(timezone.utc) - older_than
+    aborted = 0
+    paginator = s3_client.get_paginator("list_multipart_uploads")
+
+    for page in paginator.paginate(Bucket=YANDEX_CLOUD_BUCKET_NAME):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] < threshold:
+                abort_multipart_upload(upload["Key"], upload["UploadId"])
+                aborted += 1
+    return aborted
+
+
 def delete_file_from_cloud(file_name: str) -> None:
     """
     Удаляет файл из Yandex Cloud Object Storage.
@@ -60,21 +376,230 @@ def delete_file_from_cloud(file_name: str) -> None:
         raise Exception(f"Failed to delete file from Yandex Cloud: {e}")
 
 
-async def upload_to_cloud_and_update_db(local_file_path: str, file_record, db: Session) -> None:
+def list_files_in_cloud(start_after: Optional[str] = None) -> Iterator[List[dict]]:
+    """
+    Постранично перечисляет файлы в Yandex Cloud Object Storage в порядке имён.
+
+    :param start_after: Имя файла, после которого начинать перечисление.
+    :type start_after: Optional[str]
+    :return: Итератор страниц (до 1000 объектов) с ключами Key, Size и LastModified.
+    :rtype: Iterator[List[dict]]
+    :raises Exception: Если не удалось получить список файлов.
+    """
+    params = {"Bucket": YANDEX_CLOUD_BUCKET_NAME}
+    if start_after:
+        params["StartAfter"] = start_after
+
+    try:
+        for page in s3_client.get_paginator("list_objects_v2").paginate(**params):
+            contents = page.get("Contents", [])
+            if contents:
+                yield contents
+    except ClientError as e:
+        raise Exception(f"Failed to list files in Yandex Cloud: {e}")
+
+
+def delete_files_from_cloud(file_names: Iterable[str]) -> List[str]:
+    """
+    Удаляет файлы из Yandex Cloud Object Storage пачками по 1000 ключей за запрос.
+
+    :param file_names: Имена файлов в облаке.
+    :type file_names: Iterable[str]
+    :return: Имена файлов, которые удалить не удалось.
+    :rtype: List[str]
+    :raises Exception: Если запрос на удаление завершился ошибкой.
+    """
+    file_names = list(file_names)
+    failed = []
+
+    for i in range(0, len(file_names), DELETE_OBJECTS_BATCH_SIZE):
+        batch = file_names[i:i + DELETE_OBJECTS_BATCH_SIZE]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=YANDEX_CLOUD_BUCKET_NAME,
+                Delete={"Objects": [{"Key": name} for name in batch], "Quiet": True}
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to delete files from Yandex Cloud: {e}")
+        for error in response.get("Errors", []):
+            logger.error(f"Failed to delete {error['Key']} from Yandex Cloud: {error.get('Message')}")
+            failed.append(error["Key"])
+    return failed
+
+
+def download_file_from_cloud(file_name: str, file_path: str) -> None:
+    """
+    Скачивает файл из Yandex Cloud Object Storage на локальный диск.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param file_path: Путь, по которому сохранить файл.
+    :type file_path: str
+    :return: None
+    :rtype: None
+    :raises Exception: Если произошла ошибка при скачивании файла.
+    """
+    try:
+        s3_client.download_file(YANDEX_CLOUD_BUCKET_NAME, file_name, file_path)
+    except NoCredentialsError:
+        raise Exception("Credentials not available")
+    except ClientError as e:
+        raise Exception(f"Failed to download from Yandex Cloud: {e}")
+
+
+def open_cloud_file(file_name: str) -> BinaryIO:
+    """
+    Открывает файл в Yandex Cloud Object Storage на потоковое чтение.
+
+    Содержимое не скачивается целиком: read читает его из соединения по мере вызова.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :return: Поток с методами read и close.
+    :rtype: BinaryIO
+    :raises Exception: Если файл не удалось открыть.
+    """
+    try:
+        return s3_client.get_object(Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name)["Body"]
+    except NoCredentialsError:
+        raise Exception("Credentials not available")
+    except ClientError as e:
+        raise Exception(f"Failed to open file in Yandex Cloud: {e}")
+
+
+def generate_presigned_upload_url(file_name: str, content_type: Optional[str]) -> str:
+    """
+    Создаёт временную ссылку для загрузки файла одним PUT напрямую в Yandex Cloud Object Storage.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param content_type: MIME-тип, с которым клиент обязан отправить файл.
+    :type content_type: Optional[str]
+    :return: Подписанный URL, действующий PRESIGNED_URL_EXPIRES секунд.
+    :rtype: str
+    :raises Exception: Если не удалось подписать ссылку.
+    """
+    params = {"Bucket": YANDEX_CLOUD_BUCKET_NAME, "Key": file_name}
+    if content_type:
+        params["ContentType"] = content_type
+
+    try:
+        return s3_client.generate_presigned_url("put_object", Params=params, ExpiresIn=PRESIGNED_URL_EXPIRES)
+    except (ClientError, NoCredentialsError) as e:
+        raise Exception(f"Failed to presign Yandex Cloud URL: {e}")
+
+
+def create_presigned_multipart_upload(file_name: str, content_type: Optional[str], part_count: int) -> tuple:
     """
-    Загружает файл в облако и обновляет запись в базе данных.
+    Начинает multipart-загрузку и подписывает ссылки для отправки каждой части клиентом.
 
-    :param local_file_path: Путь до файла на локальном диске.
-    :type local_file_path: str
-    :param file_record: Запись файла в базе данных.
-    :type file_record: FileMetadata
-    :param db: Сессия базы данных.
-    :type db: Session
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param content_type: MIME-тип файла.
+    :type content_type: Optional[str]
+    :param part_count: Количество частей.
+    :type part_count: int
+    :return: UploadId и подписанные URL частей по порядку номеров.
+    :rtype: tuple
+    :raises Exception: Если не удалось начать загрузку или подписать ссылки.
+    """
+    extra = {"ContentType": content_type} if content_type else {}
+    try:
+        upload_id = s3_client.create_multipart_upload(
+            Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name, **extra
+        )["UploadId"]
+        urls = [
+            s3_client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": YANDEX_CLOUD_BUCKET_NAME, "Key": file_name,
+                    "UploadId": upload_id, "PartNumber": part_number,
+                },
+                ExpiresIn=PRESIGNED_URL_EXPIRES
+            )
+            for part_number in range(1, part_count + 1)
+        ]
+    except (ClientError, NoCredentialsError) as e:
+        raise Exception(f"Failed to start multipart upload in Yandex Cloud: {e}")
+    return upload_id, urls
+
+
+def complete_presigned_multipart_upload(file_name: str, upload_id: str, parts: List[dict]) -> None:
+    """
+    Завершает multipart-загрузку, части которой клиент отправил сам.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param upload_id: UploadId multipart-загрузки.
+    :type upload_id: str
+    :param parts: Номера и ETag частей: [{"PartNumber": 1, "ETag": "..."}].
+    :type parts: List[dict]
     :return: None
     :rtype: None
+    :raises Exception: Если хранилище отклонило список частей.
     """
-    file_url = upload_file_to_cloud(local_file_path, os.path.basename(local_file_path))
+    try:
+        s3_client.complete_multipart_upload(
+            Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name, UploadId=upload_id,
+            MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])}
+        )
+    except (ClientError, NoCredentialsError) as e:
+        raise Exception(f"Failed to complete multipart upload in Yandex Cloud: {e}")
+
+
+def head_cloud_file(file_name: str) -> Optional[dict]:
+    """
+    Возвращает ETag и размер файла в облаке без скачивания содержимого.
 
-    file_record.storage_url = file_url
-    db.add(file_record)
-    db.commit()
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :return: ETag без кавычек и размер в байтах или None, если файла нет.
+    :rtype: Optional[dict]
+    :raises Exception: Если произошла ошибка при обращении к хранилищу.
+    """
+    try:
+        response = s3_client.head_object(Bucket=YANDEX_CLOUD_BUCKET_NAME, Key=file_name)
+    except NoCredentialsError:
+        raise Exception("Credentials not available")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise Exception(f"Failed to check file in Yandex Cloud: {e}")
+    return {"etag": response["ETag"].strip('"'), "size": response["ContentLength"]}
+
+
+def generate_presigned_download_url(
+    file_name: str,
+    original_name: str,
+    content_type: Optional[str],
+    content_encoding: Optional[str] = None
+) -> str:
+    """
+    Создаёт временную ссылку на скачивание файла напрямую из Yandex Cloud Object Storage.
+
+    :param file_name: Имя файла в облаке.
+    :type file_name: str
+    :param original_name: Оригинальное имя файла для Content-Disposition.
+    :type original_name: str
+    :param content_type: MIME-тип, который хранилище вернёт в ответе.
+    :type content_type: Optional[str]
+    :param content_encoding: Content-Encoding, который хранилище вернёт в ответе (для сжатых блобов).
+    :type content_encoding: Optional[str]
+    :return: Подписанный URL, действующий PRESIGNED_URL_EXPIRES секунд.
+    :rtype: str
+    :raises Exception: Если не удалось подписать ссылку.
+    """
+    params = {
+        "Bucket": YANDEX_CLOUD_BUCKET_NAME,
+        "Key": file_name,
+        "ResponseContentDisposition": f"attachment; filename*=utf-8''{quote(original_name)}",
+    }
+    if content_type:
+        params["ResponseContentType"] = content_type
+    if content_encoding:
+        params["ResponseContentEncoding"] = content_encoding
+
+    try:
+        return s3_client.generate_presigned_url("get_object", Params=params, ExpiresIn=PRESIGNED_URL_EXPIRES)
+    except (ClientError, NoCredentialsError) as e:
+        raise Exception(f"Failed to presign Yandex Cloud URL: {e}")
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import io
+import os
+from typing import BinaryIO, Iterator, Tuple
+
+
+# Модуль нужен и процессам пула разбора медиа, поэтому, как и app.media,
+# импортирует только стандартную библиотеку; zstandard загружается при первом использовании.
+
+ENCODINGS = ("gzip", "zstd")
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+# MIME-типы по сигнатуре (см. app.media.sniff_mime_type), которые стоит сжимать:
+# текст (JSON, логи, субтитры) и несжатый звук. Изображения не сжимаются:
+# их читает Pillow при построении миниатюр.
+COMPRESSIBLE_TYPES = ("text/plain", "audio/wav")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def zstandard():
+    """
+    Импортирует zstandard.
+
+    :return: Модуль zstandard.
+    :raises RuntimeError: Если пакет не установлен.
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compression is requested, but the zstandard package is not installed")
+    return zstandard
+
+
+def check_encoding(encoding: str) -> None:
+    """
+    Проверяет, что кодирование известно и его можно использовать.
+
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :return: None
+    :rtype: None
+    :raises RuntimeError: Если кодирование неизвестно или для него не установлен пакет.
+    """
+    if encoding not in ENCODINGS:
+        raise RuntimeError(f"Unknown compression {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+    if encoding == "zstd":
+        zstandard()
+
+
+def open_encoder(target: BinaryIO, encoding: str, level: int) -> BinaryIO:
+    """
+    Открывает поток, который сжимает записанное в target.
+
+    gzip пишется без имени и времени файла, так что одинаковое содержимое
+    сжимается в одинаковые байты.
+
+    :param target: Поток для сжатых данных.
+    :type target: BinaryIO
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :param level: Уровень сжатия.
+    :type level: int
+    :return: Поток на запись; его закрытие дописывает конец сжатых данных, но не закрывает target.
+    :rtype: BinaryIO
+    """
+    if encoding == "gzip":
+        return gzip.GzipFile(filename="", mode="wb", compresslevel=level, fileobj=target, mtime=0)
+    return zstandard().ZstdCompressor(level=level).stream_writer(target, closefd=False)
+
+
+class ClosingGzipFile(gzip.GzipFile):
+    """
+    GzipFile, который закрывает переданный ему fileobj вместе с собой.
+    """
+
+    def close(self) -> None:
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
+
+
+def open_decoded(source: BinaryIO, encoding: str) -> BinaryIO:
+    """
+    Открывает поток, который читает source и распаковывает его.
+
+    read(n) возвращает не больше n байтов, так что память не зависит от
+    степени сжатия. Закрытие потока закрывает и source.
+
+    :param source: Поток сжатых данных.
+    :type source: BinaryIO
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :return: Поток распакованных данных.
+    :rtype: BinaryIO
+    """
+    if encoding == "gzip":
+        return ClosingGzipFile(fileobj=source, mode="rb")
+    return zstandard().ZstdDecompressor().stream_reader(source, closefd=True)
+
+
+class Md5Writer(io.RawIOBase):
+    """
+    Поток на запись, который считает MD5 всего, что через него прошло.
+    """
+
+    def __init__(self, target: BinaryIO):
+        self.target = target
+        self.md5 = hashlib.md5()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.md5.update(data)
+        return self.target.write(data)
+
+
+def compression_ratio(data: bytes, encoding: str, level: int) -> float:
+    """
+    Сжимает образец данных и возвращает отношение сжатого размера к исходному.
+
+    :param data: Образец.
+    :type data: bytes
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :param level: Уровень сжатия.
+    :type level: int
+    :return: Отношение размеров (меньше — лучше).
+    :rtype: float
+    """
+    if not data:
+        return 1.0
+    buffer = io.BytesIO()
+    with open_encoder(buffer, encoding, level) as encoder:
+        encoder.write(data)
+    return len(buffer.getvalue()) / len(data)
+
+
+def compress_file(source: str, destination: str, encoding: str, level: int) -> Tuple[int, str]:
+    """
+    Сжимает файл чанками, не читая его целиком.
+
+    :param source: Путь до исходного файла.
+    :type source: str
+    :param destination: Путь до сжатого файла.
+    :type destination: str
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :param level: Уровень сжатия.
+    :type level: int
+    :return: Размер сжатого файла и MD5 его содержимого в hex.
+    :rtype: Tuple[int, str]
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        target = Md5Writer(dst)
+        with open_encoder(target, encoding, level) as encoder:
+            while chunk := src.read(CHUNK_SIZE):
+                encoder.write(chunk)
+    return os.path.getsize(destination), target.md5.hexdigest()
+
+
+def decoded_sha256(path: str, encoding: str, on_read=None) -> str:
+    """
+    Считает SHA-256 распакованного содержимого сжатого файла.
+
+    :param path: Путь до сжатого файла.
+    :type path: str
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :param on_read: Вызывается с размером каждого прочитанного распакованного чанка.
+    :return: SHA-256 в hex.
+    :rtype: str
+    """
+    sha256 = hashlib.sha256()
+    with open_decoded(open(path, "rb"), encoding) as f:
+        while chunk := f.read(CHUNK_SIZE):
+            if on_read:
+                on_read(len(chunk))
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def iter_decoded(source: BinaryIO, encoding: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Читает и распаковывает поток чанками, закрывая его в конце.
+
+    Итератор синхронный и блокирующий: StreamingResponse выполняет его в пуле потоков.
+
+    :param source: Поток сжатых данных (файл или тело объекта из облака).
+    :type source: BinaryIO
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :param chunk_size: Размер чанка распакованных данных.
+    :type chunk_size: int
+    :return: Итератор распакованных чанков.
+    :rtype: Iterator[bytes]
+    """
+    with open_decoded(source, encoding) as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
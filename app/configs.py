@@ -1,12 +1,21 @@
 from dotenv import load_dotenv
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueListener, RotatingFileHandler
 import os
+import queue
+
+from app.log import BoundedQueueHandler, JsonFormatter, RequestContextFilter
 
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
 
 YANDEX_CLOUD_ACCESS_KEY = os.getenv("YANDEX_CLOUD_ACCESS_KEY")
 YANDEX_CLOUD_SECRET_KEY = os.getenv("YANDEX_CLOUD_SECRET_KEY")
@@ -14,7 +23,87 @@ YANDEX_CLOUD_BUCKET_NAME = os.getenv("YANDEX_CLOUD_BUCKET_NAME")
 YANDEX_CLOUD_ENDPOINT_URL = os.getenv("YANDEX_CLOUD_ENDPOINT_URL", "https://storage.yandexcloud.net")
 
 LOCAL_STORAGE_PATH = "storage/"
+LOCAL_STORAGE_TMP_PATH = os.path.join(LOCAL_STORAGE_PATH, "tmp")
+LOCAL_STORAGE_PARTIAL_PATH = os.path.join(LOCAL_STORAGE_TMP_PATH, "uploads")
+LOCAL_DERIVATIVES_PATH = os.path.join(LOCAL_STORAGE_PATH, "derivatives")
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", 2))
+STORAGE_SHARD_WIDTH = int(os.getenv("STORAGE_SHARD_WIDTH", 2))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 1024 * 1024))
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", 32))
+UPLOAD_MAX_IN_FLIGHT = int(os.getenv("UPLOAD_MAX_IN_FLIGHT", 4 * MAX_CONCURRENT_UPLOADS))
+UPLOAD_MAX_BYTES_IN_FLIGHT = int(os.getenv("UPLOAD_MAX_BYTES_IN_FLIGHT", 16 * 1024 ** 3))
+UPLOAD_MIN_FREE_BYTES = int(os.getenv("UPLOAD_MIN_FREE_BYTES", 1024 ** 3))
+UPLOAD_CLIENT_RATE = float(os.getenv("UPLOAD_CLIENT_RATE", 0))
+UPLOAD_CLIENT_BURST = int(os.getenv("UPLOAD_CLIENT_BURST", 20))
+UPLOAD_RETRY_AFTER = int(os.getenv("UPLOAD_RETRY_AFTER", 5))
+UPLOAD_UNKNOWN_SIZE = int(os.getenv("UPLOAD_UNKNOWN_SIZE", 64 * 1024 * 1024))
+CLOUD_STORAGE_WORKERS = int(os.getenv("CLOUD_STORAGE_WORKERS", 8))
+BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", 5000))
+LIST_PAGE_SIZE_MAX = int(os.getenv("LIST_PAGE_SIZE_MAX", 1000))
+BULK_MAX_UIDS = int(os.getenv("BULK_MAX_UIDS", 1000))
+RESUMABLE_UPLOAD_MAX_SIZE = int(os.getenv("RESUMABLE_UPLOAD_MAX_SIZE", 10 * 1024 ** 3))
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", 24))
+
+CLOUD_UPLOAD_CONCURRENCY = int(os.getenv("CLOUD_UPLOAD_CONCURRENCY", 4))
+CLOUD_UPLOAD_MAX_ATTEMPTS = int(os.getenv("CLOUD_UPLOAD_MAX_ATTEMPTS", 10))
+CLOUD_UPLOAD_BACKOFF_BASE = float(os.getenv("CLOUD_UPLOAD_BACKOFF_BASE", 5))
+CLOUD_UPLOAD_BACKOFF_MAX = float(os.getenv("CLOUD_UPLOAD_BACKOFF_MAX", 3600))
+CLOUD_UPLOAD_LEASE_SECONDS = int(os.getenv("CLOUD_UPLOAD_LEASE_SECONDS", 900))
+CLOUD_UPLOAD_POLL_INTERVAL = float(os.getenv("CLOUD_UPLOAD_POLL_INTERVAL", 5))
+
+MULTIPART_THRESHOLD = int(os.getenv("MULTIPART_THRESHOLD", 64 * 1024 * 1024))
+MULTIPART_PART_SIZE = int(os.getenv("MULTIPART_PART_SIZE", 16 * 1024 * 1024))
+MULTIPART_MAX_CONCURRENCY = int(os.getenv("MULTIPART_MAX_CONCURRENCY", 4))
+MULTIPART_ABANDON_AFTER_HOURS = int(os.getenv("MULTIPART_ABANDON_AFTER_HOURS", 24))
+CLOUD_UPLOAD_BANDWIDTH_LIMIT = int(os.getenv("CLOUD_UPLOAD_BANDWIDTH_LIMIT", 0))
+CLOUD_LARGE_UPLOAD_CONCURRENCY = int(os.getenv("CLOUD_LARGE_UPLOAD_CONCURRENCY", 2))
+
+PRESIGNED_URL_EXPIRES = int(os.getenv("PRESIGNED_URL_EXPIRES", 3600))
+
+# Число процессов сервера (uvicorn/gunicorn --workers берут его же по умолчанию).
+# Кеш метаданных в памяти корректен только для одного процесса: при большем
+# числе воркеров он выключается, если не задан METADATA_CACHE_REDIS_URL.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", 10000))
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", 60))
+METADATA_CACHE_REDIS_URL = os.getenv("METADATA_CACHE_REDIS_URL")
+
+LOCAL_STORAGE_QUOTA_BYTES = int(os.getenv("LOCAL_STORAGE_QUOTA_BYTES", 0))
+LOCAL_STORAGE_LOW_WATERMARK = float(os.getenv("LOCAL_STORAGE_LOW_WATERMARK", 0.9))
+EVICTION_INTERVAL_MINUTES = int(os.getenv("EVICTION_INTERVAL_MINUTES", 5))
+EVICTION_BATCH_SIZE = int(os.getenv("EVICTION_BATCH_SIZE", 100))
+ACCESS_TIME_RESOLUTION_SECONDS = int(os.getenv("ACCESS_TIME_RESOLUTION_SECONDS", 3600))
+LOCAL_REHYDRATE_ON_MISS = os.getenv("LOCAL_REHYDRATE_ON_MISS", "true").lower() == "true"
+
+SCRUB_BATCH_SIZE = int(os.getenv("SCRUB_BATCH_SIZE", 1000))
+SCRUB_BYTES_PER_SECOND = int(os.getenv("SCRUB_BYTES_PER_SECOND", 20 * 1024 * 1024))
+SCRUB_INTERVAL_HOURS = int(os.getenv("SCRUB_INTERVAL_HOURS", 1))
+
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MEDIA_BATCH_SIZE = int(os.getenv("MEDIA_BATCH_SIZE", 2 * MEDIA_WORKERS))
+MEDIA_PROBE_TIMEOUT = float(os.getenv("MEDIA_PROBE_TIMEOUT", 30))
+MEDIA_LEASE_SECONDS = int(os.getenv("MEDIA_LEASE_SECONDS", 600))
+MEDIA_POLL_INTERVAL = float(os.getenv("MEDIA_POLL_INTERVAL", 10))
+
+COMPRESSION = os.getenv("COMPRESSION", "off").lower()
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", {"gzip": 6, "zstd": 3}.get(COMPRESSION, 0)))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 4096))
+COMPRESSION_SAMPLE_SIZE = int(os.getenv("COMPRESSION_SAMPLE_SIZE", 256 * 1024))
+COMPRESSION_MAX_RATIO = float(os.getenv("COMPRESSION_MAX_RATIO", 0.8))
+
+THUMBNAIL_WIDTHS = tuple(sorted(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "64,128,256,512,1024").split(",")))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 80))
+DERIVATIVES_UPLOAD_TO_CLOUD = os.getenv("DERIVATIVES_UPLOAD_TO_CLOUD", "false").lower() == "true"
+
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", 1000))
+CLEANUP_MIN_AGE_SECONDS = int(os.getenv("CLEANUP_MIN_AGE_SECONDS", 3600))
+CLEANUP_MAX_DELETES_PER_SECOND = float(os.getenv("CLEANUP_MAX_DELETES_PER_SECOND", 200))
+CLEANUP_DRY_RUN = os.getenv("CLEANUP_DRY_RUN", "false").lower() == "true"
+CLEANUP_CHECKPOINT_PATH = os.getenv("CLEANUP_CHECKPOINT_PATH", "cleanup_checkpoint.json")
 LOG_DIR = "logs"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", 1.0))
 
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
@@ -27,13 +116,20 @@ file_handler = RotatingFileHandler(
 )
 file_handler.setLevel(logging.INFO)
 file_formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    "%(asctime)s - %(name)s - %(levelname)s - %(request_id)s - %(message)s"
 )
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else file_formatter)
 
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
 console_formatter = logging.Formatter("%(name)s - %(levelname)s - %(message)s")
-console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
+console_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else console_formatter)
+
+# Логгер только кладёт записи в очередь, в файл и консоль их пишет поток QueueListener.
+log_queue_handler = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+log_queue_handler.addFilter(RequestContextFilter())
+logger.addHandler(log_queue_handler)
+
+log_listener = QueueListener(log_queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
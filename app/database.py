@@ -1,31 +1,101 @@
 import os
-from typing import Generator
+from typing import AsyncGenerator
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
-from app.configs import DATABASE_URL
+from app.configs import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+)
 
 
-engine = create_engine(DATABASE_URL)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Подставляет в URL базы данных асинхронный драйвер (asyncpg, aiosqlite).
+
+    :param url: URL базы данных с синхронным драйвером.
+    :type url: str
+    :return: URL с асинхронным драйвером.
+    :rtype: str
+    """
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+def pool_options(url: str) -> dict:
+    """
+    Возвращает настройки пула соединений для движка.
+
+    SQLite по умолчанию работает без пула (NullPool), поэтому размеры пула
+    передаются только остальным базам.
+
+    :param url: URL базы данных.
+    :type url: str
+    :return: Именованные аргументы для create_engine.
+    :rtype: dict
+    """
+    options = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+# Синхронный движок нужен фоновым задачам планировщика и alembic,
+# обработчики запросов работают через асинхронный.
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_database_url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+async_engine = create_async_engine(async_database_url, **pool_options(async_database_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Создает и предоставляет сессию базы данных для выполнения запросов.
+    Создает и предоставляет асинхронную сессию базы данных для выполнения запросов.
 
-    Функция используется для создания и закрытия сессии SQLAlchemy при каждом обращении.
-    Она возвращает сессию через генератор.
+    Сессия берёт соединение из пула асинхронного движка, поэтому запросы
+    обработчиков не блокируют event loop.
 
-    :yield: Сессия базы данных SQLAlchemy.
-    :rtype: Generator[Session, None, None]
+    :yield: Асинхронная сессия базы данных SQLAlchemy.
+    :rtype: AsyncGenerator[AsyncSession, None]
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def pool_status() -> dict:
+    """
+    Возвращает счётчики пула соединений асинхронного движка.
+
+    :return: Размер пула, свободные и занятые соединения, переполнение.
+    :rtype: dict
+    """
+    pool = async_engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"size": 0, "checked_in": 0, "checked_out": 0, "overflow": 0}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
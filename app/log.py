@@ -0,0 +1,148 @@
+import copy
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from uuid import uuid4
+
+
+request_id_var: ContextVar = ContextVar("request_id", default=None)
+request_sampled_var: ContextVar = ContextVar("request_sampled", default=True)
+
+# Атрибуты, которые есть у любой записи; остальные пришли через extra.
+STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler, который при переполненной очереди отбрасывает запись, а не ждёт.
+
+    Запись в файл и консоль делает QueueListener в своём потоке, поэтому
+    вызов логгера из обработчика запроса или планировщика не блокируется
+    ни на диске, ни на ротации файла.
+
+    :ivar dropped: Количество отброшенных записей.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # В отличие от QueueHandler.prepare, traceback не склеивается с
+        # сообщением, а остаётся в exc_text: его разберёт форматтер слушателя.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Exception:
+            self.dropped += 1
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Добавляет к записи request_id текущего запроса и отбрасывает записи
+    уровня INFO и ниже из запросов, не попавших в выборку.
+
+    Фильтр стоит на QueueHandler, то есть выполняется в потоке, который
+    пишет в лог, где ещё доступен контекст запроса.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return record.levelno > logging.INFO or request_sampled_var.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну строку JSON.
+
+    Кроме времени, уровня, логгера, сообщения и request_id в строку попадают
+    поля, переданные через extra.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in STANDARD_RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI-middleware, которое назначает каждому запросу request_id и решает,
+    попадут ли его INFO-записи в лог.
+
+    request_id берётся из заголовка X-Request-ID или генерируется и
+    возвращается в том же заголовке ответа. Решение о выборке принимается
+    один раз на запрос, так что в лог попадают все INFO-записи запроса или
+    ни одной. По завершении запроса пишется строка access-лога.
+
+    :ivar app: Оборачиваемое ASGI-приложение.
+    :ivar logger: Логгер для access-лога.
+    :ivar sample_rate: Доля запросов, INFO-записи которых попадают в лог.
+    """
+
+    def __init__(self, app, logger: logging.Logger, sample_rate: float = 1.0):
+        self.app = app
+        self.logger = logger
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid4().hex
+        id_token = request_id_var.set(request_id)
+        sampled_token = request_sampled_var.set(self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration = time.perf_counter() - started
+            self.logger.info(
+                f"{scope['method']} {scope['path']} {status} {duration * 1000:.1f}ms",
+                extra={"method": scope["method"], "path": scope["path"], "status": status,
+                       "duration_ms": round(duration * 1000, 1)}
+            )
+            request_sampled_var.reset(sampled_token)
+            request_id_var.reset(id_token)
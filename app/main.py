@@ -1,13 +1,95 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
-from app.routers import files
-from app.database import engine, Base
-from app.tasks import start_scheduler
+from fastapi import Depends, FastAPI
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.routers import files, uploads, direct, derivatives
+from app.admission import AdmissionMiddleware, upload_admission
+from app.cache import metadata_cache
+from app.database import engine, async_engine, Base, get_db, pool_status
+from app.log import RequestContextMiddleware
+from app.metrics import collect_queue_metrics, collect_process_metrics, render_metrics
+from app.tasks import (
+    start_scheduler,
+    start_upload_workers,
+    stop_upload_workers,
+    start_media_workers,
+    stop_media_workers,
+)
+from app.configs import LOG_INFO_SAMPLE_RATE, log_queue_handler, logger
 
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запускает воркеры очереди загрузки в облако и извлечения свойств медиа
+    на время жизни приложения и закрывает пул соединений с базой данных при остановке.
+    """
+    workers = start_upload_workers()
+    media_workers = start_media_workers()
+    yield
+    await stop_media_workers(media_workers)
+    await stop_upload_workers(workers)
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=upload_admission,
+    routes=(
+        ("POST", "/files/upload"),
+        ("POST", "/files/stream"),
+        ("POST", "/files/batch"),
+        ("PATCH", "/files/uploads/"),
+    )
+)
+app.add_middleware(RequestContextMiddleware, logger=logger, sample_rate=LOG_INFO_SAMPLE_RATE)
 app.include_router(files.router)
+app.include_router(uploads.router)
+app.include_router(direct.router)
+app.include_router(derivatives.router)
+
+
+@app.get("/health")
+async def health() -> dict:
+    """
+    Возвращает состояние сервиса, счётчики пула соединений с базой данных,
+    попаданий в кеш метаданных и загрузок в пути.
+
+    :return: Статус сервиса и счётчики.
+    :rtype: dict
+    """
+    return {
+        "status": "ok",
+        "db_pool": pool_status(),
+        "metadata_cache": metadata_cache.stats(),
+        "uploads": upload_admission.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics(db: AsyncSession = Depends(get_db)) -> Response:
+    """
+    Возвращает метрики сервиса в формате Prometheus.
+
+    Гистограммы размеров загрузок и длительности записи на диск, коммитов,
+    загрузки в облако и очистки копятся на горячем пути, а глубина очереди
+    загрузки, пул соединений, кеш метаданных и потерянные записи лога
+    снимаются в момент запроса.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Метрики в текстовом формате Prometheus.
+    :rtype: Response
+    """
+    await collect_queue_metrics(db)
+    collect_process_metrics(pool_status(), metadata_cache.stats(), log_queue_handler.dropped)
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
 
 start_scheduler()
@@ -0,0 +1,59 @@
+import argparse
+import json
+
+from app.tasks import clean_unused_files, evict_local_copies, migrate_storage_layout, scrub_files
+
+
+def main() -> None:
+    """
+    Точка входа служебных команд сервиса.
+
+    Пример: ``python -m app.manage migrate-layout --batch-size 1000 --pause 0.5``
+
+    :return: None
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser(
+        "migrate-layout",
+        help="Перенести файлы локального хранилища в текущую раскладку по подкаталогам"
+    )
+    migrate.add_argument("--batch-size", type=int, default=500)
+    migrate.add_argument("--pause", type=float, default=0.0, help="Пауза между пачками, с")
+    migrate.add_argument("--dry-run", action="store_true")
+
+    cleanup = commands.add_parser(
+        "cleanup",
+        help="Удалить файлы на диске и в облаке, на которые не ссылается ни одна запись"
+    )
+    cleanup.add_argument("--dry-run", action="store_true")
+
+    commands.add_parser(
+        "evict",
+        help="Вытеснить локальные копии загруженных в облако файлов до квоты LOCAL_STORAGE_QUOTA_BYTES"
+    )
+
+    scrub = commands.add_parser(
+        "scrub",
+        help="Проверить целостность локальных и облачных копий давно не проверенных файлов"
+    )
+    scrub.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+
+    if args.command == "migrate-layout":
+        stats = migrate_storage_layout(args.batch_size, args.pause, args.dry_run)
+        print(json.dumps(stats))
+    elif args.command == "cleanup":
+        stats = clean_unused_files(dry_run=args.dry_run)
+        print(json.dumps(stats))
+    elif args.command == "evict":
+        print(json.dumps(evict_local_copies()))
+    elif args.command == "scrub":
+        print(json.dumps(scrub_files(args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import codecs
+import json
+import os
+import shutil
+import struct
+import subprocess
+from typing import BinaryIO, Optional, Tuple
+
+from app.compression import open_decoded
+
+
+# Модуль выполняется в дочерних процессах пула, поэтому импортирует только
+# стандартную библиотеку и app.compression, которая тоже обходится ею:
+# процессу не нужно поднимать конфигурацию, логгер и БД.
+
+SNIFF_SIZE = 4096
+
+SIGNATURES = (
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"BM", "image/bmp"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"Rar!\x1a\x07", "application/vnd.rar"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\xff\xfb", "audio/mpeg"),
+    (0, b"\xff\xf3", "audio/mpeg"),
+    (0, b"\xff\xf2", "audio/mpeg"),
+    (0, b"\x1a\x45\xdf\xa3", "video/x-matroska"),
+)
+
+RIFF_TYPES = {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}
+
+# Сколько распакованных байтов читается в поисках чанков fmt и data сжатого WAV.
+WAV_HEADER_SIZE = 64 * 1024
+
+# Кодеки WAV по формату и разрядности, в названиях ffprobe.
+WAV_CODECS = {
+    (1, 8): "pcm_u8", (1, 16): "pcm_s16le", (1, 24): "pcm_s24le", (1, 32): "pcm_s32le",
+    (3, 32): "pcm_f32le", (3, 64): "pcm_f64le", (6, 8): "pcm_alaw", (7, 8): "pcm_mulaw",
+}
+
+FTYP_BRANDS = {
+    b"heic": "image/heic", b"heix": "image/heic", b"mif1": "image/heif", b"avif": "image/avif",
+    b"qt  ": "video/quicktime", b"M4A ": "audio/mp4", b"M4B ": "audio/mp4", b"3gp4": "video/3gpp",
+}
+
+
+class ImageTooLarge(ValueError):
+    """
+    Изображение больше предела Pillow по числу пикселей (защита от «бомб распаковки»).
+    """
+
+
+def lower_priority() -> None:
+    """
+    Понижает приоритет процесса пула, чтобы разбор медиа не отнимал CPU
+    у обработчиков запросов.
+
+    :return: None
+    :rtype: None
+    """
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+def sniff_mime_type(head: bytes) -> str:
+    """
+    Определяет MIME-тип по сигнатуре в начале файла.
+
+    :param head: Первые байты файла (достаточно SNIFF_SIZE).
+    :type head: bytes
+    :return: MIME-тип. Неизвестные данные — text/plain, если это UTF-8 без
+        нулевых байтов, иначе application/octet-stream.
+    :rtype: str
+    """
+    if head[:4] == b"RIFF" and head[8:12] in RIFF_TYPES:
+        return RIFF_TYPES[head[8:12]]
+    if head[4:8] == b"ftyp":
+        return FTYP_BRANDS.get(head[8:12], "video/mp4")
+    for offset, signature, mime_type in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if mime_type == "video/x-matroska" and b"webm" in head[:64]:
+                return "video/webm"
+            return mime_type
+    if not head or b"\x00" in head:
+        return "application/octet-stream"
+    try:
+        # Символ, обрезанный на границе прочитанного куска, не делает файл бинарным.
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=len(head) < SNIFF_SIZE)
+    except UnicodeDecodeError:
+        return "application/octet-stream"
+    return "text/plain"
+
+
+def jpeg_dimensions(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    """
+    Ищет размеры JPEG в маркере SOF, перескакивая остальные сегменты.
+
+    :param f: Файл, открытый на чтение в бинарном режиме.
+    :type f: BinaryIO
+    :return: Ширина и высота или None, если маркер не найден.
+    :rtype: Optional[Tuple[int, int]]
+    """
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7):
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            sof = f.read(5)
+            if len(sof) < 5:
+                return None
+            height, width = struct.unpack(">HH", sof[1:5])
+            return width, height
+        length = struct.unpack(">H", length)[0]
+        if length < 2:
+            return None
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def image_dimensions(f: BinaryIO, head: bytes, mime_type: str) -> Optional[Tuple[int, int]]:
+    """
+    Читает ширину и высоту изображения из заголовка файла.
+
+    :param f: Файл, открытый на чтение в бинарном режиме.
+    :type f: BinaryIO
+    :param head: Первые байты файла.
+    :type head: bytes
+    :param mime_type: MIME-тип, определённый sniff_mime_type.
+    :type mime_type: str
+    :return: Ширина и высота или None, если формат не поддержан или заголовок повреждён.
+    :rtype: Optional[Tuple[int, int]]
+    """
+    try:
+        if mime_type == "image/png" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if mime_type == "image/gif":
+            return struct.unpack("<HH", head[6:10])
+        if mime_type == "image/bmp":
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if mime_type == "image/webp":
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        if mime_type == "image/jpeg":
+            return jpeg_dimensions(f)
+    except struct.error:
+        return None
+    return None
+
+
+def wav_info(header: bytes) -> Optional[dict]:
+    """
+    Читает длительность и кодек WAV из чанков fmt и data заголовка RIFF.
+
+    :param header: Начало файла, включая заголовок чанка data.
+    :type header: bytes
+    :return: Сведения в том же виде, что у probe_media, или None, если
+        чанки не найдены или повреждены.
+    :rtype: Optional[dict]
+    """
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack("<I", header[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt ":
+            fmt = header[offset + 8:offset + 8 + chunk_size]
+            if len(fmt) < 16:
+                return None
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            audio_format, _, _, byte_rate, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if audio_format == 0xFFFE and len(fmt) >= 26:
+                # WAVE_FORMAT_EXTENSIBLE: настоящий формат в начале GUID подформата.
+                audio_format = struct.unpack("<H", fmt[24:26])[0]
+            info = {"container": "wav", "streams": [{"type": "audio", "codec": WAV_CODECS.get((audio_format, bits))}]}
+            # 0xFFFFFFFF пишут программы, записывающие WAV потоком, не зная длины заранее.
+            if byte_rate and chunk_size != 0xFFFFFFFF:
+                info["duration"] = chunk_size / byte_rate
+            return info
+        offset += 8 + chunk_size + chunk_size % 2
+    return None
+
+
+def probe_media(path: str, timeout: float) -> Optional[dict]:
+    """
+    Читает длительность, контейнер и кодеки аудио и видео через ffprobe.
+
+    :param path: Путь до файла.
+    :type path: str
+    :param timeout: Предельное время работы ffprobe в секундах.
+    :type timeout: float
+    :return: Сведения о файле или None, если ffprobe не установлен или не смог разобрать файл.
+    :rtype: Optional[dict]
+    """
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+            capture_output=True, timeout=timeout, check=True
+        )
+        probe = json.loads(result.stdout)
+    except (subprocess.SubprocessError, ValueError):
+        return None
+
+    info = {"container": probe.get("format", {}).get("format_name"), "streams": []}
+    duration = probe.get("format", {}).get("duration")
+    if duration is not None:
+        info["duration"] = float(duration)
+    for stream in probe.get("streams", []):
+        info["streams"].append({"type": stream.get("codec_type"), "codec": stream.get("codec_name")})
+        if stream.get("codec_type") == "video" and "width" not in info:
+            info["width"], info["height"] = stream.get("width"), stream.get("height")
+    return info
+
+
+def extract_media_info(
+    path: str,
+    probe_timeout: float = 30,
+    content_encoding: Optional[str] = None
+) -> Tuple[str, dict]:
+    """
+    Определяет настоящий MIME-тип файла и извлекает свойства медиа.
+
+    Для изображений читаются размеры из заголовка, для аудио и видео —
+    длительность и кодеки через ffprobe, если он установлен. Файл не
+    читается целиком. ffprobe читает файл с диска сам и сжатый блоб не
+    разберёт, поэтому у сжатого WAV длительность и кодек берутся из
+    распакованного заголовка RIFF (изображения и видео не сжимаются).
+
+    :param path: Путь до файла.
+    :type path: str
+    :param probe_timeout: Предельное время работы ffprobe в секундах.
+    :type probe_timeout: float
+    :param content_encoding: Чем сжат блоб или None.
+    :type content_encoding: Optional[str]
+    :return: MIME-тип и словарь свойств (пустой, если извлечь нечего).
+    :rtype: Tuple[str, dict]
+    :raises OSError: Если файл не удалось прочитать.
+    """
+    if content_encoding:
+        with open_decoded(open(path, "rb"), content_encoding) as f:
+            head = f.read(SNIFF_SIZE)
+            mime_type = sniff_mime_type(head)
+            if mime_type != "audio/wav":
+                return mime_type, {}
+            head += f.read(WAV_HEADER_SIZE - len(head))
+        return mime_type, wav_info(head) or {}
+
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+        mime_type = sniff_mime_type(head)
+        info = {}
+        if mime_type.startswith("image/"):
+            dimensions = image_dimensions(f, head, mime_type)
+            if dimensions is not None:
+                info["width"], info["height"] = dimensions
+
+    if mime_type.startswith(("video/", "audio/")):
+        info.update(probe_media(path, probe_timeout) or {})
+    return mime_type, info
+
+
+def make_thumbnail(source: str, destination: str, width: int, quality: int = 80) -> Tuple[int, int, int]:
+    """
+    Строит миниатюру изображения шириной не больше width в формате WebP.
+
+    Pillow импортируется здесь, а не на уровне модуля, чтобы процессы пула,
+    которые только разбирают заголовки, его не загружали. JPEG декодируется
+    сразу в уменьшенном масштабе (draft), ориентация берётся из EXIF.
+    Миниатюра пишется во временный файл рядом и появляется по своему пути
+    целиком.
+
+    :param source: Путь до исходного изображения.
+    :type source: str
+    :param destination: Путь до миниатюры.
+    :type destination: str
+    :param width: Наибольшая ширина миниатюры. Меньшие изображения не увеличиваются.
+    :type width: int
+    :param quality: Качество WebP.
+    :type quality: int
+    :return: Ширина, высота и размер миниатюры в байтах.
+    :rtype: Tuple[int, int, int]
+    :raises OSError: Если изображение не удалось прочитать (в том числе неподдерживаемый формат).
+    :raises ImageTooLarge: Если в изображении больше пикселей, чем позволяет Pillow.
+    """
+    from PIL import Image, ImageOps
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temp_path = f"{destination}.{os.getpid()}.part"
+    try:
+        with Image.open(source) as image:
+            # Масштаб подбирается по обеим сторонам: после поворота по EXIF ширина может стать высотой.
+            image.draft("RGB", (width, width))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, image.height))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+            image.save(temp_path, "WEBP", quality=quality)
+            thumbnail_size = image.size
+        os.replace(temp_path, destination)
+    except Image.DecompressionBombError as e:
+        # Исключение Pillow не OSError; своё не требует Pillow там, где его ловят.
+        raise ImageTooLarge(str(e)) from e
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return thumbnail_size[0], thumbnail_size[1], os.path.getsize(destination)
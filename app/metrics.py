@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FileMetadata as FileModel, UploadState
+
+
+SIZE_BUCKETS = (
+    1024, 16 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2,
+    64 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3, 4 * 1024 ** 3, 16 * 1024 ** 3,
+)
+QUEUE_STATES = (UploadState.PENDING, UploadState.UPLOADING, UploadState.FAILED)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+upload_bytes = Histogram(
+    "files_upload_bytes", "Size of files accepted by the API", buckets=SIZE_BUCKETS
+)
+save_duration = Histogram(
+    "files_save_to_disk_seconds", "Time spent writing an upload to local disk", buckets=DURATION_BUCKETS
+)
+db_commit_duration = Histogram(
+    "files_db_commit_seconds", "Time spent committing file records", buckets=DURATION_BUCKETS
+)
+cloud_upload_duration = Histogram(
+    "files_cloud_upload_seconds", "Time spent uploading a file to cloud storage",
+    ["method"], buckets=DURATION_BUCKETS
+)
+cloud_upload_failures = Counter(
+    "files_cloud_upload_failures", "Failed attempts to upload a file to cloud storage"
+)
+cleanup_duration = Histogram(
+    "files_cleanup_seconds", "Duration of the unused files cleanup job",
+    buckets=(1, 5, 15, 60, 300, 900, 1800, 3600, 7200)
+)
+cleanup_deleted = Counter(
+    "files_cleanup_deleted", "Files deleted by the cleanup job", ["location"]
+)
+upload_queue_depth = Gauge(
+    "files_upload_queue_depth", "Files not yet uploaded to cloud storage by upload state", ["state"]
+)
+upload_queue_oldest_age = Gauge(
+    "files_upload_queue_oldest_age_seconds", "Age of the oldest file waiting for cloud upload"
+)
+db_pool_connections = Gauge(
+    "files_db_pool_connections", "Connections of the database pool", ["state"]
+)
+metadata_cache_requests = Gauge(
+    "files_metadata_cache_requests", "Metadata cache lookups since start", ["result"]
+)
+upload_rejections = Counter(
+    "files_upload_rejections", "Uploads rejected by admission control", ["reason"]
+)
+
+log_records_dropped = Gauge(
+    "files_log_records_dropped", "Log records dropped because the logging queue was full"
+)
+
+
+async def collect_queue_metrics(db: AsyncSession) -> None:
+    """
+    Обновляет метрики очереди загрузки в облако.
+
+    Счётчики собираются одним запросом по индексу (upload_state, created_at, id)
+    в момент опроса /metrics, а не поддерживаются на горячем пути. Уже
+    загруженные файлы не считаются: их большинство, и очередь они не занимают.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: None
+    :rtype: None
+    """
+    rows = await db.execute(
+        select(FileModel.upload_state, func.count(), func.min(FileModel.created_at))
+        .where(FileModel.upload_state.in_(QUEUE_STATES))
+        .group_by(FileModel.upload_state)
+    )
+    oldest = None
+    depth = dict.fromkeys(QUEUE_STATES, 0)
+    for state, count, created_at in rows:
+        depth[state] = count
+        if state in (UploadState.PENDING, UploadState.UPLOADING) and created_at is not None:
+            oldest = created_at if oldest is None else min(oldest, created_at)
+
+    for state, count in depth.items():
+        upload_queue_depth.labels(state).set(count)
+    upload_queue_oldest_age.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0)
+
+
+def collect_process_metrics(pool: dict, cache: dict, log_dropped: int = 0) -> None:
+    """
+    Переносит счётчики пула соединений, кеша метаданных и очереди лога в метрики.
+
+    :param pool: Счётчики пула, как их возвращает pool_status.
+    :type pool: dict
+    :param cache: Счётчики кеша, как их возвращает MetadataCache.stats.
+    :type cache: dict
+    :param log_dropped: Количество записей лога, отброшенных при переполненной очереди.
+    :type log_dropped: int
+    :return: None
+    :rtype: None
+    """
+    for state, value in pool.items():
+        db_pool_connections.labels(state).set(value)
+    for result, value in cache.items():
+        metadata_cache_requests.labels(result).set(value)
+    log_records_dropped.set(log_dropped)
+
+
+def render_metrics() -> tuple:
+    """
+    Возвращает метрики в текстовом формате Prometheus.
+
+    :return: Тело ответа и его Content-Type.
+    :rtype: tuple
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
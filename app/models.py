@@ -1,9 +1,42 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, DateTime, Index, JSON, UniqueConstraint
 from datetime import datetime
 
 from app.database import Base
 
 
+class UploadState:
+    """
+    Состояния копирования файла в облачное хранилище.
+
+    Атрибуты:
+        PENDING: Файл ждёт загрузки (в том числе повторной после ошибки).
+        UPLOADING: Файл захвачен воркером и загружается.
+        DONE: Копия в облаке создана.
+        FAILED: Исчерпаны все попытки загрузки.
+    """
+    PENDING = "pending"
+    UPLOADING = "uploading"
+    DONE = "done"
+    FAILED = "failed"
+    ALL = (PENDING, UPLOADING, DONE, FAILED)
+
+
+class MediaState:
+    """
+    Состояния извлечения свойств медиа из файла.
+
+    Атрибуты:
+        PENDING: Файл ждёт разбора.
+        PROCESSING: Файл захвачен воркером и разбирается.
+        DONE: Свойства извлечены.
+        FAILED: Файл не удалось прочитать.
+    """
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class FileMetadata(Base):
     """
     Модель для хранения метаданных файлов в базе данных.
@@ -14,17 +47,135 @@ class FileMetadata(Base):
         original_name: Оригинальное имя файла.
         size: Размер файла в байтах.
         content_type: MIME-тип файла.
-        path: Локальный путь до файла.
+        path: Локальный путь до файла. Записи с одинаковым содержимым ссылаются на один блоб.
         storage_url: URL файла в облачном хранилище.
+        sha256: Контрольная сумма SHA-256 содержимого файла. По ней адресуется блоб,
+            а число записей с одним sha256 — счётчик ссылок на него.
+        md5: Контрольная сумма MD5 содержимого файла, отправляется в облако как Content-MD5.
+            У сжатого блоба это MD5 сжатых байтов, которые лежат на диске и в облаке.
+        upload_state: Состояние загрузки в облако (см. UploadState).
+        upload_attempts: Количество попыток загрузки в облако.
+        next_attempt_at: Время, после которого задачу можно взять в работу. Для
+            захваченной задачи это срок аренды, после которого её заберёт другой воркер.
+        upload_error: Текст последней ошибки загрузки.
+        multipart_upload_id: UploadId незавершённой multipart-загрузки, чтобы продолжить её после сбоя.
+        is_local: Есть ли копия файла на локальном диске (False, если её вытеснили по квоте).
+        last_accessed_at: Время последнего скачивания с точностью ACCESS_TIME_RESOLUTION_SECONDS.
+        verified_at: Время последней проверки целостности копий файла.
+        detected_type: MIME-тип, определённый по содержимому файла.
+        media_info: Свойства медиа: размеры изображения, длительность, контейнер и кодеки.
+        media_state: Состояние извлечения свойств медиа (см. MediaState). None —
+            файл не разбирается (например, загружен напрямую в облако).
+        media_checked_at: Время захвата файла воркером, а после разбора — время разбора.
+        content_encoding: Чем сжат блоб на диске и в облаке (gzip или zstd), None — не сжат.
+            size и sha256 относятся к исходному содержимому.
+        stored_size: Размер блоба на диске и в облаке (сжатого, если задан content_encoding).
+            None у сжатых записей, созданных до появления колонки.
         created_at: Дата и время создания записи.
     """
     __tablename__ = "file_metadata"
+    __table_args__ = (
+        Index("ix_file_metadata_upload_queue", "upload_state", "next_attempt_at"),
+        Index("ix_file_metadata_sha256", "sha256"),
+        Index("ix_file_metadata_path", "path"),
+        Index("ix_file_metadata_storage_url", "storage_url"),
+        Index("ix_file_metadata_verified_at", "verified_at"),
+        Index("ix_file_metadata_media_queue", "media_state", "media_checked_at"),
+        Index("ix_file_metadata_created_at_id", "created_at", "id"),
+        Index("ix_file_metadata_content_type_created_at_id", "content_type", "created_at", "id"),
+        Index("ix_file_metadata_upload_state_created_at_id", "upload_state", "created_at", "id"),
+        Index(
+            "ix_file_metadata_original_name",
+            "original_name",
+            postgresql_ops={"original_name": "varchar_pattern_ops"}
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     uid = Column(String, unique=True, index=True)
-    original_name = Column(String, index=True)
-    size = Column(Integer)
+    original_name = Column(String)
+    size = Column(BigInteger)
     content_type = Column(String)
     path = Column(String)
     storage_url = Column(String, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    md5 = Column(String(32), nullable=True)
+    upload_state = Column(String(16), nullable=False, default=UploadState.PENDING)
+    upload_attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=True, default=datetime.utcnow)
+    upload_error = Column(String, nullable=True)
+    multipart_upload_id = Column(String, nullable=True)
+    is_local = Column(Boolean, nullable=False, default=True)
+    last_accessed_at = Column(DateTime, nullable=True)
+    verified_at = Column(DateTime, nullable=True)
+    detected_type = Column(String(255), nullable=True)
+    media_info = Column(JSON, nullable=True)
+    media_state = Column(String(16), nullable=True, default=MediaState.PENDING)
+    media_checked_at = Column(DateTime, nullable=True)
+    content_encoding = Column(String(16), nullable=True)
+    stored_size = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """
+    Модель сессии возобновляемой загрузки.
+
+    Атрибуты:
+        id: Уникальный идентификатор записи.
+        uid: Идентификатор сессии. После завершения загрузки становится uid файла.
+        original_name: Оригинальное имя файла.
+        content_type: MIME-тип файла.
+        length: Объявленный размер файла в байтах.
+        offset: Сколько байтов уже принято и записано в частичный файл.
+        created_at: Дата и время создания сессии.
+        updated_at: Время последнего принятого фрагмента, по нему истекают брошенные сессии.
+    """
+    __tablename__ = "upload_sessions"
+    __table_args__ = (
+        Index("ix_upload_sessions_updated_at", "updated_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    uid = Column(String, unique=True, index=True, nullable=False)
+    original_name = Column(String)
+    content_type = Column(String)
+    length = Column(BigInteger, nullable=False)
+    offset = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Derivative(Base):
+    """
+    Модель производного файла (миниатюры), построенного из содержимого файла.
+
+    Производные привязаны к содержимому, а не к записи файла, поэтому у
+    файлов с одинаковым SHA-256 они общие.
+
+    Атрибуты:
+        id: Уникальный идентификатор записи.
+        source: SHA-256 исходного содержимого, а у файлов без него — uid.
+        kind: Вид производного файла, например thumbnail.
+        width: Ширина, под которую строился производный файл.
+        path: Путь до производного файла на локальном диске.
+        size: Размер производного файла в байтах.
+        content_type: MIME-тип производного файла.
+        storage_url: URL копии в облачном хранилище, если она есть.
+        created_at: Дата и время создания.
+    """
+    __tablename__ = "derivatives"
+    __table_args__ = (
+        UniqueConstraint("source", "kind", "width", name="uq_derivatives_source_kind_width"),
+        Index("ix_derivatives_storage_url", "storage_url"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(64), nullable=False)
+    kind = Column(String(32), nullable=False)
+    width = Column(Integer, nullable=False)
+    path = Column(String, nullable=False)
+    size = Column(BigInteger)
+    content_type = Column(String)
+    storage_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,168 @@
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+
+
+MAX_PART_HEADERS_SIZE = 16 * 1024
+
+
+class MultipartError(ValueError):
+    """
+    Тело запроса не является корректным multipart/form-data или нарушает лимиты.
+    """
+
+
+class MultipartFile(NamedTuple):
+    """
+    Часть формы с файлом.
+
+    Атрибуты:
+        field_name: Имя поля формы.
+        filename: Имя файла из Content-Disposition.
+        content_type: MIME-тип из заголовка части или None.
+    """
+    field_name: str
+    filename: str
+    content_type: Optional[str]
+
+
+def decode_option(value: bytes, charset: str) -> str:
+    """
+    Декодирует значение из заголовка части так же, как Starlette: в кодировке формы, а при ошибке в latin-1.
+
+    :param value: Значение в байтах.
+    :type value: bytes
+    :param charset: Кодировка формы.
+    :type charset: str
+    :return: Строка.
+    :rtype: str
+    """
+    try:
+        return value.decode(charset)
+    except (UnicodeDecodeError, LookupError):
+        return value.decode("latin-1")
+
+
+class MultipartReader:
+    """
+    Разбирает multipart/form-data по мере чтения тела запроса.
+
+    В отличие от Request.form, части с файлами не копятся во временных
+    файлах и в памяти: их содержимое отдаётся событиями ("data", чанк) сразу
+    после разбора очередного чанка тела. Значения обычных полей не нужны
+    загрузке и отбрасываются, но учитываются в лимите max_fields.
+
+    События iter_events:
+        ("file", MultipartFile) — началась часть с файлом;
+        ("data", bytes) — очередной кусок содержимого файла;
+        ("end", None) — часть с файлом закончилась.
+
+    :ivar files: Количество частей с файлами.
+    :ivar fields: Количество обычных полей.
+    """
+
+    def __init__(self, headers: Headers, max_files: int, max_fields: int):
+        content_type, params = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise MultipartError("Expected multipart/form-data with a boundary")
+        charset = params.get(b"charset", b"utf-8")
+        self.charset = charset.decode("latin-1") if isinstance(charset, bytes) else charset
+        self.max_files = max_files
+        self.max_fields = max_fields
+        self.files = 0
+        self.fields = 0
+        self.events: List[Tuple[str, object]] = []
+        self.header_name = b""
+        self.header_value = b""
+        self.headers_size = 0
+        self.part_headers: dict = {}
+        self.is_file = False
+        self.parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+
+    def on_part_begin(self) -> None:
+        self.part_headers = {}
+        self.headers_size = 0
+        self.is_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.add_header_bytes(end - start)
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.add_header_bytes(end - start)
+        self.header_value += data[start:end]
+
+    def add_header_bytes(self, size: int) -> None:
+        self.headers_size += size
+        if self.headers_size > MAX_PART_HEADERS_SIZE:
+            raise MultipartError("Part headers are too large")
+
+    def on_header_end(self) -> None:
+        self.part_headers[self.header_name.lower()] = self.header_value
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.part_headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise MultipartError('The Content-Disposition header field "name" must be provided')
+
+        if b"filename" not in options:
+            self.fields += 1
+            if self.fields > self.max_fields:
+                raise MultipartError(f"Too many fields. Maximum number of fields is {self.max_fields}")
+            return
+
+        self.files += 1
+        if self.files > self.max_files:
+            raise MultipartError(f"Too many files. Maximum number of files is {self.max_files}")
+        self.is_file = True
+        content_type = self.part_headers.get(b"content-type")
+        self.events.append(("file", MultipartFile(
+            decode_option(options[b"name"], self.charset),
+            decode_option(options[b"filename"], self.charset),
+            content_type.decode("latin-1") if content_type else None,
+        )))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.is_file and end > start:
+            self.events.append(("data", data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self.is_file:
+            self.events.append(("end", None))
+            self.is_file = False
+
+    async def iter_events(self, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Читает тело запроса и отдаёт события частей с файлами.
+
+        В памяти держится не больше одного чанка тела.
+
+        :param stream: Тело запроса.
+        :type stream: AsyncIterator[bytes]
+        :return: Асинхронный итератор событий.
+        :rtype: AsyncIterator[Tuple[str, object]]
+        :raises MultipartError: Если тело некорректно, оборвано посреди файла или нарушены лимиты.
+        """
+        async for chunk in stream:
+            try:
+                self.parser.write(chunk)
+            except MultipartError:
+                raise
+            except Exception as e:
+                raise MultipartError(f"Malformed multipart body: {e}")
+            events, self.events = self.events, []
+            for event in events:
+                yield event
+        if self.is_file:
+            raise MultipartError("Multipart body ended in the middle of a file")
@@ -0,0 +1,235 @@
+import os
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from email.utils import formatdate
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_db
+from app.media import ImageTooLarge, make_thumbnail
+from app.models import Derivative, FileMetadata as FileModel
+from app.routers.files import get_cached_file_record, has_cloud_copy, rehydrate_blob, mark_blob_local
+from app.utils import derivative_path, derivative_key, is_not_modified
+from app.tasks import run_in_media_executor
+from app.cloud_storage import (
+    generate_presigned_download_url,
+    upload_file_to_cloud,
+    run_in_cloud_executor,
+)
+from app.configs import (
+    THUMBNAIL_WIDTHS,
+    THUMBNAIL_QUALITY,
+    DERIVATIVES_UPLOAD_TO_CLOUD,
+    logger,
+)
+
+
+router = APIRouter(
+    prefix="/files",
+    tags=["derivatives"]
+)
+
+THUMBNAIL = "thumbnail"
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+generations: dict = {}
+
+
+def thumbnail_width(requested: int) -> int:
+    """
+    Округляет запрошенную ширину вверх до ближайшей из THUMBNAIL_WIDTHS.
+
+    Набор ширин ограничен, чтобы произвольные w не плодили миниатюры.
+
+    :param requested: Запрошенная ширина.
+    :type requested: int
+    :return: Ширина миниатюры.
+    :rtype: int
+    """
+    return next((width for width in THUMBNAIL_WIDTHS if width >= requested), THUMBNAIL_WIDTHS[-1])
+
+
+async def build_thumbnail(file_record: FileModel, path: str, width: int) -> tuple:
+    """
+    Строит миниатюру в пуле процессов и при необходимости копирует её в облако.
+
+    Если исходник вытеснен с диска, он сначала скачивается из облака.
+
+    :param file_record: Запись исходного файла.
+    :type file_record: FileMetadata
+    :param path: Путь до миниатюры.
+    :type path: str
+    :param width: Ширина миниатюры.
+    :type width: int
+    :return: Размер миниатюры в байтах, URL её копии в облаке и признак того,
+        что исходник был скачан из облака.
+    :rtype: tuple
+    :raises FileNotFoundError: Если исходника нет ни на диске, ни в облаке.
+    :raises OSError: Если исходник не удалось декодировать как изображение.
+    """
+    rehydrated = False
+    if not await run_in_threadpool(os.path.exists, file_record.path):
+        if not has_cloud_copy(file_record) or not await rehydrate_blob(
+            file_record.path, file_record.sha256, file_record.content_encoding
+        ):
+            raise FileNotFoundError(f"Source of {file_record.uid} is not available")
+        rehydrated = True
+
+    _, _, size = await run_in_media_executor(make_thumbnail, file_record.path, path, width, THUMBNAIL_QUALITY)
+
+    storage_url = None
+    if DERIVATIVES_UPLOAD_TO_CLOUD:
+        try:
+            storage_url = await run_in_cloud_executor(upload_file_to_cloud, path, derivative_key(path))
+        except Exception as e:
+            logger.warning(f"Failed to upload thumbnail {path} to cloud: {e}")
+    return size, storage_url, rehydrated
+
+
+async def generate_thumbnail(file_record: FileModel, path: str, width: int) -> tuple:
+    """
+    Строит миниатюру не более одного раза на все одновременные запросы.
+
+    Запросы той же миниатюры (того же содержимого и ширины) ждут общую
+    задачу; если клиент, запустивший её, отключится, построение всё равно
+    завершится.
+
+    :param file_record: Запись исходного файла.
+    :type file_record: FileMetadata
+    :param path: Путь до миниатюры.
+    :type path: str
+    :param width: Ширина миниатюры.
+    :type width: int
+    :return: Признак того, что задачу запустил этот запрос, и результат build_thumbnail.
+    :rtype: tuple
+    """
+    task = generations.get(path)
+    created = task is None
+    if created:
+        task = asyncio.ensure_future(build_thumbnail(file_record, path, width))
+        generations[path] = task
+        task.add_done_callback(lambda _: generations.pop(path, None))
+    return created, await asyncio.shield(task)
+
+
+async def save_derivative(db: AsyncSession, derivative: Derivative | None, **values) -> None:
+    """
+    Создаёт или обновляет запись о производном файле.
+
+    Если запись параллельно создала другая реплика, её версия остаётся.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param derivative: Существующая запись или None.
+    :type derivative: Derivative | None
+    :param values: Значения колонок.
+    :return: None
+    :rtype: None
+    """
+    if derivative is None:
+        db.add(Derivative(**values))
+    else:
+        for name, value in values.items():
+            setattr(derivative, name, value)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+
+
+@router.get("/{uid}/thumbnail")
+async def get_thumbnail(
+    uid: str,
+    request: Request,
+    w: int = Query(256, ge=1),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Отдаёт миниатюру изображения шириной не больше w в формате WebP.
+
+    Ширина округляется вверх до ближайшей из THUMBNAIL_WIDTHS. Миниатюра
+    строится при первом запросе в пуле процессов и сохраняется в
+    LOCAL_DERIVATIVES_PATH (и в облаке при DERIVATIVES_UPLOAD_TO_CLOUD),
+    повторные запросы отдают готовый файл без обращения к базе. Если
+    локальной копии нет, а облачная есть, клиент перенаправляется на неё.
+    Миниатюры общие для файлов с одинаковым содержимым и не меняются,
+    поэтому кешируются клиентами без срока.
+
+    :param uid: Уникальный идентификатор файла.
+    :type uid: str
+    :param request: HTTP-запрос.
+    :type request: Request
+    :param w: Наибольшая ширина миниатюры.
+    :type w: int
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Миниатюра, 304 или редирект в облако.
+    :rtype: Response
+    :raises HTTPException: Если файл не найден (404), не является изображением
+        или не декодируется (415), слишком велик (413) или упал процесс пула (503).
+    """
+    file_record = await get_cached_file_record(db, uid)
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    media_type = file_record.detected_type or file_record.content_type or ""
+    if not media_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Thumbnails are available only for images")
+
+    width = thumbnail_width(w)
+    source = file_record.sha256 or file_record.uid
+    path = derivative_path(source, THUMBNAIL, width)
+
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        derivative = await db.scalar(
+            select(Derivative).where(
+                Derivative.source == source, Derivative.kind == THUMBNAIL, Derivative.width == width
+            )
+        )
+        if derivative is not None and derivative.storage_url:
+            url = await run_in_cloud_executor(
+                generate_presigned_download_url, derivative_key(path), os.path.basename(path), THUMBNAIL_CONTENT_TYPE
+            )
+            return RedirectResponse(url, status_code=307)
+
+        try:
+            created, (size, storage_url, rehydrated) = await generate_thumbnail(file_record, path, width)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found on disk")
+        except OSError as e:
+            logger.warning(f"Failed to build thumbnail of {uid}: {e}")
+            raise HTTPException(status_code=415, detail="Image could not be decoded")
+        except ImageTooLarge as e:
+            logger.warning(f"Refused to build thumbnail of {uid}: {e}")
+            raise HTTPException(status_code=413, detail="Image is too large")
+        except BrokenProcessPool:
+            # Пул уже пересоздан в run_in_media_executor, повтор запроса пройдёт.
+            raise HTTPException(
+                status_code=503, detail="Thumbnail worker crashed, try again", headers={"Retry-After": "1"}
+            )
+
+        if created:
+            if rehydrated:
+                await mark_blob_local(db, file_record.path)
+            await save_derivative(
+                db, derivative, source=source, kind=THUMBNAIL, width=width, path=path, size=size,
+                content_type=THUMBNAIL_CONTENT_TYPE, storage_url=storage_url
+            )
+        stat = await run_in_threadpool(os.stat, path)
+
+    etag = f'"{source}-{THUMBNAIL}-{width}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if is_not_modified(request.headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=THUMBNAIL_CONTENT_TYPE, headers=headers, stat_result=stat)
@@ -0,0 +1,206 @@
+import math
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import FileMetadata as FileModel, UploadState
+from app.routers.files import get_file_record
+from app.utils import generate_uid, storage_path
+from app.cloud_storage import (
+    cloud_url,
+    delete_file_from_cloud,
+    head_cloud_file,
+    generate_presigned_upload_url,
+    create_presigned_multipart_upload,
+    complete_presigned_multipart_upload,
+    run_in_cloud_executor,
+)
+from app.configs import (
+    MULTIPART_THRESHOLD,
+    MULTIPART_PART_SIZE,
+    PRESIGNED_URL_EXPIRES,
+    RESUMABLE_UPLOAD_MAX_SIZE,
+    logger,
+)
+
+
+router = APIRouter(
+    prefix="/files/direct",
+    tags=["direct uploads"]
+)
+
+MAX_MULTIPART_PARTS = 10000
+
+
+class UploadedPart(BaseModel):
+    """
+    Часть multipart-загрузки, отправленная клиентом.
+
+    Атрибуты:
+        part_number: Номер части.
+        etag: ETag из ответа хранилища на PUT части.
+    """
+    part_number: int
+    etag: str
+
+
+class DirectUploadCompletion(BaseModel):
+    """
+    Тело запроса завершения прямой загрузки.
+
+    Атрибуты:
+        upload_id: UploadId multipart-загрузки (не нужен для загрузки одним PUT).
+        parts: Номера и ETag отправленных частей multipart-загрузки.
+    """
+    upload_id: Optional[str] = None
+    parts: List[UploadedPart] = []
+
+
+def check_direct_uid(uid: str) -> None:
+    """
+    Проверяет, что uid мог быть выдан create_direct_upload.
+
+    Ключ объекта в облаке равен uid, поэтому произвольный ключ (например,
+    SHA-256 чужого блоба) позволил бы завести запись на чужой объект.
+
+    :param uid: Уникальный идентификатор файла.
+    :type uid: str
+    :return: None
+    :rtype: None
+    :raises HTTPException: Если uid не UUID.
+    """
+    try:
+        UUID(uid)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Direct upload not found")
+
+
+@router.post("")
+async def create_direct_upload(
+    filename: str,
+    size: int = Query(..., ge=0, le=RESUMABLE_UPLOAD_MAX_SIZE),
+    content_type: str | None = None
+) -> dict:
+    """
+    Выдаёт подписанные ссылки для загрузки файла напрямую в облачное хранилище.
+
+    Файлы меньше MULTIPART_THRESHOLD загружаются одним PUT по ссылке url,
+    большие — multipart-загрузкой: каждая часть размером part_size
+    отправляется PUT по своей ссылке из parts, ETag частей из ответов
+    хранилища передаются в завершение. Содержимое не проходит через сервер.
+
+    :param filename: Оригинальное имя файла.
+    :type filename: str
+    :param size: Размер файла в байтах.
+    :type size: int
+    :param content_type: MIME-тип файла, с которым его нужно отправить.
+    :type content_type: str | None
+    :return: uid будущего файла и ссылки для загрузки.
+    :rtype: dict
+    """
+    uid = generate_uid()
+    response = {"uid": uid, "filename": filename, "expires_in": PRESIGNED_URL_EXPIRES}
+
+    if size < MULTIPART_THRESHOLD:
+        response["url"] = await run_in_cloud_executor(generate_presigned_upload_url, uid, content_type)
+        return response
+
+    part_size = max(MULTIPART_PART_SIZE, math.ceil(size / MAX_MULTIPART_PARTS))
+    part_count = math.ceil(size / part_size)
+    upload_id, urls = await run_in_cloud_executor(create_presigned_multipart_upload, uid, content_type, part_count)
+    response.update({
+        "upload_id": upload_id,
+        "part_size": part_size,
+        "parts": [{"part_number": number, "url": url} for number, url in enumerate(urls, start=1)],
+    })
+    return response
+
+
+@router.post("/{uid}/complete")
+async def complete_direct_upload(
+    uid: str,
+    filename: str,
+    content_type: str | None = None,
+    size: int | None = None,
+    completion: DirectUploadCompletion | None = None,
+    db: AsyncSession = Depends(get_db)
+) -> dict:
+    """
+    Завершает прямую загрузку и сохраняет метаданные файла.
+
+    Для multipart-загрузки сначала собирается объект из частей. Затем
+    объект проверяется HEAD-запросом: размер записи берётся из хранилища,
+    а не со слов клиента. Файл сразу считается загруженным в облако и не
+    имеет локальной копии: при скачивании он будет подтянут из облака или
+    отдан редиректом. Свойства медиа для таких файлов не извлекаются.
+    Повторный вызов возвращает уже созданную запись.
+
+    :param uid: uid, выданный create_direct_upload.
+    :type uid: str
+    :param filename: Оригинальное имя файла.
+    :type filename: str
+    :param content_type: MIME-тип файла.
+    :type content_type: str | None
+    :param size: Ожидаемый размер файла. Если объект другого размера, он удаляется.
+    :type size: int | None
+    :param completion: UploadId и части multipart-загрузки.
+    :type completion: DirectUploadCompletion | None
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Метаданные файла.
+    :rtype: dict
+    :raises HTTPException: Если объекта нет в хранилище, части не приняты или размер не совпал.
+    """
+    check_direct_uid(uid)
+
+    file_record = await get_file_record(db, uid)
+    if file_record is None:
+        if completion is not None and completion.upload_id:
+            parts = [{"PartNumber": part.part_number, "ETag": part.etag} for part in completion.parts]
+            try:
+                await run_in_cloud_executor(complete_presigned_multipart_upload, uid, completion.upload_id, parts)
+            except Exception as e:
+                logger.warning(f"Direct upload {uid} was not completed: {e}")
+                raise HTTPException(status_code=400, detail="Multipart upload could not be completed")
+
+        head = await run_in_cloud_executor(head_cloud_file, uid)
+        if head is None:
+            raise HTTPException(status_code=404, detail="File was not uploaded to the cloud")
+        if size is not None and head["size"] != size:
+            await run_in_cloud_executor(delete_file_from_cloud, uid)
+            raise HTTPException(status_code=400, detail="Uploaded file size does not match")
+
+        file_record = FileModel(
+            uid=uid,
+            original_name=filename,
+            size=head["size"],
+            stored_size=head["size"],
+            content_type=content_type,
+            path=storage_path(uid),
+            storage_url=cloud_url(uid),
+            md5=head["etag"] if "-" not in head["etag"] else None,
+            upload_state=UploadState.DONE,
+            next_attempt_at=None,
+            is_local=False,
+            media_state=None
+        )
+        db.add(file_record)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Параллельный вызов завершения уже создал запись.
+            await db.rollback()
+            file_record = await get_file_record(db, uid)
+        logger.info(f"Direct upload {uid} completed: {file_record.size} bytes")
+
+    return {
+        "uid": uid,
+        "filename": file_record.original_name,
+        "size": file_record.size,
+        "content_type": file_record.content_type
+    }
@@ -1,13 +1,62 @@
 import os
+import asyncio
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from functools import partial
+from typing import AsyncIterator, BinaryIO, Iterator, List, Literal
 
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, Query
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, insert, select, update, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from app.archive import ARCHIVE_MEDIA_TYPES, ArchiveEntry, archive_names, iter_archive
+from app.compression import decoded_sha256, iter_decoded, open_decoded
+from app.multipart import MultipartError, MultipartReader
+from app.cache import metadata_cache
 from app.database import get_db
-from app.models import FileMetadata as FileModel
-from app.utils import save_file_locally, generate_uid
-from app.cloud_storage import delete_file_from_cloud, upload_to_cloud_and_update_db
-from app.configs import LOCAL_STORAGE_PATH, logger
+from app.metrics import db_commit_duration, upload_bytes
+from app.models import Derivative, FileMetadata as FileModel, UploadState
+from app.utils import (
+    save_file_locally,
+    save_stream_locally,
+    generate_uid,
+    parse_range_header,
+    iter_file_range,
+    is_not_modified,
+    place_upload,
+    accepts_encoding,
+    content_disposition,
+    encode_cursor,
+    decode_cursor,
+    derivative_key,
+    file_checksums,
+)
+from app.cloud_storage import (
+    delete_file_from_cloud,
+    delete_files_from_cloud,
+    download_file_from_cloud,
+    generate_presigned_download_url,
+    open_cloud_file,
+    run_in_cloud_executor,
+)
+from app.tasks import notify_upload_queue, notify_media_queue
+from app.configs import (
+    MAX_CONCURRENT_UPLOADS,
+    STREAM_CHUNK_SIZE,
+    LIST_PAGE_SIZE_MAX,
+    BATCH_UPLOAD_MAX_FILES,
+    BULK_MAX_UIDS,
+    LOCAL_STORAGE_TMP_PATH,
+    LOCAL_REHYDRATE_ON_MISS,
+    ACCESS_TIME_RESOLUTION_SECONDS,
+    MULTIPART_PART_SIZE,
+    logger,
+)
 
 
 router = APIRouter(
@@ -15,104 +64,1171 @@ router = APIRouter(
     tags=["files"]
 )
 
+upload_slots = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+rehydrations: dict = {}
+
+
+class BulkFilesRequest(BaseModel):
+    """
+    Тело запроса массовых операций с файлами.
+
+    Атрибуты:
+        uids: Уникальные идентификаторы файлов, не больше BULK_MAX_UIDS.
+    """
+    uids: List[str] = Field(..., min_length=1, max_length=BULK_MAX_UIDS)
+
+
+class ArchiveRequest(BulkFilesRequest):
+    """
+    Тело запроса скачивания файлов архивом.
+
+    Атрибуты:
+        format: Формат архива: zip (без сжатия) или tar.
+    """
+    format: Literal["zip", "tar"] = "zip"
+
+
+async def store_file_record(db: AsyncSession, file_record: FileModel, temp_path: str) -> bool:
+    """
+    Переносит загруженный файл в блоб по его SHA-256 и сохраняет запись о файле.
+
+    Строки с тем же SHA-256 блокируются до коммита, поэтому параллельное удаление
+    последней ссылки на блоб не удалит его из-под новой записи. Если блоб уже
+    есть в облаке, запись сразу получает его URL и не попадает в очередь загрузки.
+    Новое сжимаемое содержимое сохраняется сжатым (см. place_upload), запись
+    повторного содержимого наследует кодирование блоба.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param file_record: Запись файла с заполненным sha256.
+    :type file_record: FileMetadata
+    :param temp_path: Путь до временного файла.
+    :type temp_path: str
+    :return: True, если такое содержимое уже было загружено.
+    :rtype: bool
+    """
+    duplicates = (
+        await db.scalars(
+            select(FileModel).where(FileModel.sha256 == file_record.sha256).order_by(FileModel.id).with_for_update()
+        )
+    ).all()
+    uploaded = next((d for d in duplicates if d.upload_state == UploadState.DONE), None)
+    if uploaded is not None:
+        file_record.storage_url = uploaded.storage_url
+        file_record.upload_state = UploadState.DONE
+        file_record.next_attempt_at = None
+
+    try:
+        encoding = duplicates[0].content_encoding if duplicates else None
+        file_record.path, file_record.content_encoding, md5, file_record.stored_size = await run_in_threadpool(
+            place_upload, temp_path, file_record.sha256, file_record.size, bool(duplicates), encoding
+        )
+        if file_record.content_encoding:
+            file_record.md5 = md5 or duplicates[0].md5
+        if any(not d.is_local and d.path == file_record.path for d in duplicates):
+            # Блоб был вытеснен на облако, а теперь снова лежит на диске.
+            await db.execute(update(FileModel).where(FileModel.path == file_record.path).values(is_local=True))
+        db.add(file_record)
+        with db_commit_duration.time():
+            await db.commit()
+    except BaseException:
+        await db.rollback()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    upload_bytes.observe(file_record.size)
+    notify_media_queue()
+    return bool(duplicates)
+
+
+async def store_file_records(db: AsyncSession, files: list) -> list:
+    """
+    Переносит пачку загруженных файлов в блобы и вставляет записи одним INSERT.
+
+    Работает как store_file_record, но блокирует строки всех SHA-256 пачки
+    одним запросом и сохраняет записи одним многострочным INSERT в одной
+    транзакции. Файл, который не удалось перенести в хранилище, пропускается,
+    остальные сохраняются.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param files: Словари с полями записи (uid, original_name, size,
+        content_type, sha256, md5) и путём до временного файла в temp_path.
+    :type files: list
+    :return: Результаты по файлам в исходном порядке: словарь с полями записи,
+        deduplicated и upload_state или словарь с error.
+    :rtype: list
+    """
+    duplicates = (
+        await db.scalars(
+            select(FileModel)
+            .where(FileModel.sha256.in_({f["sha256"] for f in files}))
+            .order_by(FileModel.id)
+            .with_for_update()
+        )
+    ).all()
+    known = {d.sha256 for d in duplicates}
+    uploaded = {d.sha256: d.storage_url for d in duplicates if d.upload_state == UploadState.DONE}
+    evicted = {d.path for d in duplicates if not d.is_local}
+    blobs = {d.sha256: (d.content_encoding, d.md5) for d in duplicates}
+
+    def place_blobs() -> list:
+        placed = []
+        for f in files:
+            try:
+                encoding, md5 = blobs.get(f["sha256"], (None, None))
+                path, encoding, stored_md5, stored_size = place_upload(
+                    f["temp_path"], f["sha256"], f["size"], f["sha256"] in blobs, encoding
+                )
+                if f["sha256"] not in blobs or stored_md5:
+                    blobs[f["sha256"]] = encoding, stored_md5 or f["md5"]
+                placed.append((path, encoding, blobs[f["sha256"]][1] if encoding else f["md5"], stored_size))
+            except OSError as e:
+                logger.error(f"Failed to store {f['original_name']}: {e}")
+                if os.path.exists(f["temp_path"]):
+                    os.remove(f["temp_path"])
+                placed.append((None, None, None, None))
+        return placed
+
+    results, rows = [], []
+    for f, (path, encoding, md5, stored_size) in zip(files, await run_in_threadpool(place_blobs)):
+        if path is None:
+            results.append({"filename": f["original_name"], "error": "Failed to store file"})
+            continue
+
+        done = f["sha256"] in uploaded
+        rows.append({
+            "uid": f["uid"],
+            "original_name": f["original_name"],
+            "size": f["size"],
+            "content_type": f["content_type"],
+            "path": path,
+            "sha256": f["sha256"],
+            "md5": md5,
+            "content_encoding": encoding,
+            "stored_size": stored_size,
+            "storage_url": uploaded.get(f["sha256"]),
+            "upload_state": UploadState.DONE if done else UploadState.PENDING,
+            "next_attempt_at": None if done else datetime.utcnow(),
+        })
+        results.append({
+            "uid": f["uid"],
+            "filename": f["original_name"],
+            "size": f["size"],
+            "content_type": f["content_type"],
+            "deduplicated": f["sha256"] in known,
+            "upload_state": rows[-1]["upload_state"],
+        })
+        known.add(f["sha256"])
+
+        if path in evicted:
+            await db.execute(update(FileModel).where(FileModel.path == path).values(is_local=True))
+            evicted.discard(path)
+
+    try:
+        with db_commit_duration.time():
+            if rows:
+                await db.execute(insert(FileModel), rows)
+            await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    for row in rows:
+        upload_bytes.observe(row["size"])
+    if rows:
+        notify_media_queue()
+    return results
+
+
+async def get_file_record(db: AsyncSession, uid: str) -> FileModel | None:
+    """
+    Ищет запись о файле по его уникальному идентификатору (UID).
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param uid: Уникальный идентификатор файла.
+    :type uid: str
+    :return: Запись файла или None, если она не найдена.
+    :rtype: FileMetadata | None
+    """
+    return await db.scalar(select(FileModel).where(FileModel.uid == uid))
+
+
+async def get_cached_file_record(db: AsyncSession, uid: str) -> FileModel | None:
+    """
+    Ищет запись о файле сначала в кеше метаданных, затем в базе данных.
+
+    Запись из кеша отсоединена от сессии, поэтому для изменения или удаления
+    записи её нужно получать через get_file_record.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param uid: Уникальный идентификатор файла.
+    :type uid: str
+    :return: Запись файла или None, если она не найдена.
+    :rtype: FileMetadata | None
+    """
+    file_record = await metadata_cache.get(uid)
+    if file_record is None:
+        file_record = await get_file_record(db, uid)
+        if file_record is not None:
+            await metadata_cache.set(file_record)
+    return file_record
+
+
+async def touch_file_record(db: AsyncSession, file_record: FileModel) -> None:
+    """
+    Обновляет время последнего скачивания файла для вытеснения по LRU.
+
+    Время пишется не чаще раза в ACCESS_TIME_RESOLUTION_SECONDS, чтобы
+    популярные файлы не превращали каждое чтение в запись в базу.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param file_record: Запись файла.
+    :type file_record: FileMetadata
+    :return: None
+    :rtype: None
+    """
+    now = datetime.utcnow()
+    accessed_at = file_record.last_accessed_at
+    if accessed_at is not None and now - accessed_at < timedelta(seconds=ACCESS_TIME_RESOLUTION_SECONDS):
+        return
+    await db.execute(update(FileModel).where(FileModel.id == file_record.id).values(last_accessed_at=now))
+    await db.commit()
+    await metadata_cache.invalidate(file_record.uid)
+
+
+def has_cloud_copy(file_record: FileModel) -> bool:
+    """
+    Проверяет, можно ли читать файл из облака.
+
+    Запись, поставленная на повторную загрузку, может ещё ссылаться на
+    испорченную облачную копию, поэтому нужна и загрузка в состоянии done.
+
+    :param file_record: Запись файла.
+    :type file_record: FileMetadata
+    :return: True, если облачная копия загружена.
+    :rtype: bool
+    """
+    return bool(file_record.storage_url) and file_record.upload_state == UploadState.DONE
+
+
+class CloudCopyCorrupted(Exception):
+    """
+    Скачанная из облака копия блоба не совпадает с SHA-256 записи.
+    """
+
+
+def blob_matches(path: str, sha256: str, encoding: str | None) -> bool:
+    """
+    Сверяет содержимое блоба (распакованное, если он сжат) с SHA-256 записи.
+
+    :param path: Путь до блоба.
+    :type path: str
+    :param sha256: SHA-256 исходного содержимого в hex.
+    :type sha256: str
+    :param encoding: Кодирование сжатого блоба или None.
+    :type encoding: str | None
+    :return: True, если содержимое совпадает.
+    :rtype: bool
+    """
+    try:
+        if encoding:
+            return decoded_sha256(path, encoding) == sha256
+        return file_checksums(path, MULTIPART_PART_SIZE)[0] == sha256
+    except (OSError, EOFError):
+        return False
+
+
+async def mark_blob_local(db: AsyncSession, path: str) -> None:
+    """
+    Отмечает блоб снова лежащим на локальном диске у всех ссылающихся записей.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param path: Путь до блоба.
+    :type path: str
+    :return: None
+    :rtype: None
+    """
+    await db.execute(update(FileModel).where(FileModel.path == path).values(is_local=True))
+    await db.commit()
+
+
+async def fetch_blob(path: str, sha256: str | None = None, encoding: str | None = None) -> None:
+    """
+    Скачивает вытесненный блоб из облака обратно на диск.
+
+    Файл сначала пишется во временный каталог, сверяется с SHA-256 записи и
+    появляется по своему пути целиком, так что параллельные читатели не
+    увидят недокачанный или испорченный блоб.
+
+    :param path: Путь до блоба.
+    :type path: str
+    :param sha256: SHA-256 исходного содержимого или None, если он неизвестен
+        (прямая загрузка в облако).
+    :type sha256: str | None
+    :param encoding: Кодирование сжатого блоба или None.
+    :type encoding: str | None
+    :return: None
+    :rtype: None
+    :raises CloudCopyCorrupted: Если скачанная копия не совпадает с SHA-256.
+    """
+    os.makedirs(LOCAL_STORAGE_TMP_PATH, exist_ok=True)
+    temp_path = os.path.join(LOCAL_STORAGE_TMP_PATH, f"{generate_uid()}.part")
+    try:
+        await run_in_cloud_executor(download_file_from_cloud, os.path.basename(path), temp_path)
+        if sha256 and not await run_in_threadpool(blob_matches, temp_path, sha256, encoding):
+            raise CloudCopyCorrupted(f"Cloud copy of {path} does not match its SHA-256")
+        await run_in_threadpool(os.makedirs, os.path.dirname(path), exist_ok=True)
+        await run_in_threadpool(os.replace, temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+async def rehydrate_blob(path: str, sha256: str | None = None, encoding: str | None = None) -> bool:
+    """
+    Возвращает вытесненный блоб на диск, скачивая его не более одного раза.
+
+    Одновременные запросы одного блоба ждут общую задачу скачивания.
+
+    :param path: Путь до блоба.
+    :type path: str
+    :param sha256: SHA-256 исходного содержимого для проверки или None.
+    :type sha256: str | None
+    :param encoding: Кодирование сжатого блоба или None.
+    :type encoding: str | None
+    :return: True, если блоб снова лежит на диске.
+    :rtype: bool
+    :raises HTTPException: Если облачная копия испорчена (502): отдавать её нельзя.
+    """
+    task = rehydrations.get(path)
+    if task is None:
+        task = asyncio.ensure_future(fetch_blob(path, sha256, encoding))
+        rehydrations[path] = task
+        task.add_done_callback(lambda _: rehydrations.pop(path, None))
+
+    try:
+        await asyncio.shield(task)
+    except CloudCopyCorrupted as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=502, detail="Cloud copy of the file is corrupted")
+    except Exception as e:
+        logger.warning(f"Failed to rehydrate {path} from cloud: {e}")
+        return False
+    return True
+
+
+def remove_local_file(path: str) -> None:
+    """
+    Удаляет файл с локального диска, если он есть.
+
+    :param path: Путь до файла.
+    :type path: str
+    :return: None
+    :rtype: None
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def delete_derivatives(db: AsyncSession, sources: list) -> None:
+    """
+    Удаляет производные файлы содержимого с диска, из облака и из базы данных.
+
+    Записи удаляются в текущей транзакции, коммит делает вызывающий.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param sources: SHA-256 содержимого или uid файлов без него.
+    :type sources: list
+    :return: None
+    :rtype: None
+    """
+    derivatives = (await db.scalars(select(Derivative).where(Derivative.source.in_(sources)))).all()
+    if not derivatives:
+        return
+
+    await asyncio.gather(*(run_in_threadpool(remove_local_file, derivative.path) for derivative in derivatives))
+    await db.execute(delete(Derivative).where(Derivative.id.in_([derivative.id for derivative in derivatives])))
+
+    keys = [derivative_key(derivative.path) for derivative in derivatives if derivative.storage_url]
+    if keys:
+        await run_in_cloud_executor(delete_files_from_cloud, keys)
+
+
+async def delete_file_record(db: AsyncSession, file_record: FileModel) -> None:
+    """
+    Удаляет запись о файле из базы данных.
+
+    Блоб на диске и в облаке удаляется вместе с производными файлами, только
+    если на него больше не ссылается ни одна запись с тем же SHA-256. Все строки
+    с этим SHA-256, включая удаляемую, блокируются до коммита в порядке id,
+    как и при загрузке, поэтому параллельные удаления последних ссылок не
+    взаимоблокируются, а параллельная загрузка того же содержимого дождётся
+    удаления и положит блоб заново. Если запись уже удалена параллельным
+    запросом, ничего не делается.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param file_record: Запись файла.
+    :type file_record: FileMetadata
+    :return: None
+    :rtype: None
+    """
+    references = 0
+    if file_record.sha256:
+        locked = (
+            await db.scalars(
+                select(FileModel.id)
+                .where(FileModel.sha256 == file_record.sha256)
+                .order_by(FileModel.id)
+                .with_for_update()
+            )
+        ).all()
+        if file_record.id not in locked:
+            await db.rollback()
+            await metadata_cache.invalidate(file_record.uid)
+            return
+        references = len(locked) - 1
+
+    if references == 0:
+        if os.path.exists(file_record.path):
+            await run_in_threadpool(os.remove, file_record.path)
+        if file_record.storage_url:
+            await run_in_cloud_executor(delete_file_from_cloud, os.path.basename(file_record.path))
+        await delete_derivatives(db, [file_record.sha256 or file_record.uid])
+
+    await db.delete(file_record)
+    await db.commit()
+    await metadata_cache.invalidate(file_record.uid)
+
+
+async def delete_file_records(db: AsyncSession, file_records: list) -> None:
+    """
+    Удаляет пачку записей о файлах в одной транзакции.
+
+    Работает как delete_file_record, но блокирует строки всех SHA-256 пачки
+    (включая удаляемые, в порядке id) одним запросом и удаляет записи одним DELETE. Блобы, на которые больше не
+    ссылается ни одна запись, и их производные удаляются с диска параллельно,
+    а из облака — вызовами delete_objects по 1000 ключей.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param file_records: Записи файлов.
+    :type file_records: list
+    :return: None
+    :rtype: None
+    """
+    ids = {file_record.id for file_record in file_records}
+    sha256s = {file_record.sha256 for file_record in file_records if file_record.sha256}
+    referenced = set()
+    if sha256s:
+        locked = (
+            await db.execute(
+                select(FileModel.id, FileModel.sha256)
+                .where(FileModel.sha256.in_(sha256s))
+                .order_by(FileModel.id)
+                .with_for_update()
+            )
+        ).all()
+        referenced = {sha256 for record_id, sha256 in locked if record_id not in ids}
+
+    orphaned = {}
+    for file_record in file_records:
+        if file_record.sha256 in referenced:
+            continue
+        blob = orphaned.setdefault(file_record.path, {"source": file_record.sha256 or file_record.uid, "cloud": False})
+        blob["cloud"] = blob["cloud"] or bool(file_record.storage_url)
+
+    await asyncio.gather(*(run_in_threadpool(remove_local_file, path) for path in orphaned))
+    keys = [os.path.basename(path) for path, blob in orphaned.items() if blob["cloud"]]
+    if keys:
+        failed = await run_in_cloud_executor(delete_files_from_cloud, keys)
+        if failed:
+            logger.warning(f"Failed to delete {len(failed)} files from cloud, left to the cleanup job")
+    await delete_derivatives(db, list({blob["source"] for blob in orphaned.values()}))
+
+    await db.execute(delete(FileModel).where(FileModel.id.in_(ids)))
+    await db.commit()
+    await metadata_cache.invalidate(*(file_record.uid for file_record in file_records))
+
+
+def open_blob(path: str, key: str | None, encoding: str | None = None) -> BinaryIO:
+    """
+    Открывает блоб на чтение с локального диска, а если он вытеснен — из облака.
+
+    Вытесненный блоб читается потоком и не возвращается на диск.
+    Сжатый блоб распаковывается при чтении.
+
+    :param path: Путь до блоба.
+    :type path: str
+    :param key: Имя блоба в облаке или None, если облачной копии нет.
+    :type key: str | None
+    :param encoding: Кодирование сжатого блоба или None.
+    :type encoding: str | None
+    :return: Файл или поток, открытый на чтение.
+    :rtype: BinaryIO
+    :raises FileNotFoundError: Если блоба нет ни на диске, ни в облаке.
+    """
+    try:
+        source = open(path, "rb")
+    except FileNotFoundError:
+        if key is None:
+            raise
+        source = open_cloud_file(key)
+    return open_decoded(source, encoding) if encoding else source
+
+
+def stream_archive(entries: list, archive_format: str) -> Iterator[bytes]:
+    """
+    Отдаёт архив чанками и пишет в лог ошибку, оборвавшую его на середине.
+
+    :param entries: Файлы архива.
+    :type entries: list
+    :param archive_format: Формат архива.
+    :type archive_format: str
+    :return: Итератор кусков архива.
+    :rtype: Iterator[bytes]
+    """
+    try:
+        yield from iter_archive(entries, archive_format, STREAM_CHUNK_SIZE)
+    except Exception as e:
+        logger.error(f"Archive of {len(entries)} files was interrupted: {e}")
+        raise
+
+
+def describe_file_record(file_record: FileModel) -> dict:
+    """
+    Возвращает метаданные файла для ответа API.
+
+    :param file_record: Запись файла.
+    :type file_record: FileMetadata
+    :return: Метаданные файла, включая определённый по содержимому MIME-тип и свойства медиа.
+    :rtype: dict
+    """
+    return {
+        "uid": file_record.uid,
+        "filename": file_record.original_name,
+        "size": file_record.size,
+        "content_type": file_record.content_type,
+        "sha256": file_record.sha256,
+        "content_encoding": file_record.content_encoding,
+        "upload_state": file_record.upload_state,
+        "detected_type": file_record.detected_type,
+        "media": file_record.media_info,
+        "media_state": file_record.media_state,
+        "created_at": file_record.created_at.isoformat(),
+    }
+
+
+@router.get("")
+async def list_files(
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=LIST_PAGE_SIZE_MAX),
+    content_type: str | None = None,
+    min_size: int | None = Query(None, ge=0),
+    max_size: int | None = Query(None, ge=0),
+    upload_state: str | None = None,
+    name_prefix: str | None = None,
+    db: AsyncSession = Depends(get_db)
+) -> dict:
+    """
+    Возвращает страницу списка файлов, от новых к старым.
+
+    Пагинация курсорная по (created_at, id): следующая страница начинается
+    сразу за последней записью предыдущей, поэтому её стоимость не зависит
+    от глубины листания. Каждому фильтру (content_type, upload_state) и общему
+    порядку соответствует составной индекс с (created_at, id) на конце,
+    поиск по началу имени использует индекс по original_name.
+
+    :param cursor: Курсор next_cursor из предыдущего ответа.
+    :type cursor: str | None
+    :param limit: Размер страницы.
+    :type limit: int
+    :param content_type: MIME-тип файла.
+    :type content_type: str | None
+    :param min_size: Минимальный размер файла в байтах.
+    :type min_size: int | None
+    :param max_size: Максимальный размер файла в байтах.
+    :type max_size: int | None
+    :param upload_state: Состояние загрузки в облако (см. UploadState), done — копия в облаке есть.
+    :type upload_state: str | None
+    :param name_prefix: Начало оригинального имени файла.
+    :type name_prefix: str | None
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Файлы страницы и курсор следующей страницы (None на последней).
+    :rtype: dict
+    :raises HTTPException: Если курсор повреждён или состояние загрузки неизвестно.
+    """
+    query = select(FileModel)
+    if cursor:
+        try:
+            created_at, record_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(FileModel.created_at, FileModel.id) < (created_at, record_id))
+    if content_type:
+        query = query.where(FileModel.content_type == content_type)
+    if min_size is not None:
+        query = query.where(FileModel.size >= min_size)
+    if max_size is not None:
+        query = query.where(FileModel.size <= max_size)
+    if upload_state:
+        if upload_state not in UploadState.ALL:
+            raise HTTPException(status_code=400, detail="Unknown upload state")
+        query = query.where(FileModel.upload_state == upload_state)
+    if name_prefix:
+        query = query.where(FileModel.original_name.startswith(name_prefix, autoescape=True))
+
+    file_records = (
+        await db.scalars(query.order_by(FileModel.created_at.desc(), FileModel.id.desc()).limit(limit + 1))
+    ).all()
+
+    next_cursor = None
+    if len(file_records) > limit:
+        file_records = file_records[:limit]
+        next_cursor = encode_cursor(file_records[-1].created_at, file_records[-1].id)
+
+    return {
+        "files": [describe_file_record(file_record) for file_record in file_records],
+        "next_cursor": next_cursor
+    }
+
 
 @router.post("/upload")
 async def upload_file(
     file: UploadFile,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> dict:
     """
     Загружает файл на сервер и сохраняет его метаданные в базе данных.
 
-    Файл сначала сохраняется локально, после чего его загрузка в облачное хранилище
-    происходит в фоновом режиме. Метаданные файла сохраняются в базе данных.
+    Файл сначала сохраняется локально, после чего ставится в очередь загрузки
+    в облачное хранилище (состояние pending). Метаданные файла сохраняются в базе данных.
+    Запись на диск и запросы к базе не блокируют event loop, а число одновременных
+    записей ограничено MAX_CONCURRENT_UPLOADS. Повторно загруженное содержимое
+    не дублируется ни на диске, ни в облаке.
 
     :param file: Загружаемый файл.
     :type file: UploadFile
-    :param background_tasks: Фоновые задачи FastAPI для выполнения асинхронных операций.
-    :type background_tasks: BackgroundTasks
     :param db: Сессия базы данных.
-    :type db: Session
+    :type db: AsyncSession
     :return: Метаданные загруженного файла.
     :rtype: dict
     """
     uid = generate_uid()
 
-    local_file_path = save_file_locally(file, uid)
+    async with upload_slots:
+        temp_path, size, sha256, md5 = await save_file_locally(file, uid)
 
     file_record = FileModel(
         uid=uid,
         original_name=file.filename,
-        size=file.size,
+        size=size,
         content_type=file.content_type,
-        path=local_file_path,
-        storage_url=None
+        storage_url=None,
+        sha256=sha256,
+        md5=md5
     )
-    db.add(file_record)
-    db.commit()
-    db.refresh(file_record)
+    deduplicated = await store_file_record(db, file_record, temp_path)
 
-    background_tasks.add_task(upload_to_cloud_and_update_db, local_file_path, file_record, db)
+    if file_record.upload_state != UploadState.DONE:
+        notify_upload_queue()
 
     return {
         "uid": uid,
         "filename": file.filename,
-        "size": file.size,
-        "content_type": file.content_type
+        "size": size,
+        "content_type": file.content_type,
+        "deduplicated": deduplicated
     }
 
 
+@router.post("/stream")
+async def upload_file_stream(
+    request: Request,
+    filename: str,
+    db: AsyncSession = Depends(get_db)
+) -> dict:
+    """
+    Принимает файл потоком из тела запроса и сохраняет его метаданные в базе данных.
+
+    Тело запроса читается по чанкам и пишется сразу в хранилище, без
+    временного файла multipart. Размер, SHA-256 и MD5 считаются по записанным байтам.
+
+    :param request: HTTP-запрос с содержимым файла в теле.
+    :type request: Request
+    :param filename: Оригинальное имя файла.
+    :type filename: str
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Метаданные загруженного файла.
+    :rtype: dict
+    """
+    uid = generate_uid()
+    content_type = request.headers.get("content-type", "application/octet-stream")
+
+    async with upload_slots:
+        temp_path, size, sha256, md5 = await save_stream_locally(request.stream(), uid)
+
+    file_record = FileModel(
+        uid=uid,
+        original_name=filename,
+        size=size,
+        content_type=content_type,
+        storage_url=None,
+        sha256=sha256,
+        md5=md5
+    )
+    deduplicated = await store_file_record(db, file_record, temp_path)
+
+    if file_record.upload_state != UploadState.DONE:
+        notify_upload_queue()
+
+    logger.info(f"Stream upload {uid} saved: {size} bytes")
+
+    return {
+        "uid": uid,
+        "filename": filename,
+        "size": size,
+        "content_type": content_type,
+        "sha256": sha256,
+        "md5": md5,
+        "deduplicated": deduplicated
+    }
+
+
+@router.post("/batch")
+async def upload_files_batch(request: Request, db: AsyncSession = Depends(get_db)) -> dict:
+    """
+    Загружает много файлов одним multipart-запросом.
+
+    Тело разбирается по мере чтения (MultipartReader), и каждая часть с
+    файлом пишется прямо во временный файл хранилища, так что в памяти
+    держится не больше чанка тела, а каждый байт пишется на диск один раз.
+    Метаданные всех файлов сохраняются одним INSERT и одним коммитом, после
+    чего очередь загрузки в облако будится один раз. Ошибка записи одного
+    файла не отменяет загрузку остальных.
+
+    :param request: HTTP-запрос с файлами в теле multipart/form-data.
+    :type request: Request
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Результаты по каждому файлу в порядке частей запроса.
+    :rtype: dict
+    :raises HTTPException: Если тело не multipart, в запросе нет файлов или их больше BATCH_UPLOAD_MAX_FILES.
+    """
+    try:
+        reader = MultipartReader(request.headers, BATCH_UPLOAD_MAX_FILES, BATCH_UPLOAD_MAX_FILES)
+    except MultipartError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    events = reader.iter_events(request.stream())
+
+    async def iter_part() -> AsyncIterator[bytes]:
+        async for event, chunk in events:
+            if event == "end":
+                return
+            yield chunk
+
+    uploads = []
+    saved = []
+    try:
+        async for event, part in events:
+            if event != "file":
+                continue
+            uid = generate_uid()
+            uploads.append(part)
+            try:
+                async with upload_slots:
+                    temp_path, size, sha256, md5 = await save_stream_locally(iter_part(), uid)
+            except (MultipartError, ClientDisconnect):
+                raise
+            except Exception as e:
+                saved.append(e)
+                continue
+            saved.append({
+                "uid": uid,
+                "original_name": part.filename,
+                "size": size,
+                "content_type": part.content_type,
+                "sha256": sha256,
+                "md5": md5,
+                "temp_path": temp_path,
+            })
+    except (MultipartError, ClientDisconnect) as e:
+        for f in saved:
+            if isinstance(f, dict):
+                await run_in_threadpool(remove_local_file, f["temp_path"])
+        if isinstance(e, ClientDisconnect):
+            raise
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No files in request")
+
+    stored = await store_file_records(db, [f for f in saved if not isinstance(f, BaseException)])
+
+    results = []
+    stored_results = iter(stored)
+    for file, f in zip(uploads, saved):
+        if isinstance(f, BaseException):
+            logger.error(f"Failed to save {file.filename}: {f}")
+            results.append({"filename": file.filename, "error": "Failed to save file"})
+        else:
+            results.append(next(stored_results))
+
+    if any(r.get("upload_state") == UploadState.PENDING for r in results):
+        notify_upload_queue()
+
+    failed = sum("error" in r for r in results)
+    logger.info(f"Batch upload: {len(results) - failed} saved, {failed} failed")
+
+    return {
+        "files": [{k: v for k, v in r.items() if k != "upload_state"} for r in results],
+        "uploaded": len(results) - failed,
+        "failed": failed
+    }
+
+
+@router.get("/{uid}/metadata")
+async def get_file_metadata(uid: str, db: AsyncSession = Depends(get_db)) -> dict:
+    """
+    Возвращает метаданные файла без его скачивания.
+
+    Кроме сохранённых при загрузке полей в ответе есть MIME-тип, определённый
+    по содержимому, и свойства медиа (размеры изображения, длительность,
+    кодеки), как только их извлечёт фоновый воркер.
+
+    :param uid: Уникальный идентификатор файла.
+    :type uid: str
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Метаданные файла.
+    :rtype: dict
+    :raises HTTPException: Если файл не найден.
+    """
+    file_record = await get_cached_file_record(db, uid)
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+    return describe_file_record(file_record)
+
+
 @router.get("/{uid}")
-async def get_file(uid: str, db: Session = Depends(get_db)) -> dict:
+async def get_file(uid: str, db: AsyncSession = Depends(get_db)) -> dict:
     """
     Возвращает информацию о файле по его уникальному идентификатору (UID).
 
-    Проверяет наличие файла в базе данных и на локальном диске.
+    Проверяет наличие файла в базе данных, на локальном диске или в облачном хранилище.
 
     :param uid: Уникальный идентификатор файла.
     :type uid: str
     :param db: Сессия базы данных.
-    :type db: Session
+    :type db: AsyncSession
     :return: Сообщение о наличии файла.
     :rtype: dict
     :raises HTTPException: Если файл не найден в базе данных или на диске.
     """
-    file_record = db.query(FileModel).filter(FileModel.uid == uid).first()
+    file_record = await get_cached_file_record(db, uid)
     if not file_record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    file_path = os.path.join(LOCAL_STORAGE_PATH, f"{uid}_{file_record.original_name}")
-    if not os.path.exists(file_path):
+    if not has_cloud_copy(file_record) and not os.path.exists(file_record.path):
         raise HTTPException(status_code=404, detail="File not found on disk")
 
     return {"message": f"File {file_record.original_name} is available"}
 
 
+def encoded_file_response(request: Request, file_record: FileModel, stat: os.stat_result, passthrough: bool) -> Response:
+    """
+    Отдаёт сжатый блоб с локального диска.
+
+    Клиенту, принимающему кодирование блоба, байты отдаются как есть с
+    Content-Encoding, остальным — распакованными на лету. У двух
+    представлений разные ETag. Range не поддерживается: по RFC 9110 его
+    можно игнорировать и отдать файл целиком.
+
+    :param request: HTTP-запрос.
+    :type request: Request
+    :param file_record: Запись файла со сжатым блобом.
+    :type file_record: FileMetadata
+    :param stat: Результат os.stat для блоба.
+    :type stat: os.stat_result
+    :param passthrough: Принимает ли клиент кодирование блоба.
+    :type passthrough: bool
+    :return: Содержимое файла или 304.
+    :rtype: Response
+    """
+    encoding = file_record.content_encoding
+    content_type = file_record.content_type or "application/octet-stream"
+    etag = f'"{file_record.sha256}-{encoding}"' if passthrough else f'"{file_record.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "none",
+        "Vary": "Accept-Encoding",
+    }
+
+    if is_not_modified(request.headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if passthrough:
+        headers["Content-Encoding"] = encoding
+        return FileResponse(
+            file_record.path,
+            media_type=content_type,
+            filename=file_record.original_name,
+            headers=headers,
+            stat_result=stat
+        )
+
+    headers["Content-Length"] = str(file_record.size)
+    headers["Content-Disposition"] = content_disposition(file_record.original_name)
+    return StreamingResponse(
+        iter_decoded(open(file_record.path, "rb"), encoding, STREAM_CHUNK_SIZE),
+        media_type=content_type,
+        headers=headers
+    )
+
+
+@router.get("/{uid}/download")
+async def download_file(uid: str, request: Request, db: AsyncSession = Depends(get_db)) -> Response:
+    """
+    Отдаёт содержимое файла по его уникальному идентификатору (UID).
+
+    Поддерживает запросы диапазонов (Range, ответ 206) для перемотки видео и
+    условные запросы по ETag/If-None-Match и Last-Modified/If-Modified-Since.
+    ETag строится по SHA-256 содержимого. Сжатый блоб отдаётся как есть с
+    Content-Encoding, если клиент его принимает, иначе распаковывается на
+    лету; Range для сжатых блобов игнорируется. Если локальная копия вытеснена,
+    блоб скачивается из облака обратно на диск (LOCAL_REHYDRATE_ON_MISS) и
+    сверяется с SHA-256; если это выключено или не удалось, клиент
+    перенаправляется на временную ссылку в облачном хранилище. Облако
+    используется, только если загрузка туда завершена (upload_state done).
+    Время скачивания запоминается для вытеснения по LRU.
+
+    :param uid: Уникальный идентификатор файла.
+    :type uid: str
+    :param request: HTTP-запрос.
+    :type request: Request
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Содержимое файла, его диапазон, 304 или редирект в облако.
+    :rtype: Response
+    :raises HTTPException: Если файл не найден, диапазон не пересекается с
+        файлом или облачная копия испорчена (502).
+    """
+    file_record = await get_cached_file_record(db, uid)
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    encoding = file_record.content_encoding
+    passthrough = encoding is not None and accepts_encoding(request.headers.get("accept-encoding"), encoding)
+
+    try:
+        stat = await run_in_threadpool(os.stat, file_record.path)
+    except FileNotFoundError:
+        if not has_cloud_copy(file_record):
+            raise HTTPException(status_code=404, detail="File not found on disk")
+        stat = None
+        if LOCAL_REHYDRATE_ON_MISS and await rehydrate_blob(file_record.path, file_record.sha256, encoding):
+            await mark_blob_local(db, file_record.path)
+            try:
+                stat = await run_in_threadpool(os.stat, file_record.path)
+            except FileNotFoundError:
+                pass
+        if stat is None:
+            key = os.path.basename(file_record.path)
+            if encoding and not passthrough:
+                source = await run_in_cloud_executor(open_cloud_file, key)
+                return StreamingResponse(
+                    iter_decoded(source, encoding, STREAM_CHUNK_SIZE),
+                    media_type=file_record.content_type or "application/octet-stream",
+                    headers={
+                        "Content-Length": str(file_record.size),
+                        "Content-Disposition": content_disposition(file_record.original_name),
+                        "Vary": "Accept-Encoding",
+                    }
+                )
+            presign = generate_presigned_download_url
+            if encoding:
+                presign = partial(presign, content_encoding=encoding)
+            url = await run_in_cloud_executor(presign, key, file_record.original_name, file_record.content_type)
+            return RedirectResponse(url, status_code=307)
+
+    await touch_file_record(db, file_record)
+
+    content_type = file_record.content_type or "application/octet-stream"
+    if encoding:
+        return encoded_file_response(request, file_record, stat, passthrough)
+
+    etag = f'"{file_record.sha256}"' if file_record.sha256 else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+
+    if is_not_modified(request.headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+        try:
+            byte_range = parse_range_header(range_header, stat.st_size)
+        except ValueError:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{stat.st_size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                iter_file_range(file_record.path, start, end),
+                status_code=206,
+                media_type=content_type,
+                headers=headers
+            )
+
+    return FileResponse(
+        file_record.path,
+        media_type=content_type,
+        filename=file_record.original_name,
+        headers=headers,
+        stat_result=stat
+    )
+
+
 @router.delete("/{uid}")
-async def delete_file(uid: str, db: Session = Depends(get_db)) -> dict:
+async def delete_file(uid: str, db: AsyncSession = Depends(get_db)) -> dict:
     """
     Удаляет файл с локального диска и из базы данных, а также из облачного хранилища (если он был загружен).
 
+    Содержимое, на которое ссылаются другие записи, остаётся на месте.
+
     :param uid: Уникальный идентификатор файла.
     :type uid: str
     :param db: Сессия базы данных.
-    :type db: Session
+    :type db: AsyncSession
     :return: Сообщение об успешном удалении файла.
     :rtype: dict
     :raises HTTPException: Если файл не найден в базе данных.
     """
-    file_record = db.query(FileModel).filter(FileModel.uid == uid).first()
+    file_record = await get_file_record(db, uid)
     if not file_record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    if os.path.exists(file_record.path):
-        os.remove(file_record.path)
+    await delete_file_record(db, file_record)
 
-    if file_record.storage_url:
-        delete_file_from_cloud(os.path.basename(file_record.path))
+    return {"message": "File deleted successfully"}
 
-    db.delete(file_record)
-    db.commit()
 
-    return {"message": "File deleted successfully"}
+@router.post("/bulk-get")
+async def bulk_get_files(request: BulkFilesRequest, db: AsyncSession = Depends(get_db)) -> dict:
+    """
+    Возвращает метаданные многих файлов одним запросом к базе данных.
+
+    :param request: uid файлов.
+    :type request: BulkFilesRequest
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Метаданные найденных файлов в порядке запроса и uid ненайденных.
+    :rtype: dict
+    """
+    uids = list(dict.fromkeys(request.uids))
+    file_records = {
+        file_record.uid: file_record
+        for file_record in (await db.scalars(select(FileModel).where(FileModel.uid.in_(uids)))).all()
+    }
+    return {
+        "files": [describe_file_record(file_records[uid]) for uid in uids if uid in file_records],
+        "missing": [uid for uid in uids if uid not in file_records],
+    }
+
+
+@router.post("/bulk-delete")
+async def bulk_delete_files(request: BulkFilesRequest, db: AsyncSession = Depends(get_db)) -> dict:
+    """
+    Удаляет многие файлы за один запрос.
+
+    Записи находятся одним запросом и удаляются в одной транзакции,
+    локальные файлы удаляются параллельно, облачные — пачками через
+    delete_objects. Содержимое, на которое ссылаются другие записи, остаётся на месте.
+
+    :param request: uid файлов.
+    :type request: BulkFilesRequest
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Результат по каждому uid: deleted или not_found.
+    :rtype: dict
+    """
+    uids = list(dict.fromkeys(request.uids))
+    file_records = (await db.scalars(select(FileModel).where(FileModel.uid.in_(uids)))).all()
+    if file_records:
+        await delete_file_records(db, file_records)
+
+    found = {file_record.uid for file_record in file_records}
+    logger.info(f"Bulk delete: {len(found)} deleted, {len(uids) - len(found)} not found")
+    return {"results": [{"uid": uid, "status": "deleted" if uid in found else "not_found"} for uid in uids]}
+
+
+@router.post("/archive")
+async def download_archive(request: ArchiveRequest, db: AsyncSession = Depends(get_db)) -> StreamingResponse:
+    """
+    Отдаёт многие файлы одним архивом zip или tar.
+
+    Архив строится на лету из локальных блобов, а вытесненные читаются
+    потоком из облака; ни архив, ни файлы целиком не попадают ни в память,
+    ни на диск. Размер ответа заранее неизвестен, поэтому он передаётся
+    без Content-Length. Одинаковые имена файлов получают суффиксы. Если
+    файл не удалось прочитать уже во время передачи, ответ обрывается.
+
+    :param request: uid файлов и формат архива.
+    :type request: ArchiveRequest
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Потоковый ответ с архивом.
+    :rtype: StreamingResponse
+    :raises HTTPException: Если какие-то файлы не найдены (404).
+    """
+    uids = list(dict.fromkeys(request.uids))
+    file_records = {
+        file_record.uid: file_record
+        for file_record in (await db.scalars(select(FileModel).where(FileModel.uid.in_(uids)))).all()
+    }
+    missing = [uid for uid in uids if uid not in file_records]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Files not found", "missing": missing})
+
+    file_records = [file_records[uid] for uid in uids]
+    names = archive_names(file_record.original_name for file_record in file_records)
+    entries = [
+        ArchiveEntry(
+            name=name,
+            size=file_record.size,
+            modified_at=file_record.created_at,
+            open=partial(
+                open_blob,
+                file_record.path,
+                os.path.basename(file_record.path) if has_cloud_copy(file_record) else None,
+                file_record.content_encoding
+            )
+        )
+        for name, file_record in zip(names, file_records)
+    ]
+
+    logger.info(f"Streaming {request.format} archive of {len(entries)} files")
+    return StreamingResponse(
+        stream_archive(entries, request.format),
+        media_type=ARCHIVE_MEDIA_TYPES[request.format],
+        headers={"Content-Disposition": f'attachment; filename="files.{request.format}"'}
+    )
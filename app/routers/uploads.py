@@ -0,0 +1,268 @@
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_db
+from app.models import FileMetadata as FileModel, UploadSession, UploadState
+from app.routers.files import store_file_record
+from app.utils import generate_uid, append_stream, parse_upload_metadata, file_checksums
+from app.tasks import notify_upload_queue
+from app.configs import (
+    LOCAL_STORAGE_PARTIAL_PATH,
+    MULTIPART_PART_SIZE,
+    RESUMABLE_UPLOAD_MAX_SIZE,
+    logger,
+)
+
+
+router = APIRouter(
+    prefix="/files/uploads",
+    tags=["uploads"]
+)
+
+TUS_VERSION = "1.0.0"
+CHUNK_CONTENT_TYPE = "application/offset+octet-stream"
+
+
+def partial_path(uid: str) -> str:
+    """
+    Возвращает путь частичного файла сессии возобновляемой загрузки.
+
+    Частичные файлы лежат во временном каталоге хранилища, который не
+    трогают очистка и перенос раскладки.
+
+    :param uid: Идентификатор сессии.
+    :type uid: str
+    :return: Путь до частичного файла.
+    :rtype: str
+    """
+    return os.path.join(LOCAL_STORAGE_PARTIAL_PATH, f"{uid}.part")
+
+
+def create_partial_file(path: str) -> None:
+    """
+    Создаёт пустой частичный файл.
+
+    :param path: Путь до частичного файла.
+    :type path: str
+    :return: None
+    :rtype: None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+async def get_upload_session(db: AsyncSession, uid: str) -> UploadSession:
+    """
+    Ищет сессию возобновляемой загрузки.
+
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :param uid: Идентификатор сессии.
+    :type uid: str
+    :return: Сессия загрузки.
+    :rtype: UploadSession
+    :raises HTTPException: Если сессия не найдена (завершена, удалена или истекла).
+    """
+    upload_session = await db.scalar(select(UploadSession).where(UploadSession.uid == uid))
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload_session
+
+
+def offset_headers(upload_session: UploadSession) -> dict:
+    """
+    Возвращает заголовки протокола tus с текущим смещением сессии.
+
+    :param upload_session: Сессия загрузки.
+    :type upload_session: UploadSession
+    :return: Заголовки ответа.
+    :rtype: dict
+    """
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload_session.offset),
+        "Upload-Length": str(upload_session.length),
+        "Cache-Control": "no-store",
+    }
+
+
+@router.post("", status_code=201)
+async def create_upload(
+    request: Request,
+    response: Response,
+    filename: str | None = None,
+    db: AsyncSession = Depends(get_db)
+) -> dict:
+    """
+    Создаёт сессию возобновляемой загрузки.
+
+    Размер файла передаётся в заголовке Upload-Length, имя и MIME-тип — в
+    параметре filename или, как в протоколе tus, в Upload-Metadata
+    (ключи filename и filetype). Идентификатор сессии станет uid файла.
+
+    :param request: HTTP-запрос.
+    :type request: Request
+    :param response: Ответ, в который добавляются заголовки Location и Tus-Resumable.
+    :type response: Response
+    :param filename: Оригинальное имя файла.
+    :type filename: str | None
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Идентификатор сессии и текущее смещение.
+    :rtype: dict
+    :raises HTTPException: Если размер не указан, некорректен или больше RESUMABLE_UPLOAD_MAX_SIZE.
+    """
+    try:
+        length = int(request.headers["upload-length"])
+        metadata = parse_upload_metadata(request.headers.get("upload-metadata", ""))
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid Upload-Length or Upload-Metadata")
+    if length < 0:
+        raise HTTPException(status_code=400, detail="Invalid Upload-Length")
+    if length > RESUMABLE_UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="Upload is too large")
+
+    uid = generate_uid()
+    await run_in_threadpool(create_partial_file, partial_path(uid))
+
+    upload_session = UploadSession(
+        uid=uid,
+        original_name=filename or metadata.get("filename"),
+        content_type=metadata.get("filetype") or "application/octet-stream",
+        length=length,
+        offset=0
+    )
+    db.add(upload_session)
+    await db.commit()
+
+    response.headers["Location"] = f"{router.prefix}/{uid}"
+    response.headers["Tus-Resumable"] = TUS_VERSION
+    return {"upload_id": uid, "offset": 0}
+
+
+@router.head("/{uid}")
+async def get_upload_offset(uid: str, db: AsyncSession = Depends(get_db)) -> Response:
+    """
+    Возвращает в заголовке Upload-Offset, сколько байтов загрузки уже принято.
+
+    :param uid: Идентификатор сессии.
+    :type uid: str
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Пустой ответ с заголовками Upload-Offset и Upload-Length.
+    :rtype: Response
+    """
+    upload_session = await get_upload_session(db, uid)
+    return Response(status_code=200, headers=offset_headers(upload_session))
+
+
+@router.patch("/{uid}")
+async def upload_chunk(uid: str, request: Request, db: AsyncSession = Depends(get_db)) -> Response:
+    """
+    Принимает очередной фрагмент загрузки с позиции Upload-Offset.
+
+    Фрагмент пишется потоком в частичный файл. Если соединение оборвалось
+    посреди фрагмента, принятые байты засчитываются, и клиент узнаёт новое
+    смещение через HEAD. Когда принят последний байт, считаются контрольные
+    суммы, файл становится обычной записью FileMetadata с uid сессии и
+    ставится в очередь загрузки в облако, а сессия удаляется.
+
+    :param uid: Идентификатор сессии.
+    :type uid: str
+    :param request: HTTP-запрос с фрагментом в теле.
+    :type request: Request
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: 204 с новым Upload-Offset или метаданные файла после последнего фрагмента.
+    :rtype: Response
+    :raises HTTPException: Если смещение не совпадает с принятым (409), фрагмент
+        уже принимается другим запросом (409), тип тела не
+        application/offset+octet-stream (415) или фрагмент выходит за Upload-Length (413).
+    """
+    upload_session = await get_upload_session(db, uid)
+    if request.headers.get("content-type") != CHUNK_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {CHUNK_CONTENT_TYPE}")
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid Upload-Offset")
+    if offset != upload_session.offset:
+        raise HTTPException(
+            status_code=409, detail="Upload-Offset does not match", headers=offset_headers(upload_session)
+        )
+
+    # Фрагмент может идти долго: соединение с базой возвращается в пул до его приёма.
+    await db.commit()
+
+    path = partial_path(uid)
+    try:
+        written = await append_stream(path, offset, upload_session.length - offset, request.stream())
+    except BlockingIOError:
+        raise HTTPException(status_code=409, detail="Upload is already in progress")
+    except ValueError:
+        raise HTTPException(status_code=413, detail="Chunk exceeds Upload-Length")
+
+    upload_session.offset = offset + written
+    upload_session.updated_at = datetime.utcnow()
+
+    if upload_session.offset < upload_session.length:
+        await db.commit()
+        return Response(status_code=204, headers=offset_headers(upload_session))
+
+    sha256, md5, _ = await run_in_threadpool(file_checksums, path, MULTIPART_PART_SIZE)
+    file_record = FileModel(
+        uid=uid,
+        original_name=upload_session.original_name,
+        size=upload_session.length,
+        content_type=upload_session.content_type,
+        storage_url=None,
+        sha256=sha256,
+        md5=md5
+    )
+    await db.delete(upload_session)
+    deduplicated = await store_file_record(db, file_record, path)
+
+    if file_record.upload_state != UploadState.DONE:
+        notify_upload_queue()
+
+    logger.info(f"Resumable upload {uid} completed: {file_record.size} bytes")
+
+    return JSONResponse(
+        {
+            "uid": uid,
+            "filename": file_record.original_name,
+            "size": file_record.size,
+            "content_type": file_record.content_type,
+            "sha256": sha256,
+            "deduplicated": deduplicated
+        },
+        headers=offset_headers(upload_session)
+    )
+
+
+@router.delete("/{uid}", status_code=204)
+async def cancel_upload(uid: str, db: AsyncSession = Depends(get_db)) -> Response:
+    """
+    Отменяет возобновляемую загрузку и удаляет принятые данные.
+
+    :param uid: Идентификатор сессии.
+    :type uid: str
+    :param db: Сессия базы данных.
+    :type db: AsyncSession
+    :return: Пустой ответ.
+    :rtype: Response
+    """
+    upload_session = await get_upload_session(db, uid)
+    await db.delete(upload_session)
+    await db.commit()
+
+    path = partial_path(uid)
+    if os.path.exists(path):
+        await run_in_threadpool(os.remove, path)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
@@ -1,68 +1,1390 @@
 import os
-import logging
+import json
+import asyncio
+import random
+import shutil
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
+from sqlalchemy import delete, update, or_, and_, case, func
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from app.database import get_db
-from app.models import FileMetadata as FileModel
-from app.cloud_storage import delete_file_from_cloud
-from app.configs import LOCAL_STORAGE_PATH, logger
+from app.cache import metadata_cache
+from app.metrics import cleanup_duration, cleanup_deleted, cloud_upload_failures
+from app.database import SessionLocal
+from app.media import extract_media_info, lower_priority
+from app.models import Derivative, FileMetadata as FileModel, MediaState, UploadSession, UploadState
+from app.compression import decoded_sha256
+from app.utils import DERIVATIVES_PREFIX, storage_path, derivative_key, file_checksums
+from app.cloud_storage import (
+    RateLimiter,
+    delete_files_from_cloud,
+    list_files_in_cloud,
+    upload_file_to_cloud,
+    abort_multipart_upload,
+    abort_abandoned_multipart_uploads,
+    head_cloud_file,
+    run_in_cloud_executor,
+)
+from app.configs import (
+    LOCAL_STORAGE_PATH,
+    LOCAL_STORAGE_TMP_PATH,
+    LOCAL_STORAGE_PARTIAL_PATH,
+    LOCAL_DERIVATIVES_PATH,
+    UPLOAD_SESSION_TTL_HOURS,
+    CLOUD_UPLOAD_CONCURRENCY,
+    CLOUD_UPLOAD_MAX_ATTEMPTS,
+    CLOUD_UPLOAD_BACKOFF_BASE,
+    CLOUD_UPLOAD_BACKOFF_MAX,
+    CLOUD_UPLOAD_LEASE_SECONDS,
+    CLOUD_UPLOAD_POLL_INTERVAL,
+    CLOUD_LARGE_UPLOAD_CONCURRENCY,
+    MULTIPART_THRESHOLD,
+    MULTIPART_PART_SIZE,
+    MULTIPART_ABANDON_AFTER_HOURS,
+    LOCAL_STORAGE_QUOTA_BYTES,
+    LOCAL_STORAGE_LOW_WATERMARK,
+    EVICTION_INTERVAL_MINUTES,
+    EVICTION_BATCH_SIZE,
+    SCRUB_BATCH_SIZE,
+    SCRUB_BYTES_PER_SECOND,
+    SCRUB_INTERVAL_HOURS,
+    MEDIA_WORKERS,
+    MEDIA_BATCH_SIZE,
+    MEDIA_PROBE_TIMEOUT,
+    MEDIA_LEASE_SECONDS,
+    MEDIA_POLL_INTERVAL,
+    CLEANUP_BATCH_SIZE,
+    CLEANUP_MIN_AGE_SECONDS,
+    CLEANUP_MAX_DELETES_PER_SECOND,
+    CLEANUP_DRY_RUN,
+    CLEANUP_CHECKPOINT_PATH,
+    logger,
+)
 
 
-def clean_unused_files() -> None:
+skipped_directories = {os.path.normpath(LOCAL_STORAGE_TMP_PATH), os.path.normpath(LOCAL_DERIVATIVES_PATH)}
+upload_queue_event = asyncio.Event()
+large_uploads_in_flight = 0
+media_queue_event = asyncio.Event()
+media_executor: Optional[ProcessPoolExecutor] = None
+
+
+class UploadJob(NamedTuple):
     """
-    Удаляет неиспользуемые файлы из локального хранилища, которые отсутствуют в базе данных.
+    Захваченная задача загрузки файла в облако.
+
+    Атрибуты:
+        file_id: id записи файла.
+        path: Путь до файла на локальном диске.
+        multipart_upload_id: UploadId незавершённой multipart-загрузки.
+        size: Размер блоба на диске в байтах (сжатого, если блоб сжат): столько и уходит в облако.
+        sha256: SHA-256 содержимого файла.
+        md5: MD5 содержимого файла для Content-MD5.
+        lease: Срок аренды, выставленный при захвате (next_attempt_at строки).
+    """
+    file_id: int
+    path: str
+    multipart_upload_id: Optional[str] = None
+    size: int = 0
+    sha256: Optional[str] = None
+    md5: Optional[str] = None
+    lease: Optional[datetime] = None
 
-    Функция перебирает все файлы в локальном хранилище и удаляет те, которые
-    не имеют соответствующей записи в базе данных. Аналогично с файлами на Yandex Cloud Storage
 
+last_cleanup_stats: dict = {}
+
+
+def load_cleanup_checkpoint() -> dict:
+    """
+    Читает контрольную точку прерванной очистки.
+
+    :return: Фаза очистки ("local" или "cloud") и позиция, после которой продолжать.
+    :rtype: dict
+    """
+    try:
+        with open(CLEANUP_CHECKPOINT_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cleanup_checkpoint(phase: str, after: Optional[object]) -> None:
+    """
+    Атомарно сохраняет контрольную точку очистки.
+
+    :param phase: Фаза очистки: "local" или "cloud".
+    :type phase: str
+    :param after: Последний обработанный путь (части пути) или ключ в облаке.
+    :type after: Optional[object]
     :return: None
     :rtype: None
     """
-    logger.info("Starting cleanup of unused files...")
-    db: Session = next(get_db())
+    temp_path = f"{CLEANUP_CHECKPOINT_PATH}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"phase": phase, "after": after}, f)
+    os.replace(temp_path, CLEANUP_CHECKPOINT_PATH)
+
 
+def storage_path_parts(path: str) -> Tuple[str, ...]:
+    """
+    Разбивает путь внутри локального хранилища на компоненты для сравнения позиций обхода.
+
+    :param path: Путь до файла или каталога в хранилище.
+    :type path: str
+    :return: Компоненты пути относительно LOCAL_STORAGE_PATH.
+    :rtype: Tuple[str, ...]
+    """
+    return tuple(os.path.relpath(path, LOCAL_STORAGE_PATH).split(os.sep))
+
+
+def iter_storage_files(
+    directory: str = LOCAL_STORAGE_PATH,
+    start_after: Optional[Tuple[str, ...]] = None
+) -> Iterator[str]:
+    """
+    Лениво обходит файлы локального хранилища в порядке компонентов пути.
+
+    Каталоги читаются по одному, так что память не зависит от числа файлов.
+    Порядок обхода детерминирован, поэтому обход можно продолжить после
+    start_after, пропуская целиком уже пройденные каталоги. Временный каталог
+    с недозагруженными файлами и каталог производных файлов пропускаются.
+
+    :param directory: Каталог, с которого начинается обход.
+    :type directory: str
+    :param start_after: Компоненты пути, после которого продолжать обход.
+    :type start_after: Optional[Tuple[str, ...]]
+    :return: Итератор путей до файлов.
+    :rtype: Iterator[str]
+    """
     try:
-        files_in_db = db.query(FileModel).all()
-        files_in_db_paths = {file_record.path for file_record in files_in_db}
-        files_in_db_cloud = {
-            os.path.basename(file_record.path) for file_record in files_in_db if file_record.storage_url
-        }
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+
+    for entry in entries:
+        path = os.path.join(directory, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            if os.path.normpath(path) in skipped_directories:
+                continue
+            parts = storage_path_parts(path)
+            if start_after is not None and parts < start_after[:len(parts)]:
+                continue
+            yield from iter_storage_files(path, start_after)
+        elif entry.is_file(follow_symlinks=False):
+            if start_after is None or storage_path_parts(path) > start_after:
+                yield path
+
+
+def reconcile_local_batch(paths: List[str], stats: dict, limiter: RateLimiter, dry_run: bool) -> None:
+    """
+    Удаляет из пачки локальных файлов те, на которые не ссылается ни одна запись.
+
+    Наличие записей проверяется одним запросом по индексу path. Файлы моложе
+    CLEANUP_MIN_AGE_SECONDS не трогаются: их запись может ещё не быть закоммичена.
+
+    :param paths: Пути до файлов.
+    :type paths: List[str]
+    :param stats: Счётчики очистки.
+    :type stats: dict
+    :param limiter: Ограничитель скорости удаления.
+    :type limiter: RateLimiter
+    :param dry_run: Только посчитать файлы, не удаляя их.
+    :type dry_run: bool
+    :return: None
+    :rtype: None
+    """
+    stats["local_scanned"] += len(paths)
+    with SessionLocal() as db:
+        known = {path for (path,) in db.query(FileModel.path).filter(FileModel.path.in_(paths))}
+
+    threshold = time.time() - CLEANUP_MIN_AGE_SECONDS
+    for file_path in paths:
+        if file_path in known:
+            continue
+        try:
+            if os.path.getmtime(file_path) > threshold:
+                continue
+            logger.info(f"Deleting unused file: {file_path}")
+            if not dry_run:
+                limiter.consume(1)
+                os.remove(file_path)
+        except FileNotFoundError:
+            continue
+        stats["local_deleted"] += 1
+
+
+def reconcile_cloud_batch(objects: List[dict], stats: dict, limiter: RateLimiter, dry_run: bool) -> None:
+    """
+    Удаляет из страницы файлов в облаке те, на которые не ссылается ни одна запись.
+
+    Объекты сверяются с базой по ключу, а не по storage_url: URL зависит от
+    адреса хранилища и имени бакета, и после их смены в настройках все живые
+    объекты выглядели бы лишними. Записи файлов ищутся по индексу path
+    (ключ блоба — имя его файла; проверяются и путь с подкаталогами, и
+    плоский, на время переноса раскладки), производные — по SHA-256 источника
+    в их ключе. Учитываются только записи с копией в облаке. Лишние файлы
+    удаляются одним вызовом delete_objects. Файлы моложе
+    CLEANUP_MIN_AGE_SECONDS не трогаются: их загрузка может быть ещё не отмечена в базе.
 
-        for root, dirs, files in os.walk(LOCAL_STORAGE_PATH):
-            for filename in files:
-                file_path = os.path.join(root, filename)
+    :param objects: Страница list_objects_v2.
+    :type objects: List[dict]
+    :param stats: Счётчики очистки.
+    :type stats: dict
+    :param limiter: Ограничитель скорости удаления.
+    :type limiter: RateLimiter
+    :param dry_run: Только посчитать файлы, не удаляя их.
+    :type dry_run: bool
+    :return: None
+    :rtype: None
+    """
+    stats["cloud_scanned"] += len(objects)
+    blob_keys = [obj["Key"] for obj in objects if not obj["Key"].startswith(DERIVATIVES_PREFIX)]
+    sources = {
+        obj["Key"][len(DERIVATIVES_PREFIX):].rsplit("-", 2)[0]
+        for obj in objects if obj["Key"].startswith(DERIVATIVES_PREFIX)
+    }
+    paths = {storage_path(key) for key in blob_keys} | {os.path.join(LOCAL_STORAGE_PATH, key) for key in blob_keys}
+
+    with SessionLocal() as db:
+        known = set()
+        if paths:
+            known.update(
+                os.path.basename(path) for (path,) in db.query(FileModel.path).filter(
+                    FileModel.path.in_(paths), FileModel.storage_url.isnot(None)
+                )
+            )
+        if sources:
+            known.update(
+                derivative_key(path) for (path,) in db.query(Derivative.path).filter(
+                    Derivative.source.in_(sources), Derivative.storage_url.isnot(None)
+                )
+            )
+
+    threshold = datetime.now(timezone.utc) - timedelta(seconds=CLEANUP_MIN_AGE_SECONDS)
+    unused = [
+        obj["Key"] for obj in objects
+        if obj["Key"] not in known and obj["LastModified"] < threshold
+    ]
+    if not unused:
+        return
+
+    logger.info(f"Deleting {len(unused)} unused files from Yandex Cloud")
+    if dry_run:
+        stats["cloud_deleted"] += len(unused)
+        return
 
-                if file_path not in files_in_db_paths:
-                    logger.info(f"Deleting unused file: {file_path}")
+    limiter.consume(len(unused))
+    failed = delete_files_from_cloud(unused)
+    stats["cloud_deleted"] += len(unused) - len(failed)
 
-                    os.remove(file_path)
+
+def clean_unused_files(dry_run: bool = CLEANUP_DRY_RUN) -> dict:
+    """
+    Удаляет неиспользуемые файлы из локального хранилища, которые отсутствуют в базе данных.
+
+    Функция перебирает все файлы в локальном хранилище и удаляет те, которые
+    не имеют соответствующей записи в базе данных. Аналогично с файлами на Yandex Cloud Storage.
+
+    Таблица не читается целиком: файлы сверяются с базой пачками по
+    CLEANUP_BATCH_SIZE, облако перечисляется постранично. После каждой пачки
+    сохраняется контрольная точка, и прерванная очистка продолжается с неё.
+    Скорость удаления ограничена CLEANUP_MAX_DELETES_PER_SECOND.
+
+    :param dry_run: Только посчитать неиспользуемые файлы, ничего не удаляя
+        и не трогая контрольную точку.
+    :type dry_run: bool
+    :return: Количество просмотренных и удалённых файлов и длительность в секундах.
+    :rtype: dict
+    """
+    logger.info("Starting cleanup of unused files...")
+    started = time.monotonic()
+    stats = {"local_scanned": 0, "local_deleted": 0, "cloud_scanned": 0, "cloud_deleted": 0}
+    limiter = RateLimiter(CLEANUP_MAX_DELETES_PER_SECOND)
+    checkpoint = {} if dry_run else load_cleanup_checkpoint()
+
+    try:
+        if checkpoint.get("phase") != "cloud":
+            start_after = tuple(checkpoint["after"]) if checkpoint.get("after") else None
+            batch = []
+            for file_path in iter_storage_files(start_after=start_after):
+                batch.append(file_path)
+                if len(batch) >= CLEANUP_BATCH_SIZE:
+                    reconcile_local_batch(batch, stats, limiter, dry_run)
+                    if not dry_run:
+                        save_cleanup_checkpoint("local", storage_path_parts(batch[-1]))
+                    batch = []
+            if batch:
+                reconcile_local_batch(batch, stats, limiter, dry_run)
+            if not dry_run:
+                save_cleanup_checkpoint("cloud", None)
+            checkpoint = {}
 
         # Проверяем файлы в облаке Yandex Cloud
-        files_in_cloud = list_files_in_cloud()
-        for file_name in files_in_cloud:
-            if file_name not in files_in_db_cloud:
-                logging.info(f"Deleting unused file from Yandex Cloud: {file_name}")
-                try:
-                    delete_file_from_cloud(file_name)
-                    logging.info(f"Deleted {file_name} from Yandex Cloud")
-                except Exception as e:
-                    logging.error(f"Failed to delete {file_name} from Yandex Cloud: {e}")
+        for page in list_files_in_cloud(checkpoint.get("after")):
+            reconcile_cloud_batch(page, stats, limiter, dry_run)
+            if not dry_run:
+                save_cleanup_checkpoint("cloud", page[-1]["Key"])
 
+        if not dry_run and os.path.exists(CLEANUP_CHECKPOINT_PATH):
+            os.remove(CLEANUP_CHECKPOINT_PATH)
         logger.info("Cleanup completed successfully.")
     except Exception as e:
         logger.error(f"Failed to clean unused files: {e}")
-    finally:
-        db.close()
+
+    stats["duration"] = time.monotonic() - started
+    logger.info(f"Cleanup stats: {stats}")
+    if not dry_run:
+        cleanup_duration.observe(stats["duration"])
+        cleanup_deleted.labels("local").inc(stats["local_deleted"])
+        cleanup_deleted.labels("cloud").inc(stats["cloud_deleted"])
+    last_cleanup_stats.clear()
+    last_cleanup_stats.update(stats)
+    return stats
+
+
+def notify_upload_queue() -> None:
+    """
+    Будит воркеры очереди загрузки в облако, не дожидаясь очередного опроса БД.
+
+    :return: None
+    :rtype: None
+    """
+    upload_queue_event.set()
+
+
+def claim_upload_job(allow_large: bool = True) -> Optional[UploadJob]:
+    """
+    Захватывает одну задачу загрузки в облако.
+
+    Кандидат выбирается через SELECT ... FOR UPDATE SKIP LOCKED, поэтому воркеры
+    разных реплик не ждут друг друга. Сам захват — условный UPDATE, который
+    срабатывает только если строку никто не успел перехватить; это же делает
+    захват корректным на БД без SKIP LOCKED (SQLite). Захваченной задаче
+    выставляется срок аренды: если воркер умрёт, задачу заберёт другой.
+
+    :param allow_large: Можно ли брать файлы, загружаемые multipart-загрузкой.
+    :type allow_large: bool
+    :return: Захваченная задача или None, если задач нет.
+    :rtype: Optional[UploadJob]
+    """
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=CLOUD_UPLOAD_LEASE_SECONDS)
+    # Мелкий или большой, решает размер отправляемых байтов, а у сжатого блоба он меньше size.
+    stored_size = func.coalesce(FileModel.stored_size, FileModel.size)
+
+    with SessionLocal() as db:
+        query = db.query(
+            FileModel.id,
+            FileModel.path,
+            FileModel.multipart_upload_id,
+            stored_size.label("size"),
+            FileModel.sha256,
+            FileModel.md5,
+            FileModel.upload_state,
+            FileModel.next_attempt_at,
+        ).filter(
+            FileModel.upload_state.in_((UploadState.PENDING, UploadState.UPLOADING)),
+            FileModel.next_attempt_at <= now,
+        )
+        if not allow_large:
+            query = query.filter(stored_size < MULTIPART_THRESHOLD)
+        candidate = (
+            query
+            .order_by(FileModel.next_attempt_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        claimed = db.execute(
+            update(FileModel)
+            .where(
+                FileModel.id == candidate.id,
+                FileModel.upload_state == candidate.upload_state,
+                FileModel.next_attempt_at == candidate.next_attempt_at,
+            )
+            .values(
+                upload_state=UploadState.UPLOADING,
+                upload_attempts=FileModel.upload_attempts + 1,
+                next_attempt_at=lease,
+            )
+        ).rowcount
+        db.commit()
+
+    if not claimed:
+        return None
+    return UploadJob(
+        candidate.id, candidate.path, candidate.multipart_upload_id, candidate.size or 0,
+        candidate.sha256, candidate.md5, lease
+    )
+
+
+def remember_multipart_upload(file_id: int, upload_id: str) -> None:
+    """
+    Сохраняет UploadId начатой multipart-загрузки, чтобы продолжить её после сбоя.
+
+    :param file_id: id записи файла.
+    :type file_id: int
+    :param upload_id: UploadId multipart-загрузки.
+    :type upload_id: str
+    :return: None
+    :rtype: None
+    """
+    with SessionLocal() as db:
+        db.execute(update(FileModel).where(FileModel.id == file_id).values(multipart_upload_id=upload_id))
+        db.commit()
+
+
+def find_uploaded_copy(sha256: Optional[str]) -> Optional[str]:
+    """
+    Ищет уже загруженную в облако копию блоба с тем же содержимым.
+
+    :param sha256: SHA-256 содержимого файла.
+    :type sha256: Optional[str]
+    :return: URL копии в облачном хранилище или None.
+    :rtype: Optional[str]
+    """
+    if not sha256:
+        return None
+
+    with SessionLocal() as db:
+        return (
+            db.query(FileModel.storage_url)
+            .filter(FileModel.sha256 == sha256, FileModel.upload_state == UploadState.DONE)
+            .limit(1)
+            .scalar()
+        )
+
+
+def holds_upload_lease(job: UploadJob):
+    """
+    Возвращает условие на строку задачи, которое выполняется, только пока воркер держит аренду.
+
+    Если аренда истекла и задачу перехватил другой воркер, у строки уже
+    другой next_attempt_at (или другое состояние), и условие ложно.
+
+    :param job: Захваченная задача.
+    :type job: UploadJob
+    :return: Условие для WHERE.
+    """
+    return and_(
+        FileModel.id == job.file_id,
+        FileModel.upload_state == UploadState.UPLOADING,
+        FileModel.next_attempt_at == job.lease,
+    )
+
+
+class UploadLeaseLost(Exception):
+    """
+    Аренда задачи загрузки истекла, и задачу перехватил другой воркер.
+    """
+
+
+class UploadHeartbeat:
+    """
+    Продлевает аренду задачи загрузки, пока идёт отправка в облако.
+
+    Вызывается из потока загрузки после каждой части или прочитанного куска
+    файла, а в базу пишет, только когда прошла треть срока аренды. Так
+    загрузка, идущая дольше CLOUD_UPLOAD_LEASE_SECONDS (многогигабайтный
+    файл или ограничение CLOUD_UPLOAD_BANDWIDTH_LIMIT), не будет перехвачена
+    другим воркером.
+
+    :ivar job: Задача с текущим сроком аренды.
+    """
+
+    def __init__(self, job: UploadJob):
+        self.job = job
+
+    def __call__(self) -> None:
+        """
+        Продлевает аренду, если пора.
+
+        :return: None
+        :rtype: None
+        :raises UploadLeaseLost: Если аренду уже перехватили.
+        """
+        now = datetime.utcnow()
+        lease_duration = timedelta(seconds=CLOUD_UPLOAD_LEASE_SECONDS)
+        if self.job.lease - now > lease_duration * 2 / 3:
+            return
+
+        lease = now + lease_duration
+        with SessionLocal() as db:
+            extended = db.execute(
+                update(FileModel).where(holds_upload_lease(self.job)).values(next_attempt_at=lease)
+            ).rowcount
+            db.commit()
+        if not extended:
+            raise UploadLeaseLost(f"Cloud upload lease of file {self.job.file_id} was lost")
+        self.job = self.job._replace(lease=lease)
+
+
+def complete_upload_job(job: UploadJob, storage_url: str) -> List[str]:
+    """
+    Отмечает задачу загрузки как выполненную.
+
+    Ожидающие в очереди записи с тем же содержимым отмечаются вместе с ней:
+    блоб в облаке у них общий. Если воркер потерял аренду, ничего не пишется:
+    задачей уже распоряжается другой воркер.
+
+    :param job: Захваченная задача.
+    :type job: UploadJob
+    :param storage_url: URL файла в облачном хранилище.
+    :type storage_url: str
+    :return: uid отмеченных записей.
+    :rtype: List[str]
+    """
+    values = dict(
+        upload_state=UploadState.DONE,
+        storage_url=storage_url,
+        next_attempt_at=None,
+        upload_error=None,
+        multipart_upload_id=None,
+    )
+
+    with SessionLocal() as db:
+        uids = db.scalars(
+            update(FileModel).where(holds_upload_lease(job)).values(**values).returning(FileModel.uid)
+        ).all()
+        if not uids:
+            db.rollback()
+            logger.warning(f"Cloud upload lease of file {job.file_id} was lost, not marking it done")
+            return []
+        if job.sha256:
+            uids += db.scalars(
+                update(FileModel)
+                .where(FileModel.sha256 == job.sha256, FileModel.upload_state == UploadState.PENDING)
+                .values(**values)
+                .returning(FileModel.uid)
+            ).all()
+        db.commit()
+    return uids
+
+
+def upload_backoff(attempts: int) -> float:
+    """
+    Возвращает задержку перед следующей попыткой: экспонента с джиттером.
+
+    :param attempts: Количество уже сделанных попыток.
+    :type attempts: int
+    :return: Задержка в секундах.
+    :rtype: float
+    """
+    delay = min(CLOUD_UPLOAD_BACKOFF_MAX, CLOUD_UPLOAD_BACKOFF_BASE * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def fail_upload_job(job: UploadJob, error: str) -> None:
+    """
+    Откладывает задачу загрузки после ошибки или помечает её проваленной,
+    если попытки исчерпаны.
+
+    Если воркер потерял аренду, строка не меняется: её уже мог завершить
+    или перехватить другой воркер.
+
+    :param job: Захваченная задача.
+    :type job: UploadJob
+    :param error: Текст ошибки.
+    :type error: str
+    :return: None
+    :rtype: None
+    """
+    cloud_upload_failures.inc()
+
+    with SessionLocal() as db:
+        file_record = db.query(FileModel).filter(holds_upload_lease(job)).with_for_update().first()
+        if file_record is None:
+            logger.warning(f"Cloud upload lease of file {job.file_id} was lost, dropping error: {error}")
+            return
+
+        file_record.upload_error = error
+        if file_record.upload_attempts >= CLOUD_UPLOAD_MAX_ATTEMPTS:
+            file_record.upload_state = UploadState.FAILED
+            file_record.next_attempt_at = None
+            if file_record.multipart_upload_id:
+                try:
+                    abort_multipart_upload(os.path.basename(file_record.path), file_record.multipart_upload_id)
+                    file_record.multipart_upload_id = None
+                except Exception as e:
+                    logger.error(f"Failed to abort multipart upload of {file_record.uid}: {e}")
+            logger.error(f"Cloud upload of {file_record.uid} failed permanently: {error}")
+        else:
+            file_record.upload_state = UploadState.PENDING
+            file_record.next_attempt_at = datetime.utcnow() + timedelta(
+                seconds=upload_backoff(file_record.upload_attempts)
+            )
+            logger.warning(
+                f"Cloud upload of {file_record.uid} failed (attempt {file_record.upload_attempts}), "
+                f"retry at {file_record.next_attempt_at}: {error}"
+            )
+        db.commit()
+
+
+async def process_upload_job(job: UploadJob) -> None:
+    """
+    Загружает файл в облако и фиксирует результат в базе данных.
+
+    Если блоб с тем же содержимым уже загружен, повторной загрузки не будет.
+    Пока файл отправляется, аренда задачи продлевается (UploadHeartbeat).
+    Записи, получившие storage_url, сбрасываются из кеша метаданных.
+
+    :param job: Захваченная задача.
+    :type job: UploadJob
+    :return: None
+    :rtype: None
+    """
+    heartbeat = UploadHeartbeat(job)
+    try:
+        file_url = await run_in_threadpool(find_uploaded_copy, job.sha256)
+        if file_url is None:
+            file_url = await run_in_cloud_executor(
+                upload_file_to_cloud,
+                job.path,
+                os.path.basename(job.path),
+                upload_id=job.multipart_upload_id,
+                on_multipart_start=partial(remember_multipart_upload, job.file_id),
+                md5=job.md5,
+                on_progress=heartbeat,
+            )
+    except Exception as e:
+        await run_in_threadpool(fail_upload_job, heartbeat.job, str(e))
+    else:
+        uids = await run_in_threadpool(complete_upload_job, heartbeat.job, file_url)
+        await metadata_cache.invalidate(*uids)
+
+
+async def cloud_upload_worker() -> None:
+    """
+    Воркер очереди загрузки в облако: забирает задачи из БД, пока они есть,
+    и засыпает до уведомления или до следующего опроса.
+
+    Большие файлы одновременно загружают не больше CLOUD_LARGE_UPLOAD_CONCURRENCY
+    воркеров, остальные в это время берут только мелкие, чтобы те не стояли
+    в очереди за многогигабайтными видео.
+
+    :return: None
+    :rtype: None
+    """
+    global large_uploads_in_flight
+
+    while True:
+        try:
+            job = await run_in_threadpool(
+                claim_upload_job, large_uploads_in_flight < CLOUD_LARGE_UPLOAD_CONCURRENCY
+            )
+        except Exception as e:
+            logger.error(f"Failed to claim cloud upload job: {e}")
+            job = None
+
+        if job is not None:
+            is_large = job.size >= MULTIPART_THRESHOLD
+            large_uploads_in_flight += is_large
+            try:
+                await process_upload_job(job)
+            except Exception as e:
+                logger.error(f"Failed to process cloud upload job {job.file_id}: {e}")
+            finally:
+                large_uploads_in_flight -= is_large
+            continue
+
+        try:
+            await asyncio.wait_for(upload_queue_event.wait(), CLOUD_UPLOAD_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        upload_queue_event.clear()
+
+
+def start_upload_workers() -> List[asyncio.Task]:
+    """
+    Запускает CLOUD_UPLOAD_CONCURRENCY воркеров очереди загрузки в облако.
+
+    :return: Запущенные задачи воркеров.
+    :rtype: List[asyncio.Task]
+    """
+    workers = [asyncio.create_task(cloud_upload_worker()) for _ in range(CLOUD_UPLOAD_CONCURRENCY)]
+    logger.info(f"Started {len(workers)} cloud upload workers.")
+    return workers
+
+
+async def stop_upload_workers(workers: List[asyncio.Task]) -> None:
+    """
+    Останавливает воркеры очереди загрузки в облако.
+
+    Прерванные загрузки остаются в состоянии uploading и будут подхвачены
+    после истечения аренды.
+
+    :param workers: Задачи воркеров.
+    :type workers: List[asyncio.Task]
+    :return: None
+    :rtype: None
+    """
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+class MediaJob(NamedTuple):
+    """
+    Захваченная задача извлечения свойств медиа.
+
+    Атрибуты:
+        file_id: id записи файла.
+        uid: Уникальный идентификатор файла.
+        path: Путь до файла на локальном диске.
+        sha256: SHA-256 содержимого файла.
+        content_encoding: Чем сжат блоб или None.
+    """
+    file_id: int
+    uid: str
+    path: str
+    sha256: Optional[str] = None
+    content_encoding: Optional[str] = None
+
+
+def notify_media_queue() -> None:
+    """
+    Будит воркер извлечения свойств медиа, не дожидаясь очередного опроса БД.
+
+    :return: None
+    :rtype: None
+    """
+    media_queue_event.set()
+
+
+def claim_media_jobs(limit: int = MEDIA_BATCH_SIZE) -> List[MediaJob]:
+    """
+    Захватывает пачку файлов, ожидающих извлечения свойств медиа.
+
+    Захват устроен как в claim_upload_job: кандидаты выбираются с SKIP LOCKED,
+    а условный UPDATE забирает только тех, кого не перехватили. Файлы,
+    захваченные упавшим воркером, снова доступны через MEDIA_LEASE_SECONDS.
+
+    :param limit: Наибольшее число захватываемых файлов.
+    :type limit: int
+    :return: Захваченные задачи.
+    :rtype: List[MediaJob]
+    """
+    now = datetime.utcnow()
+    waiting = or_(
+        FileModel.media_state == MediaState.PENDING,
+        and_(
+            FileModel.media_state == MediaState.PROCESSING,
+            FileModel.media_checked_at < now - timedelta(seconds=MEDIA_LEASE_SECONDS),
+        ),
+    )
+
+    with SessionLocal() as db:
+        candidates = (
+            db.query(FileModel.id)
+            .filter(waiting)
+            .order_by(FileModel.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not candidates:
+            return []
+
+        claimed = db.execute(
+            update(FileModel)
+            .where(FileModel.id.in_([candidate.id for candidate in candidates]), waiting)
+            .values(media_state=MediaState.PROCESSING, media_checked_at=now)
+            .returning(FileModel.id, FileModel.uid, FileModel.path, FileModel.sha256, FileModel.content_encoding)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+    return [MediaJob(*row) for row in claimed]
+
+
+def find_media_info(sha256s: Iterable[str]) -> Dict[str, Tuple[str, dict]]:
+    """
+    Ищет уже извлечённые свойства блобов с тем же содержимым.
+
+    :param sha256s: SHA-256 содержимого файлов.
+    :type sha256s: Iterable[str]
+    :return: MIME-тип и свойства медиа по SHA-256.
+    :rtype: Dict[str, Tuple[str, dict]]
+    """
+    known = {}
+    with SessionLocal() as db:
+        for sha256 in sha256s:
+            row = (
+                db.query(FileModel.detected_type, FileModel.media_info)
+                .filter(FileModel.sha256 == sha256, FileModel.media_state == MediaState.DONE)
+                .limit(1)
+                .first()
+            )
+            if row is not None:
+                known[sha256] = (row.detected_type, row.media_info)
+    return known
+
+
+def save_media_results(results: List[dict]) -> None:
+    """
+    Сохраняет результаты извлечения свойств медиа одним пакетным UPDATE.
+
+    :param results: Словари с id записи и значениями detected_type, media_info,
+        media_state и media_checked_at.
+    :type results: List[dict]
+    :return: None
+    :rtype: None
+    """
+    with SessionLocal() as db:
+        db.execute(update(FileModel), results)
+        db.commit()
+
+
+def restart_media_executor() -> None:
+    """
+    Пересоздаёт пул процессов извлечения свойств медиа.
+
+    Если дочерний процесс упал (например, убит по памяти на повреждённом
+    файле), ProcessPoolExecutor больше не принимает задачи.
+
+    :return: None
+    :rtype: None
+    """
+    global media_executor
+
+    if media_executor is not None:
+        media_executor.shutdown(wait=False, cancel_futures=True)
+    media_executor = ProcessPoolExecutor(
+        MEDIA_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=lower_priority
+    )
+
+
+async def run_in_media_executor(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Выполняет тяжёлую по CPU операцию с медиа в пуле процессов media_executor.
+
+    Если пул не запущен (MEDIA_WORKERS=0 или вне приложения), операция
+    выполняется в пуле потоков. Если процесс пула упал, пул пересоздаётся
+    один раз, сколько бы задач ни получили ошибку.
+
+    :param func: Функция уровня модуля (её можно передать в другой процесс).
+    :type func: Callable[..., Any]
+    :return: Результат выполнения функции.
+    :rtype: Any
+    :raises BrokenProcessPool: Если процесс пула упал (пул к этому времени уже пересоздан).
+    """
+    loop = asyncio.get_running_loop()
+    executor = media_executor
+    try:
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        if executor is not None and executor is media_executor:
+            logger.error("Media worker process died, restarting the pool.")
+            restart_media_executor()
+        raise
+
+
+async def process_media_jobs(jobs: List[MediaJob]) -> None:
+    """
+    Извлекает свойства медиа захваченных файлов и сохраняет их.
+
+    Разбор идёт в пуле процессов media_executor, по одному разу на
+    содержимое: записи с тем же SHA-256, уже разобранные раньше или
+    попавшие в ту же пачку, получают готовый результат. Записи, которые не
+    удалось прочитать, помечаются failed. Изменённые записи сбрасываются из
+    кеша метаданных.
+
+    :param jobs: Захваченные задачи.
+    :type jobs: List[MediaJob]
+    :return: None
+    :rtype: None
+    """
+    known = await run_in_threadpool(find_media_info, {job.sha256 for job in jobs if job.sha256})
+
+    extractions = {}
+    for job in jobs:
+        key = job.sha256 or job.path
+        if key not in known and key not in extractions:
+            extractions[key] = run_in_media_executor(
+                extract_media_info, job.path, MEDIA_PROBE_TIMEOUT, job.content_encoding
+            )
+    extracted = dict(zip(extractions, await asyncio.gather(*extractions.values(), return_exceptions=True)))
+
+    now = datetime.utcnow()
+    results = []
+    for job in jobs:
+        key = job.sha256 or job.path
+        result = known[key] if key in known else extracted[key]
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to extract media info of {job.uid}: {result}")
+            detected_type, media_info, state = None, None, MediaState.FAILED
+        else:
+            (detected_type, media_info), state = result, MediaState.DONE
+        results.append({
+            "id": job.file_id,
+            "detected_type": detected_type,
+            "media_info": media_info,
+            "media_state": state,
+            "media_checked_at": now,
+        })
+
+    await run_in_threadpool(save_media_results, results)
+    await metadata_cache.invalidate(*(job.uid for job in jobs))
+
+
+async def media_worker() -> None:
+    """
+    Воркер извлечения свойств медиа: забирает пачки файлов из БД, пока они
+    есть, и засыпает до уведомления или до следующего опроса.
+
+    Одновременно разбирается не больше MEDIA_BATCH_SIZE файлов на
+    MEDIA_WORKERS процессах с пониженным приоритетом, поэтому поток загрузок
+    не отнимает у обработчиков запросов ни GIL, ни всё CPU.
+
+    :return: None
+    :rtype: None
+    """
+    while True:
+        try:
+            jobs = await run_in_threadpool(claim_media_jobs, MEDIA_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Failed to claim media jobs: {e}")
+            jobs = []
+
+        if jobs:
+            try:
+                await process_media_jobs(jobs)
+            except Exception as e:
+                logger.error(f"Failed to process media jobs: {e}")
+            continue
+
+        try:
+            await asyncio.wait_for(media_queue_event.wait(), MEDIA_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        media_queue_event.clear()
+
+
+def start_media_workers() -> List[asyncio.Task]:
+    """
+    Запускает пул процессов и воркер извлечения свойств медиа.
+
+    MEDIA_WORKERS=0 выключает разбор: файлы остаются в состоянии pending.
+
+    :return: Запущенные задачи воркеров.
+    :rtype: List[asyncio.Task]
+    """
+    if MEDIA_WORKERS <= 0:
+        return []
+    restart_media_executor()
+    logger.info(f"Started media worker with {MEDIA_WORKERS} processes.")
+    return [asyncio.create_task(media_worker())]
+
+
+async def stop_media_workers(workers: List[asyncio.Task]) -> None:
+    """
+    Останавливает воркер и пул процессов извлечения свойств медиа.
+
+    Прерванные файлы останутся в состоянии processing и будут разобраны
+    после истечения аренды.
+
+    :param workers: Задачи воркеров.
+    :type workers: List[asyncio.Task]
+    :return: None
+    :rtype: None
+    """
+    global media_executor
+
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    if media_executor is not None:
+        media_executor.shutdown(wait=False, cancel_futures=True)
+        media_executor = None
+
+
+def abort_abandoned_uploads() -> None:
+    """
+    Прерывает брошенные multipart-загрузки, чтобы их части не занимали место в хранилище.
+
+    :return: None
+    :rtype: None
+    """
+    try:
+        aborted = abort_abandoned_multipart_uploads(timedelta(hours=MULTIPART_ABANDON_AFTER_HOURS))
+        logger.info(f"Aborted {aborted} abandoned multipart uploads.")
+    except Exception as e:
+        logger.error(f"Failed to abort abandoned multipart uploads: {e}")
+
+
+def relocate_file(old_path: str, new_path: str) -> bool:
+    """
+    Создаёт файл по новому пути, не трогая старый.
+
+    Используется жёсткая ссылка (без копирования данных), а если её создать
+    нельзя (другой раздел), файл копируется.
+
+    :param old_path: Текущий путь до файла.
+    :type old_path: str
+    :param new_path: Новый путь до файла.
+    :type new_path: str
+    :return: True, если файл по новому пути создан этим вызовом.
+    :rtype: bool
+    """
+    if os.path.exists(new_path) or not os.path.exists(old_path):
+        return False
+
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    try:
+        os.link(old_path, new_path)
+    except OSError:
+        shutil.copy2(old_path, new_path)
+    return True
+
+
+def migrate_storage_layout(batch_size: int = 500, pause: float = 0.0, dry_run: bool = False) -> dict:
+    """
+    Переносит файлы локального хранилища в текущую раскладку по подкаталогам.
+
+    Записи обходятся пачками по id (keyset), без загрузки всей таблицы. Для
+    каждого файла: создаётся ссылка по новому пути, затем в одной транзакции
+    переписывается path у всех записей со старым путём, и только после коммита
+    удаляется старый файл. В любой момент файл доступен хотя бы по одному пути
+    из базы, поэтому миграцию можно проводить на работающем сервисе.
+
+    :param batch_size: Количество записей в одной пачке.
+    :type batch_size: int
+    :param pause: Пауза между пачками в секундах, чтобы не нагружать диск.
+    :type pause: float
+    :param dry_run: Только посчитать файлы, которые нужно перенести.
+    :type dry_run: bool
+    :return: Количество просмотренных записей и перенесённых файлов.
+    :rtype: dict
+    """
+    stats = {"scanned": 0, "moved": 0}
+    last_id = 0
+
+    while True:
+        with SessionLocal() as db:
+            batch = (
+                db.query(FileModel.id, FileModel.path)
+                .filter(FileModel.id > last_id)
+                .order_by(FileModel.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for file_id, old_path in batch:
+                stats["scanned"] += 1
+                if not old_path:
+                    continue
+                new_path = storage_path(os.path.basename(old_path))
+                if os.path.normpath(new_path) == os.path.normpath(old_path):
+                    continue
+
+                if dry_run:
+                    stats["moved"] += 1
+                    continue
+
+                created = relocate_file(old_path, new_path)
+                updated = db.scalars(
+                    update(FileModel)
+                    .where(FileModel.path == old_path)
+                    .values(path=new_path)
+                    .returning(FileModel.uid)
+                ).all()
+                db.commit()
+
+                if updated:
+                    stats["moved"] += 1
+                    metadata_cache.invalidate_sync(*updated)
+                    if os.path.exists(old_path):
+                        os.remove(old_path)
+                elif created:
+                    # Запись удалили, пока файл переносился.
+                    os.remove(new_path)
+
+        logger.info(f"Storage layout migration: {stats['scanned']} scanned, {stats['moved']} moved")
+        if pause:
+            time.sleep(pause)
+
+    return stats
+
+
+def evict_local_copy(path: str) -> int:
+    """
+    Удаляет локальную копию блоба, если он уже загружен в облако.
+
+    Загруженным считается блоб в состоянии done: у блоба, поставленного на
+    повторную загрузку, локальная копия — единственная целая. Строки с этим
+    путём блокируются на время удаления, поэтому параллельная загрузка того
+    же содержимого не потеряет файл.
+
+    :param path: Путь до блоба.
+    :type path: str
+    :return: Размер освобождённого места в байтах (0, если блоб вытеснить нельзя).
+    :rtype: int
+    """
+    with SessionLocal() as db:
+        records = db.query(FileModel).filter(FileModel.path == path).with_for_update().all()
+        if not any(record.storage_url and record.upload_state == UploadState.DONE for record in records):
+            return 0
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        for record in records:
+            record.is_local = False
+        db.commit()
+        metadata_cache.invalidate_sync(*(record.uid for record in records))
+        # У сжатых записей, созданных до появления stored_size, берётся size: он не меньше реального.
+        return max(record.stored_size if record.stored_size is not None else record.size or 0 for record in records)
+
+
+def evict_local_copies() -> dict:
+    """
+    Держит объём локального хранилища в пределах LOCAL_STORAGE_QUOTA_BYTES.
+
+    Когда квота превышена, локальные копии блобов, уже загруженных в облако,
+    удаляются в порядке давности последнего скачивания (LRU), пока объём не
+    опустится до LOCAL_STORAGE_LOW_WATERMARK от квоты. Запас ниже квоты нужен,
+    чтобы вытеснение не запускалось на каждой новой загрузке. Скачивание
+    вытесненного файла вернёт его на диск из облака.
+
+    :return: Объём до вытеснения, количество вытесненных блобов и освобождённых байт.
+    :rtype: dict
+    """
+    stats = {"usage": 0, "evicted": 0, "freed": 0}
+    if LOCAL_STORAGE_QUOTA_BYTES <= 0:
+        return stats
+
+    def local_blobs(db: Session):
+        return (
+            db.query(
+                FileModel.path.label("path"),
+                func.max(func.coalesce(FileModel.stored_size, FileModel.size)).label("size"),
+                func.max(func.coalesce(FileModel.last_accessed_at, FileModel.created_at)).label("accessed_at"),
+                func.count(case((FileModel.upload_state == UploadState.DONE, FileModel.storage_url))).label("uploaded"),
+            )
+            .filter(FileModel.is_local.is_(True))
+            .group_by(FileModel.path)
+            .subquery()
+        )
+
+    with SessionLocal() as db:
+        blobs = local_blobs(db)
+        usage = db.query(func.coalesce(func.sum(blobs.c.size), 0)).scalar()
+    stats["usage"] = usage
+
+    target = LOCAL_STORAGE_QUOTA_BYTES * LOCAL_STORAGE_LOW_WATERMARK
+    if usage <= LOCAL_STORAGE_QUOTA_BYTES:
+        return stats
+
+    skipped = set()
+    while usage > target:
+        with SessionLocal() as db:
+            blobs = local_blobs(db)
+            candidates = (
+                db.query(blobs.c.path)
+                .filter(blobs.c.uploaded > 0)
+                .order_by(blobs.c.accessed_at)
+                .limit(EVICTION_BATCH_SIZE + len(skipped))
+                .all()
+            )
+        candidates = [path for (path,) in candidates if path not in skipped]
+        if not candidates:
+            break
+
+        for path in candidates:
+            freed = evict_local_copy(path)
+            if not freed:
+                skipped.add(path)
+                continue
+            logger.info(f"Evicted local copy {path} ({freed} bytes)")
+            usage -= freed
+            stats["evicted"] += 1
+            stats["freed"] += freed
+            if usage <= target:
+                break
+
+    logger.info(f"Local storage eviction: {stats}")
+    return stats
+
+
+def record_verification(path: str, local_ok: Optional[bool], cloud_ok: Optional[bool]) -> None:
+    """
+    Сохраняет результат проверки блоба и чинит то, что можно починить.
+
+    Испорченная локальная копия при целой облачной удаляется: при следующем
+    скачивании блоб вернётся с облака. Испорченная облачная копия при целой
+    локальной ставится в очередь на повторную загрузку, а storage_url
+    сбрасывается: до повторной загрузки блоб не вытесняется и не читается
+    из облака. Если испорчены обе, остаётся только запись в логе.
+
+    :param path: Путь до блоба.
+    :type path: str
+    :param local_ok: Результат проверки локальной копии (None, если её нет).
+    :type local_ok: Optional[bool]
+    :param cloud_ok: Результат проверки облачной копии (None, если её нет).
+    :type cloud_ok: Optional[bool]
+    :return: None
+    :rtype: None
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        records = db.query(FileModel).filter(FileModel.path == path).with_for_update().all()
+        if local_ok is False:
+            logger.error(f"Local copy {path} failed integrity check")
+            if cloud_ok:
+                if os.path.exists(path):
+                    os.remove(path)
+                for record in records:
+                    record.is_local = False
+        if cloud_ok is False:
+            logger.error(f"Cloud copy of {path} failed integrity check")
+            if local_ok:
+                for record in records:
+                    record.storage_url = None
+                    record.upload_state = UploadState.PENDING
+                    record.upload_attempts = 0
+                    record.next_attempt_at = now
+                    record.upload_error = "Cloud copy failed integrity check"
+        for record in records:
+            record.verified_at = now
+        db.commit()
+        if local_ok is False or cloud_ok is False:
+            metadata_cache.invalidate_sync(*(record.uid for record in records))
+
+
+def scrub_files(batch_size: int = SCRUB_BATCH_SIZE) -> dict:
+    """
+    Проверяет целостность локальных и облачных копий давно не проверенных блобов.
+
+    Локальная копия перечитывается целиком со скоростью не выше
+    SCRUB_BYTES_PER_SECOND, чтобы проверка не отнимала диск у загрузок и
+    скачиваний, и сверяется по SHA-256. Облачная копия не скачивается:
+    её ETag из HEAD-запроса сверяется с MD5 файла, а для multipart-загрузок —
+    с ETag, посчитанным по частям локальной копии. Без целой локальной копии
+    у multipart-объекта проверяется только размер (stored_size, а у сжатых
+    записей, созданных до его появления, — ничего). Файлы, загруженные
+    напрямую в облако, не имеют SHA-256 и локальной копии, и у них
+    проверяется только облачная копия.
+
+    :param batch_size: Сколько записей проверить за запуск.
+    :type batch_size: int
+    :return: Количество проверенных блобов и найденных испорченных копий.
+    :rtype: dict
+    """
+    stats = {"scanned": 0, "local_corrupted": 0, "cloud_corrupted": 0}
+    limiter = RateLimiter(SCRUB_BYTES_PER_SECOND)
+
+    with SessionLocal() as db:
+        blobs = (
+            db.query(
+                FileModel.path, FileModel.sha256, FileModel.md5, FileModel.size,
+                FileModel.storage_url, FileModel.is_local, FileModel.content_encoding, FileModel.stored_size,
+            )
+            .filter(or_(FileModel.sha256.isnot(None), FileModel.storage_url.isnot(None)))
+            .order_by(FileModel.verified_at.asc().nullsfirst(), FileModel.id)
+            .limit(batch_size)
+            .all()
+        )
+
+    checked = set()
+    for blob in blobs:
+        if blob.path in checked:
+            continue
+        checked.add(blob.path)
+
+        local_ok = cloud_ok = None
+        md5 = multipart_etag = None
+        # У сжатого блоба на диске и в облаке лежат сжатые байты: с ними
+        # сверяются MD5 и размер, а SHA-256 — с распакованным содержимым.
+        stored_size = blob.stored_size
+        if stored_size is None and not blob.content_encoding:
+            stored_size = blob.size
+        try:
+            if blob.is_local and blob.sha256:
+                try:
+                    sha256, md5, multipart_etag = file_checksums(blob.path, MULTIPART_PART_SIZE, limiter.consume)
+                    if blob.content_encoding:
+                        sha256 = decoded_sha256(blob.path, blob.content_encoding, limiter.consume)
+                        if stored_size is None:
+                            stored_size = os.path.getsize(blob.path)
+                    local_ok = sha256 == blob.sha256
+                except FileNotFoundError:
+                    local_ok = False
+                except (OSError, EOFError) as e:
+                    logger.warning(f"Failed to decode {blob.path}: {e}")
+                    local_ok = False
+
+            if blob.storage_url:
+                head = head_cloud_file(os.path.basename(blob.path))
+                if head is None or (stored_size is not None and head["size"] != stored_size):
+                    cloud_ok = False
+                elif "-" in head["etag"]:
+                    cloud_ok = not local_ok or head["etag"] == multipart_etag
+                else:
+                    expected_md5 = blob.md5 or (md5 if local_ok else None)
+                    cloud_ok = expected_md5 is None or head["etag"] == expected_md5
+        except Exception as e:
+            logger.error(f"Failed to verify {blob.path}: {e}")
+            continue
+
+        record_verification(blob.path, local_ok, cloud_ok)
+        stats["scanned"] += 1
+        stats["local_corrupted"] += local_ok is False
+        stats["cloud_corrupted"] += cloud_ok is False
+
+    logger.info(f"Integrity scrub: {stats}")
+    return stats
+
+
+def expire_upload_sessions() -> int:
+    """
+    Удаляет сессии возобновляемой загрузки, не получавшие фрагментов
+    дольше UPLOAD_SESSION_TTL_HOURS часов, вместе с их частичными файлами.
+
+    :return: Количество удалённых сессий.
+    :rtype: int
+    """
+    threshold = datetime.utcnow() - timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    with SessionLocal() as db:
+        uids = db.scalars(
+            delete(UploadSession).where(UploadSession.updated_at < threshold).returning(UploadSession.uid)
+        ).all()
+        db.commit()
+
+    for uid in uids:
+        path = os.path.join(LOCAL_STORAGE_PARTIAL_PATH, f"{uid}.part")
+        if os.path.exists(path):
+            os.remove(path)
+    if uids:
+        logger.info(f"Expired {len(uids)} upload sessions")
+    return len(uids)
 
 
 def start_scheduler() -> None:
     """
     Запускает планировщик задач для регулярной очистки неиспользуемых файлов.
 
-    Планировщик настроен на выполнение задачи по очистке файлов каждый день в 01:00.
+    Планировщик настроен на выполнение задачи по очистке файлов каждый день в 01:00,
+    на ежечасное прерывание брошенных multipart-загрузок, на вытеснение
+    локальных копий по квоте каждые EVICTION_INTERVAL_MINUTES минут, на
+    проверку целостности копий каждые SCRUB_INTERVAL_HOURS часов и на
+    ежечасное удаление брошенных сессий возобновляемой загрузки.
 
     :return: None
     :rtype: None
@@ -70,5 +1392,9 @@ def start_scheduler() -> None:
     scheduler = BackgroundScheduler()
     trigger = CronTrigger(hour=1, minute=0)
     scheduler.add_job(clean_unused_files, trigger)
+    scheduler.add_job(abort_abandoned_uploads, CronTrigger(minute=30))
+    scheduler.add_job(evict_local_copies, IntervalTrigger(minutes=EVICTION_INTERVAL_MINUTES))
+    scheduler.add_job(scrub_files, IntervalTrigger(hours=SCRUB_INTERVAL_HOURS))
+    scheduler.add_job(expire_upload_sessions, CronTrigger(minute=45))
     scheduler.start()
     logger.info("Scheduler started.")
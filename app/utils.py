@@ -1,10 +1,42 @@
 import os
-import shutil
+import base64
+import fcntl
+import hashlib
+import json
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Mapping, Optional, Tuple
+from urllib.parse import quote
 from uuid import uuid4
 
+import aiofiles
 from fastapi import UploadFile
+from starlette.requests import ClientDisconnect
 
-from app.configs import LOCAL_STORAGE_PATH
+from app.compression import COMPRESSIBLE_TYPES, DEFAULT_LEVELS, check_encoding, compress_file, compression_ratio
+from app.media import SNIFF_SIZE, sniff_mime_type
+from app.metrics import save_duration
+from app.configs import (
+    COMPRESSION,
+    COMPRESSION_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_SAMPLE_SIZE,
+    COMPRESSION_MAX_RATIO,
+    LOCAL_STORAGE_PATH,
+    LOCAL_STORAGE_TMP_PATH,
+    LOCAL_DERIVATIVES_PATH,
+    STORAGE_SHARD_DEPTH,
+    STORAGE_SHARD_WIDTH,
+    STREAM_CHUNK_SIZE,
+)
+
+
+DERIVATIVES_PREFIX = "derivatives/"
+
+
+if COMPRESSION != "off":
+    check_encoding(COMPRESSION)
 
 
 def generate_uid() -> str:
@@ -17,23 +49,535 @@ def generate_uid() -> str:
     return str(uuid4())
 
 
-def save_file_locally(file: UploadFile, uid: str) -> str:
+async def save_file_locally(file: UploadFile, uid: str) -> Tuple[str, int, str, str]:
     """
     Сохраняет файл локально в указанной директории с уникальным именем.
 
+    Содержимое копируется чанками через aiofiles, поэтому запись не блокирует event loop.
+
     :param file: Загружаемый файл.
     :type file: UploadFile
     :param uid: Уникальный идентификатор для файла.
     :type uid: str
-    :return: Путь до сохраненного файла.
+    :return: Путь до временного файла, его размер в байтах, SHA-256 и MD5 в hex.
+    :rtype: Tuple[str, int, str, str]
+    """
+    return await save_stream_locally(iter_upload_file(file), uid)
+
+
+async def iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    """
+    Читает загруженный файл чанками размером STREAM_CHUNK_SIZE.
+
+    :param file: Загружаемый файл.
+    :type file: UploadFile
+    :return: Асинхронный итератор чанков файла.
+    :rtype: AsyncIterator[bytes]
+    """
+    while chunk := await file.read(STREAM_CHUNK_SIZE):
+        yield chunk
+
+
+async def save_stream_locally(stream: AsyncIterator[bytes], uid: str) -> Tuple[str, int, str, str]:
+    """
+    Сохраняет поток байтов во временный файл хранилища, не буферизуя его целиком.
+
+    Размер, SHA-256 и MD5 считаются по мере записи чанков, за один проход. Мелкие чанки сервера
+    копятся до STREAM_CHUNK_SIZE, чтобы не гонять каждый в пул потоков aiofiles.
+    При обрыве потока недописанный файл удаляется. Временный файл лежит на том же
+    разделе, что и блобы, поэтому place_blob переносит его без копирования.
+
+    :param stream: Асинхронный итератор чанков тела запроса.
+    :type stream: AsyncIterator[bytes]
+    :param uid: Уникальный идентификатор для файла.
+    :type uid: str
+    :return: Путь до временного файла, его размер в байтах, SHA-256 и MD5 в hex.
+    :rtype: Tuple[str, int, str, str]
+    """
+    if not os.path.exists(LOCAL_STORAGE_TMP_PATH):
+        os.makedirs(LOCAL_STORAGE_TMP_PATH, exist_ok=True)
+
+    file_path = os.path.join(LOCAL_STORAGE_TMP_PATH, f"{uid}.part")
+    checksum = hashlib.sha256()
+    md5 = hashlib.md5()
+    size = 0
+    pending = bytearray()
+
+    started = time.perf_counter()
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            async for chunk in stream:
+                if not chunk:
+                    continue
+                checksum.update(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+                pending += chunk
+                if len(pending) >= STREAM_CHUNK_SIZE:
+                    await buffer.write(bytes(pending))
+                    pending.clear()
+            if pending:
+                await buffer.write(bytes(pending))
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    save_duration.observe(time.perf_counter() - started)
+    return file_path, size, checksum.hexdigest(), md5.hexdigest()
+
+
+async def append_stream(file_path: str, offset: int, max_length: int, stream: AsyncIterator[bytes]) -> int:
+    """
+    Дописывает поток байтов в частичный файл возобновляемой загрузки с позиции offset.
+
+    Всё, что лежит в файле после offset (хвост прерванного фрагмента),
+    отбрасывается. На время записи файл захватывается эксклюзивной
+    блокировкой, так что два параллельных запроса не перемешают данные.
+    При обрыве соединения уже полученные байты остаются в файле, и клиент
+    продолжит с них.
+
+    :param file_path: Путь до частичного файла.
+    :type file_path: str
+    :param offset: Позиция, с которой дописывать.
+    :type offset: int
+    :param max_length: Сколько байтов ещё можно принять.
+    :type max_length: int
+    :param stream: Асинхронный итератор чанков тела запроса.
+    :type stream: AsyncIterator[bytes]
+    :return: Количество записанных байтов.
+    :rtype: int
+    :raises BlockingIOError: Если в файл уже пишет другой запрос.
+    :raises ValueError: Если поток длиннее max_length.
+    """
+    written = 0
+    pending = bytearray()
+
+    async with aiofiles.open(file_path, "r+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        await f.seek(offset)
+        await f.truncate()
+        try:
+            async for chunk in stream:
+                if written + len(pending) + len(chunk) > max_length:
+                    raise ValueError("Chunk exceeds declared upload length")
+                pending += chunk
+                if len(pending) >= STREAM_CHUNK_SIZE:
+                    await f.write(bytes(pending))
+                    written += len(pending)
+                    pending.clear()
+        except ClientDisconnect:
+            pass
+        if pending:
+            await f.write(bytes(pending))
+            written += len(pending)
+
+    return written
+
+
+def parse_upload_metadata(header: str) -> dict:
+    """
+    Разбирает заголовок Upload-Metadata протокола tus: пары «ключ base64-значение» через запятую.
+
+    :param header: Значение заголовка.
+    :type header: str
+    :return: Значения по ключам.
+    :rtype: dict
+    :raises ValueError: Если значение не в base64.
+    """
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in header.split(","))):
+        key, _, value = pair.partition(" ")
+        metadata[key] = base64.b64decode(value.strip(), validate=True).decode() if value else ""
+    return metadata
+
+
+def storage_path(key: str) -> str:
+    """
+    Возвращает путь файла в локальном хранилище с разбиением по подкаталогам.
+
+    Первые STORAGE_SHARD_DEPTH групп по STORAGE_SHARD_WIDTH символов ключа
+    становятся подкаталогами: при глубине 2 и ширине 2 ключ abcdef... лежит
+    в storage/ab/cd/abcdef..., так что ни в одном каталоге не копятся
+    миллионы записей.
+
+    :param key: Имя файла в хранилище (SHA-256 блоба или uid).
+    :type key: str
+    :return: Путь до файла.
+    :rtype: str
+    """
+    shards = [
+        key[i * STORAGE_SHARD_WIDTH:(i + 1) * STORAGE_SHARD_WIDTH]
+        for i in range(STORAGE_SHARD_DEPTH)
+    ]
+    return os.path.join(LOCAL_STORAGE_PATH, *filter(None, shards), key)
+
+
+def derivative_path(source: str, kind: str, width: int) -> str:
+    """
+    Возвращает путь производного файла в каталоге LOCAL_DERIVATIVES_PATH.
+
+    Каталог разбит на подкаталоги так же, как само хранилище, а путь
+    однозначно определяется исходным содержимым, видом и шириной.
+
+    :param source: SHA-256 исходного содержимого или uid файла.
+    :type source: str
+    :param kind: Вид производного файла.
+    :type kind: str
+    :param width: Ширина производного файла.
+    :type width: int
+    :return: Путь до производного файла.
     :rtype: str
     """
-    if not os.path.exists(LOCAL_STORAGE_PATH):
-        os.makedirs(LOCAL_STORAGE_PATH)
+    path = storage_path(source)
+    directory = os.path.join(LOCAL_DERIVATIVES_PATH, os.path.relpath(os.path.dirname(path), LOCAL_STORAGE_PATH))
+    return os.path.normpath(os.path.join(directory, f"{source}-{kind}-{width}.webp"))
+
+
+def derivative_key(path: str) -> str:
+    """
+    Возвращает имя производного файла в облачном хранилище.
+
+    Производные лежат под префиксом derivatives/ и не пересекаются с блобами.
+
+    :param path: Путь до производного файла на локальном диске.
+    :type path: str
+    :return: Имя файла в облаке.
+    :rtype: str
+    """
+    return f"{DERIVATIVES_PREFIX}{os.path.basename(path)}"
+
+
+def blob_path(sha256: str) -> str:
+    """
+    Возвращает путь блоба в локальном хранилище по SHA-256 его содержимого.
+
+    :param sha256: SHA-256 содержимого в hex.
+    :type sha256: str
+    :return: Путь до блоба.
+    :rtype: str
+    """
+    return storage_path(sha256)
+
+
+def place_blob(temp_path: str, sha256: str) -> str:
+    """
+    Переносит временный файл на место блоба с тем же содержимым.
 
-    file_path = os.path.join(LOCAL_STORAGE_PATH, f"{uid}_{file.filename}")
+    Если такой блоб уже есть, временный файл удаляется, а у блоба обновляется
+    время изменения, чтобы очистка не сочла его старым.
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    :param temp_path: Путь до временного файла.
+    :type temp_path: str
+    :param sha256: SHA-256 содержимого в hex.
+    :type sha256: str
+    :return: Путь до блоба.
+    :rtype: str
+    """
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(temp_path)
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+    return path
+
+
+def choose_encoding(path: str, size: int) -> Optional[str]:
+    """
+    Решает, сжимать ли загруженный файл.
+
+    Сжимаются только файлы не меньше COMPRESSION_MIN_SIZE, чей тип по
+    сигнатуре входит в COMPRESSIBLE_TYPES и чьё начало (COMPRESSION_SAMPLE_SIZE
+    байтов) сжимается хотя бы до COMPRESSION_MAX_RATIO.
+
+    :param path: Путь до файла.
+    :type path: str
+    :param size: Размер файла.
+    :type size: int
+    :return: Кодирование COMPRESSION или None, если сжимать не нужно.
+    :rtype: Optional[str]
+    """
+    if COMPRESSION == "off" or size < COMPRESSION_MIN_SIZE:
+        return None
+    with open(path, "rb") as f:
+        sample = f.read(max(SNIFF_SIZE, COMPRESSION_SAMPLE_SIZE))
+    if sniff_mime_type(sample[:SNIFF_SIZE]) not in COMPRESSIBLE_TYPES:
+        return None
+    if compression_ratio(sample, COMPRESSION, COMPRESSION_LEVEL) > COMPRESSION_MAX_RATIO:
+        return None
+    return COMPRESSION
+
+
+def place_upload(
+    temp_path: str,
+    sha256: str,
+    size: int,
+    known: bool,
+    encoding: Optional[str] = None
+) -> Tuple[str, Optional[str], Optional[str], int]:
+    """
+    Переносит загруженный файл на место блоба, при необходимости сжимая его.
+
+    Для нового содержимого кодирование выбирает choose_encoding, а файл
+    заменяет блоб, даже если тот остался на диске от удалённых записей: его
+    кодирование неизвестно. Для уже известного содержимого используется
+    кодирование его записей, и файл сжимается, только если блоба на диске нет
+    (например, он был вытеснен).
+
+    :param temp_path: Путь до временного файла.
+    :type temp_path: str
+    :param sha256: SHA-256 содержимого в hex.
+    :type sha256: str
+    :param size: Размер файла.
+    :type size: int
+    :param known: Есть ли уже записи с этим содержимым.
+    :type known: bool
+    :param encoding: Кодирование блоба у существующих записей.
+    :type encoding: Optional[str]
+    :return: Путь до блоба, его кодирование, MD5 сжатых байтов (None, если
+        файл не сжимался) и размер блоба на диске.
+    :rtype: Tuple[str, Optional[str], Optional[str], int]
+    """
+    path = blob_path(sha256)
+    if known and os.path.exists(path):
+        path = place_blob(temp_path, sha256)
+        return path, encoding, None, os.path.getsize(path)
+    if not known:
+        encoding = choose_encoding(temp_path, size)
+
+    md5 = None
+    stored_size = size
+    if encoding:
+        compressed_path = f"{temp_path}.{encoding}"
+        try:
+            level = COMPRESSION_LEVEL if encoding == COMPRESSION else DEFAULT_LEVELS[encoding]
+            stored_size, md5 = compress_file(temp_path, compressed_path, encoding, level)
+            if known or stored_size <= size * COMPRESSION_MAX_RATIO:
+                os.replace(compressed_path, temp_path)
+            else:
+                encoding = md5 = None
+                stored_size = size
+        finally:
+            if os.path.exists(compressed_path):
+                os.remove(compressed_path)
+
+    if known:
+        return place_blob(temp_path, sha256), encoding, md5, stored_size
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return path, encoding, md5, stored_size
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """
+    Проверяет, принимает ли клиент ответ в кодировании encoding.
+
+    :param accept_encoding: Заголовок Accept-Encoding запроса.
+    :type accept_encoding: Optional[str]
+    :param encoding: gzip или zstd.
+    :type encoding: str
+    :return: True, если кодирование (или *) перечислено без q=0.
+    :rtype: bool
+    """
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.lower().startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+
+def content_disposition(filename: str) -> str:
+    """
+    Строит заголовок Content-Disposition для скачивания файла так же, как FileResponse.
+
+    :param filename: Имя файла.
+    :type filename: str
+    :return: Значение заголовка.
+    :rtype: str
+    """
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает заголовок Range с одним диапазоном байтов.
+
+    Несколько диапазонов и нераспознанные единицы игнорируются: в этом случае
+    по RFC 9110 можно отдать файл целиком.
+
+    :param range_header: Значение заголовка Range.
+    :type range_header: str
+    :param file_size: Размер файла в байтах.
+    :type file_size: int
+    :return: Первый и последний байт диапазона включительно или None.
+    :rtype: Optional[Tuple[int, int]]
+    :raises ValueError: Если диапазон не пересекается с файлом.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        start = int(first) if first.strip() else None
+        end = int(last) if last.strip() else None
+    except ValueError:
+        return None
+
+    if start is None:
+        if end is None:
+            return None
+        if end == 0:
+            raise ValueError("Empty suffix range")
+        start, end = max(file_size - end, 0), file_size - 1
+    elif end is None:
+        end = file_size - 1
+    elif end < start:
+        return None
+
+    if start < 0 or start >= file_size:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, file_size - 1)
+
+
+async def iter_file_range(file_path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    """
+    Читает диапазон байтов файла чанками размером STREAM_CHUNK_SIZE.
+
+    :param file_path: Путь до файла.
+    :type file_path: str
+    :param start: Первый байт диапазона.
+    :type start: int
+    :param end: Последний байт диапазона включительно.
+    :type end: int
+    :return: Асинхронный итератор чанков.
+    :rtype: AsyncIterator[bytes]
+    """
+    remaining = end - start + 1
+    async with aiofiles.open(file_path, "rb") as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: float) -> bool:
+    """
+    Проверяет условные заголовки If-None-Match и If-Modified-Since.
+
+    :param headers: Заголовки запроса.
+    :type headers: Mapping[str, str]
+    :param etag: ETag файла.
+    :type etag: str
+    :param last_modified: Время последнего изменения файла (unix time).
+    :type last_modified: float
+    :return: True, если клиенту можно ответить 304 Not Modified.
+    :rtype: bool
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def encode_cursor(created_at: datetime, record_id: int) -> str:
+    """
+    Кодирует позицию в списке файлов в непрозрачный курсор.
+
+    :param created_at: Дата создания последней отданной записи.
+    :type created_at: datetime
+    :param record_id: id последней отданной записи.
+    :type record_id: int
+    :return: Курсор для следующей страницы.
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), record_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Разбирает курсор, выданный encode_cursor.
+
+    :param cursor: Курсор.
+    :type cursor: str
+    :return: Дата создания и id последней отданной записи.
+    :rtype: Tuple[datetime, int]
+    :raises ValueError: Если курсор повреждён.
+    """
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def file_checksums(
+    file_path: str,
+    part_size: int,
+    on_read: Optional[Callable[[int], None]] = None
+) -> Tuple[str, str, str]:
+    """
+    Считает контрольные суммы файла за одно чтение.
+
+    Кроме SHA-256 и MD5 считается ETag, который S3 выдаёт объекту после
+    multipart-загрузки частями по part_size: MD5 от склеенных MD5 частей
+    с числом частей через дефис.
+
+    :param file_path: Путь до файла.
+    :type file_path: str
+    :param part_size: Размер части multipart-загрузки.
+    :type part_size: int
+    :param on_read: Вызывается с размером каждого прочитанного чанка,
+        например для ограничения скорости чтения.
+    :type on_read: Optional[Callable[[int], None]]
+    :return: SHA-256, MD5 и multipart-ETag в hex.
+    :rtype: Tuple[str, str, str]
+    """
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    part_digests = []
+    with open(file_path, "rb") as f:
+        while True:
+            part_md5 = hashlib.md5()
+            remaining = part_size
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if on_read:
+                    on_read(len(chunk))
+                sha256.update(chunk)
+                md5.update(chunk)
+                part_md5.update(chunk)
+                remaining -= len(chunk)
+            if remaining == part_size and part_digests:
+                break
+            part_digests.append(part_md5.digest())
+            if remaining > 0:
+                break
 
-    return file_path
+    multipart_etag = f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+    return sha256.hexdigest(), md5.hexdigest(), multipart_etag
@@ -0,0 +1,134 @@
+"""
+Нагрузочный бенчмарк: задержка GET /files/{uid} во время параллельных загрузок.
+
+Запускается против уже поднятого сервиса:
+
+    python benchmarks/upload_latency.py --base-url http://127.0.0.1:8000 \
+        --uploaders 16 --upload-size 8388608 --duration 30
+
+Скрипт загружает один эталонный файл, после чего одновременно гоняет
+--uploaders загрузчиков файлов размером --upload-size и одного читателя,
+который в цикле запрашивает метаданные эталонного файла. В конце печатает
+перцентили задержки чтения и пропускную способность загрузок.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Возвращает перцентиль q (0..100) по методу ближайшего ранга.
+
+    :param values: Измерения.
+    :type values: List[float]
+    :param q: Порядок перцентиля.
+    :type q: float
+    :return: Значение перцентиля.
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    """
+    Сводит задержки в перцентили в миллисекундах.
+
+    :param latencies: Задержки в секундах.
+    :type latencies: List[float]
+    :return: p50, p95, p99, max и среднее.
+    :rtype: dict
+    """
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000 if latencies else 0, 3),
+    }
+
+
+async def uploader(client: httpx.AsyncClient, payload: bytes, deadline: float, sizes: List[int]) -> None:
+    """
+    Загружает payload через POST /files/upload в цикле до наступления deadline.
+
+    :param client: Клиент сервиса.
+    :type client: httpx.AsyncClient
+    :param payload: Содержимое загружаемого файла.
+    :type payload: bytes
+    :param deadline: Момент остановки по time.perf_counter().
+    :type deadline: float
+    :param sizes: Список, в который складываются размеры загруженных файлов.
+    :type sizes: List[int]
+    :return: None
+    :rtype: None
+    """
+    while time.perf_counter() < deadline:
+        response = await client.post("/files/upload", files={"file": ("bench.bin", payload)})
+        response.raise_for_status()
+        sizes.append(len(payload))
+
+
+async def reader(client: httpx.AsyncClient, uid: str, deadline: float, latencies: List[float]) -> None:
+    """
+    Запрашивает GET /files/{uid} в цикле до наступления deadline и замеряет задержку.
+
+    :param client: Клиент сервиса.
+    :type client: httpx.AsyncClient
+    :param uid: uid эталонного файла.
+    :type uid: str
+    :param deadline: Момент остановки по time.perf_counter().
+    :type deadline: float
+    :param latencies: Список, в который складываются задержки в секундах.
+    :type latencies: List[float]
+    :return: None
+    :rtype: None
+    """
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(f"/files/{uid}")
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.uploaders + 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits) as client:
+        response = await client.post("/files/upload", files={"file": ("probe.txt", b"probe")})
+        response.raise_for_status()
+        uid = response.json()["uid"]
+
+        payload = os.urandom(args.upload_size)
+        latencies: List[float] = []
+        sizes: List[int] = []
+        deadline = time.perf_counter() + args.duration
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            reader(client, uid, deadline, latencies),
+            *(uploader(client, payload, deadline, sizes) for _ in range(args.uploaders))
+        )
+        elapsed = time.perf_counter() - started
+
+    print(f"GET /files/{{uid}}: {len(latencies)} requests")
+    for name, value in latency_summary(latencies).items():
+        print(f"  {name} = {value:.1f}")
+    print(f"uploads: {len(sizes)} files, {sum(sizes) / elapsed / 1024 / 1024:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--uploaders", type=int, default=16)
+    parser.add_argument("--upload-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--duration", type=float, default=30.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,27 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from app import cloud_storage
+
+
+BUCKET = "test-bucket"
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """
+    Фикстура, подменяющая облачное хранилище локальным S3 на moto.
+
+    Порог multipart-загрузки и размер части опущены до минимально допустимых
+    S3 5 МБ, чтобы тесты не гоняли большие файлы.
+    """
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(cloud_storage, "s3_client", client)
+        monkeypatch.setattr(cloud_storage, "YANDEX_CLOUD_BUCKET_NAME", BUCKET)
+        monkeypatch.setattr(cloud_storage, "MULTIPART_THRESHOLD", PART_SIZE)
+        monkeypatch.setattr(cloud_storage, "MULTIPART_PART_SIZE", PART_SIZE)
+        yield client
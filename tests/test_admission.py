@@ -0,0 +1,143 @@
+import pytest
+
+from app.admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, upload_admission
+from app.database import Base
+from tests.test_files import client, engine
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def setup_module():
+    """
+    Фикстура для настройки и очистки базы данных.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def rejection(controller: AdmissionController, client_key: str = "a", size: int = 0) -> AdmissionRejected:
+    with pytest.raises(AdmissionRejected) as e:
+        controller.admit(client_key, size)
+    return e.value
+
+
+async def test_global_limits(tmp_path):
+    """
+    Тест глобальных лимитов допуска.
+
+    Этот тест проверяет:
+    1. Что загрузки сверх max_uploads и max_bytes получают 503 до освобождения места.
+    2. Что одна загрузка больше max_bytes проходит, если других нет.
+    3. Что загрузка, после которой на диске останется меньше min_free_bytes, отклоняется.
+    """
+    controller = AdmissionController(str(tmp_path), max_uploads=2, max_bytes=100, retry_after=7)
+    controller.admit("a", 60)
+    error = rejection(controller, size=50)
+    assert (error.status_code, error.reason, error.retry_after) == (503, "bytes", 7)
+    controller.admit("a", 40)
+    assert rejection(controller).reason == "uploads"
+    controller.release(60)
+    controller.release(40)
+    assert controller.stats() == {"uploads": 0, "bytes": 0}
+    controller.admit("a", 500)
+    controller.release(500)
+
+    controller = AdmissionController(str(tmp_path / "missing"), min_free_bytes=1)
+    free = controller.free_space(controller.clock())
+    controller.admit("a", free // 2)
+    error = rejection(controller, size=free // 2 + 1)
+    assert (error.status_code, error.reason) == (503, "disk")
+
+
+async def test_client_token_bucket(tmp_path):
+    """
+    Тест корзины токенов клиента.
+
+    Этот тест проверяет:
+    1. Что клиент, исчерпавший burst, получает 429 с Retry-After, а другие клиенты — нет.
+    2. Что токены пополняются со временем.
+    3. Что отказ из-за перегрузки не тратит токены.
+    """
+    now = [0.0]
+    controller = AdmissionController(str(tmp_path), max_uploads=3, client_rate=0.5, client_burst=2)
+    controller.clock = lambda: now[0]
+
+    controller.admit("a", 0)
+    controller.admit("a", 0)
+    error = rejection(controller)
+    assert (error.status_code, error.reason, error.retry_after) == (429, "client_rate", 2)
+    controller.admit("b", 0)
+
+    assert rejection(controller, "c").reason == "uploads"
+    controller.release(0)
+    controller.admit("c", 0)
+
+    now[0] = 2.0
+    controller.release(0)
+    controller.admit("a", 0)
+
+
+async def test_upload_is_rejected_before_reading_body(setup_module, monkeypatch):
+    """
+    Тест отказа в загрузке через API.
+
+    Этот тест проверяет:
+    1. Что перегрузка отдаёт 503 с Retry-After, а лимит клиента — 429.
+    2. Что ключ клиента берётся из X-API-Key.
+    3. Что другие запросы не проходят через контроль допуска.
+    """
+    monkeypatch.setattr(upload_admission, "uploads", upload_admission.max_uploads)
+    response = client.post("/files/upload", files={"file": ("busy.txt", b"busy")})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(upload_admission.retry_after)
+    assert client.get("/health").status_code == 200
+    monkeypatch.setattr(upload_admission, "uploads", 0)
+
+    monkeypatch.setattr(upload_admission, "client_rate", 0.01)
+    monkeypatch.setattr(upload_admission, "client_burst", 1)
+    monkeypatch.setattr(upload_admission, "buckets", type(upload_admission.buckets)())
+    headers = {"X-API-Key": "limited"}
+    assert client.post("/files/stream?filename=a.txt", content=b"a", headers=headers).status_code == 200
+    response = client.post("/files/stream?filename=b.txt", content=b"b", headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+    assert client.post("/files/stream?filename=c.txt", content=b"c", headers={"X-API-Key": "other"}).status_code == 200
+    assert upload_admission.stats() == {"uploads": 0, "bytes": 0}
+
+
+async def test_upload_without_content_length_is_counted(tmp_path):
+    """
+    Тест учёта загрузки без Content-Length.
+
+    Этот тест проверяет:
+    1. Что для неё резервируется unknown_size байтов.
+    2. Что резерв растёт по мере чтения тела сверх него и освобождается целиком.
+    """
+    controller = AdmissionController(str(tmp_path), max_bytes=100, unknown_size=10)
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(controller.stats()["bytes"])
+        while True:
+            message = await receive()
+            seen.append(controller.stats()["bytes"])
+            if not message.get("more_body"):
+                break
+
+    messages = [
+        {"type": "http.request", "body": b"x" * 8, "more_body": True},
+        {"type": "http.request", "body": b"x" * 8, "more_body": False},
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    middleware = AdmissionMiddleware(app, controller, [("POST", "/files/stream")])
+    scope = {"type": "http", "method": "POST", "path": "/files/stream", "headers": [], "client": ("1.2.3.4", 1)}
+    await middleware(scope, receive, None)
+
+    assert seen == [10, 10, 16]
+    assert controller.stats() == {"uploads": 0, "bytes": 0}
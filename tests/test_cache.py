@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app import cache
+from app.models import FileMetadata
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_record(uid: str) -> FileMetadata:
+    return FileMetadata(
+        id=1, uid=uid, original_name="cached.txt", size=6, path="storage/cached.txt",
+        created_at=datetime(2024, 1, 1, 12, 30), is_local=True
+    )
+
+
+async def test_memory_cache_counts_hits_and_misses():
+    """
+    Тест кеша в памяти.
+
+    Этот тест проверяет:
+    1. Что запись из кеша совпадает с сохранённой, включая даты.
+    2. Что попадания и промахи считаются.
+    3. Что invalidate удаляет запись.
+    """
+    metadata_cache = cache.MetadataCache(cache.MemoryBackend(max_size=10, ttl=60))
+
+    assert await metadata_cache.get("a") is None
+    await metadata_cache.set(make_record("a"))
+    file_record = await metadata_cache.get("a")
+
+    assert file_record.path == "storage/cached.txt"
+    assert file_record.created_at == datetime(2024, 1, 1, 12, 30)
+    assert metadata_cache.stats() == {"hits": 1, "misses": 1}
+
+    await metadata_cache.invalidate("a")
+    assert await metadata_cache.get("a") is None
+
+
+async def test_memory_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    """
+    Тест вытеснения из кеша в памяти по размеру (LRU) и по TTL.
+    """
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    metadata_cache = cache.MetadataCache(cache.MemoryBackend(max_size=2, ttl=60))
+
+    await metadata_cache.set(make_record("a"))
+    await metadata_cache.set(make_record("b"))
+    await metadata_cache.get("a")
+    await metadata_cache.set(make_record("c"))
+
+    assert await metadata_cache.get("b") is None
+    assert await metadata_cache.get("a") is not None
+
+    now[0] += 61
+    assert await metadata_cache.get("c") is None
+
+
+async def test_memory_cache_is_invalidated_from_other_threads_and_disabled_for_many_workers(monkeypatch):
+    """
+    Тест сброса кеша в памяти из фоновых задач и его выключения при нескольких воркерах.
+
+    Этот тест проверяет:
+    1. Что invalidate_sync из другого потока удаляет запись в event loop кеша.
+    2. Что без Redis при WEB_CONCURRENCY > 1 кеш выключен.
+    """
+    metadata_cache = cache.MetadataCache(cache.MemoryBackend(max_size=10, ttl=60))
+    await metadata_cache.set(make_record("a"))
+
+    await asyncio.to_thread(metadata_cache.invalidate_sync, "a")
+    await asyncio.sleep(0)
+    assert await metadata_cache.get("a") is None
+
+    monkeypatch.setattr(cache, "METADATA_CACHE_REDIS_URL", None)
+    monkeypatch.setattr(cache, "WEB_CONCURRENCY", 4)
+    assert cache.create_metadata_cache().backend is None
+    monkeypatch.setattr(cache, "WEB_CONCURRENCY", 1)
+    assert isinstance(cache.create_metadata_cache().backend, cache.MemoryBackend)
+
+
+async def test_redis_cache():
+    """
+    Тест общего кеша в Redis на fakeredis.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    backend = cache.RedisBackend("redis://localhost", ttl=60)
+    backend.client = fakeredis.FakeAsyncRedis()
+    metadata_cache = cache.MetadataCache(backend)
+
+    await metadata_cache.set(make_record("a"))
+    assert (await metadata_cache.get("a")).created_at == datetime(2024, 1, 1, 12, 30)
+
+    await metadata_cache.invalidate("a")
+    assert await metadata_cache.get("a") is None
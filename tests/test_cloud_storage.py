@@ -0,0 +1,133 @@
+import hashlib
+import math
+import os
+from datetime import timedelta
+
+import pytest
+
+from app import cloud_storage
+from app.utils import file_checksums
+from tests.conftest import BUCKET, PART_SIZE
+
+
+@pytest.fixture
+def large_file(tmp_path):
+    """
+    Фикстура с файлом на 2.5 части.
+    """
+    content = os.urandom(PART_SIZE * 2 + PART_SIZE // 2)
+    file_path = tmp_path / "large.bin"
+    file_path.write_bytes(content)
+    return str(file_path), content
+
+
+def test_small_file_is_uploaded_in_one_request(s3, tmp_path):
+    """
+    Тест загрузки файла меньше порога одним запросом.
+    """
+    file_path = tmp_path / "small.txt"
+    file_path.write_bytes(b"small content")
+
+    url = cloud_storage.upload_file_to_cloud(str(file_path), "small.txt")
+
+    assert url.endswith(f"/{BUCKET}/small.txt")
+    assert s3.get_object(Bucket=BUCKET, Key="small.txt")["Body"].read() == b"small content"
+
+
+def test_upload_sends_content_md5(s3, tmp_path):
+    """
+    Тест передачи MD5, посчитанного при приёме файла, в заголовке Content-MD5.
+    """
+    file_path = tmp_path / "small.txt"
+    file_path.write_bytes(b"small content")
+    sent = []
+    s3.meta.events.register("before-send.s3.PutObject", lambda request, **kwargs: sent.append(request.headers))
+
+    cloud_storage.upload_file_to_cloud(str(file_path), "small.txt", md5=hashlib.md5(b"small content").hexdigest())
+
+    digest = hashlib.md5(b"small content").digest()
+    assert sent[0]["Content-MD5"] == cloud_storage.content_md5(digest)
+    assert cloud_storage.head_cloud_file("small.txt") == {"etag": digest.hex(), "size": 13}
+    assert cloud_storage.head_cloud_file("missing.txt") is None
+
+
+def test_large_file_is_uploaded_in_parts(s3, large_file):
+    """
+    Тест multipart-загрузки.
+
+    Этот тест проверяет:
+    1. Что UploadId новой загрузки передаётся в on_multipart_start.
+    2. Что on_progress вызывается после каждой части.
+    3. Что файл в хранилище собран из частей без искажений.
+    4. Что ETag объекта совпадает с посчитанным по частям локального файла.
+    """
+    file_path, content = large_file
+    started = []
+    progress = []
+
+    cloud_storage.upload_file_to_cloud(
+        file_path, "large.bin", on_multipart_start=started.append, on_progress=lambda: progress.append(1)
+    )
+
+    assert len(started) == 1
+    assert len(progress) == math.ceil(len(content) / PART_SIZE)
+    assert s3.get_object(Bucket=BUCKET, Key="large.bin")["Body"].read() == content
+    assert cloud_storage.head_cloud_file("large.bin")["etag"] == file_checksums(file_path, PART_SIZE)[2]
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_interrupted_multipart_upload_is_resumed(s3, large_file, monkeypatch):
+    """
+    Тест продолжения прерванной multipart-загрузки по сохранённому UploadId.
+
+    Этот тест проверяет:
+    1. Что уже загруженные части не отправляются повторно.
+    2. Что файл в хранилище собран без искажений.
+    """
+    file_path, content = large_file
+    upload_id = s3.create_multipart_upload(Bucket=BUCKET, Key="large.bin")["UploadId"]
+    s3.upload_part(
+        Bucket=BUCKET, Key="large.bin", UploadId=upload_id, PartNumber=1, Body=content[:PART_SIZE]
+    )
+
+    sent_parts = []
+    upload_part = s3.upload_part
+
+    def tracking_upload_part(**kwargs):
+        sent_parts.append(kwargs["PartNumber"])
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(s3, "upload_part", tracking_upload_part)
+
+    cloud_storage.upload_file_to_cloud(file_path, "large.bin", upload_id=upload_id)
+
+    assert sorted(sent_parts) == [2, 3]
+    assert s3.get_object(Bucket=BUCKET, Key="large.bin")["Body"].read() == content
+
+
+def test_abandoned_multipart_uploads_are_aborted(s3):
+    """
+    Тест прерывания брошенных multipart-загрузок.
+
+    moto отдаёт фиксированное время Initiated из 2010 года, поэтому свежей
+    загрузка считается только при очень большом пороге.
+    """
+    s3.create_multipart_upload(Bucket=BUCKET, Key="abandoned.bin")
+
+    assert cloud_storage.abort_abandoned_multipart_uploads(timedelta(days=365 * 100)) == 0
+    assert cloud_storage.abort_abandoned_multipart_uploads(timedelta(hours=1)) == 1
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_bandwidth_limiter_caps_rate(monkeypatch):
+    """
+    Тест ограничителя скорости: отправка 3 секунд трафика должна занять около 3 секунд.
+    """
+    slept = []
+    monkeypatch.setattr(cloud_storage.time, "sleep", slept.append)
+
+    limiter = cloud_storage.RateLimiter(rate=1000)
+    for _ in range(3):
+        limiter.consume(1000)
+
+    assert slept[-1] == pytest.approx(3, abs=0.1)
@@ -0,0 +1,201 @@
+import gzip
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+
+from app import cloud_storage, tasks, utils
+from app.compression import compress_file, decoded_sha256, iter_decoded
+from app.database import Base
+from app.media import extract_media_info
+from app.models import FileMetadata, UploadState
+from app.utils import accepts_encoding
+from tests.conftest import BUCKET
+from tests.test_files import client, engine, TestingSessionLocal
+from tests.test_media import wav
+
+
+pytestmark = pytest.mark.asyncio
+
+TEXT = "".join(f"{i}: строка журнала, которая хорошо сжимается\n" for i in range(500)).encode()
+
+
+@pytest.fixture(scope="module")
+def setup_module():
+    """
+    Фикстура для настройки и очистки базы данных.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def gzip_compression(monkeypatch):
+    """
+    Включает сжатие gzip для загрузок.
+    """
+    monkeypatch.setattr(utils, "COMPRESSION", "gzip")
+    monkeypatch.setattr(utils, "COMPRESSION_LEVEL", 6)
+
+
+def get_record(uid: str) -> FileMetadata:
+    db = TestingSessionLocal()
+    file_record = db.query(FileMetadata).filter(FileMetadata.uid == uid).first()
+    db.close()
+    return file_record
+
+
+async def test_compress_file(tmp_path):
+    """
+    Тест сжатия файла и вспомогательных функций.
+
+    Этот тест проверяет:
+    1. Что сжатие gzip детерминировано, а MD5 считается по сжатым байтам.
+    2. Что распаковка и SHA-256 распакованного содержимого возвращают исходные данные.
+       У сжатого WAV длительность и кодек читаются из распакованного заголовка.
+    3. Что Accept-Encoding разбирается с учётом q-значений и *.
+    """
+    source = tmp_path / "source"
+    source.write_bytes(TEXT)
+    first, second = tmp_path / "first.gz", tmp_path / "second.gz"
+
+    size, md5 = compress_file(str(source), str(first), "gzip", 6)
+    compress_file(str(source), str(second), "gzip", 6)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert (size, md5) == (len(first.read_bytes()), hashlib.md5(first.read_bytes()).hexdigest())
+    assert gzip.decompress(first.read_bytes()) == TEXT
+    assert b"".join(iter_decoded(open(first, "rb"), "gzip", 1000)) == TEXT
+    assert decoded_sha256(str(first), "gzip") == hashlib.sha256(TEXT).hexdigest()
+    assert extract_media_info(str(first), content_encoding="gzip") == ("text/plain", {})
+
+    audio, compressed_audio = tmp_path / "audio.wav", tmp_path / "audio.wav.gz"
+    audio.write_bytes(wav(3))
+    compress_file(str(audio), str(compressed_audio), "gzip", 6)
+    assert extract_media_info(str(compressed_audio), content_encoding="gzip") == ("audio/wav", {
+        "container": "wav", "duration": 3.0, "streams": [{"type": "audio", "codec": "pcm_s16le"}],
+    })
+
+    assert accepts_encoding("gzip, deflate, br", "gzip")
+    assert accepts_encoding("br;q=1.0, *;q=0.5", "gzip")
+    assert not accepts_encoding("gzip;q=0, *", "gzip")
+    assert not accepts_encoding("identity", "gzip")
+    assert not accepts_encoding(None, "gzip")
+
+
+async def test_compressed_upload_and_download(setup_module, gzip_compression):
+    """
+    Тест загрузки и скачивания сжимаемого файла.
+
+    Этот тест проверяет:
+    1. Что текст хранится сжатым, а размер и SHA-256 записи относятся к исходному содержимому.
+    2. Что клиент с Accept-Encoding: gzip получает сжатые байты с Content-Encoding, а остальные — распакованные.
+    3. Что повторная загрузка того же содержимого наследует кодирование блоба.
+    4. Что несжимаемые данные хранятся как есть.
+    5. Что архив содержит распакованные файлы.
+    """
+    uid = client.post("/files/upload", files={"file": ("log.txt", TEXT)}).json()["uid"]
+    file_record = get_record(uid)
+    with open(file_record.path, "rb") as f:
+        stored = f.read()
+
+    assert file_record.content_encoding == "gzip"
+    assert (file_record.size, file_record.sha256) == (len(TEXT), hashlib.sha256(TEXT).hexdigest())
+    assert file_record.md5 == hashlib.md5(stored).hexdigest()
+    assert file_record.stored_size == len(stored)
+    assert len(stored) < len(TEXT) and gzip.decompress(stored) == TEXT
+
+    response = client.get(f"/files/{uid}/download", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(stored))
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == TEXT
+    etag = response.headers["etag"]
+    assert etag == f'"{file_record.sha256}-gzip"'
+    response = client.get(f"/files/{uid}/download", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get(f"/files/{uid}/download", headers={"Accept-Encoding": "identity", "Range": "bytes=0-9"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == str(len(TEXT))
+    assert response.content == TEXT
+
+    duplicate = client.post("/files/stream?filename=copy.txt", content=TEXT).json()
+    assert duplicate["deduplicated"] is True
+    assert get_record(duplicate["uid"]).content_encoding == "gzip"
+    assert get_record(duplicate["uid"]).stored_size == len(stored)
+    response = client.post("/files/bulk-get", json={"uids": [duplicate["uid"]]})
+    assert response.json()["files"][0]["content_encoding"] == "gzip"
+
+    noise = os.urandom(64 * 1024)
+    response = client.post("/files/batch", files=[("files", ("noise.bin", noise)), ("files", ("log2.txt", TEXT))])
+    noise_record = get_record(response.json()["files"][0]["uid"])
+    assert noise_record.content_encoding is None
+    assert noise_record.stored_size == len(noise)
+    with open(noise_record.path, "rb") as f:
+        assert f.read() == noise
+    assert get_record(response.json()["files"][1]["uid"]).content_encoding == "gzip"
+
+    response = client.post("/files/archive", json={"uids": [uid, noise_record.uid], "format": "zip"})
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.read("log.txt") == TEXT
+        assert archive.read("noise.bin") == noise
+
+
+async def test_compressed_blob_is_evicted_and_scrubbed_by_stored_size(setup_module, gzip_compression, s3, monkeypatch):
+    """
+    Тест вытеснения и проверки сжатого блоба без локальной копии.
+
+    Этот тест проверяет:
+    1. Что вытеснение освобождает размер сжатого блоба, а не исходного содержимого.
+    2. Что целая облачная копия проходит проверку размера.
+    3. Что облачная копия другого размера считается испорченной, даже если
+       её ETag без локальной копии сверить не с чем.
+    """
+    monkeypatch.setattr(tasks, "SessionLocal", TestingSessionLocal)
+    content = TEXT + b"evicted\n"
+    uid = client.post("/files/upload", files={"file": ("evicted.txt", content)}).json()["uid"]
+    file_record = get_record(uid)
+    key = os.path.basename(file_record.path)
+    cloud_storage.upload_file_to_cloud(file_record.path, key, md5=file_record.md5)
+
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.uid == uid).update({
+        FileMetadata.storage_url: cloud_storage.cloud_url(key),
+        FileMetadata.upload_state: UploadState.DONE,
+    })
+    db.commit()
+    db.close()
+
+    assert tasks.evict_local_copy(file_record.path) == file_record.stored_size < len(content)
+
+    assert tasks.scrub_files(batch_size=1000)["cloud_corrupted"] == 0
+
+    upload_id = s3.create_multipart_upload(Bucket=BUCKET, Key=key)["UploadId"]
+    part = s3.upload_part(Bucket=BUCKET, Key=key, UploadId=upload_id, PartNumber=1, Body=b"truncated")
+    s3.complete_multipart_upload(
+        Bucket=BUCKET, Key=key, UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": 1, "ETag": part["ETag"]}]}
+    )
+    assert tasks.scrub_files(batch_size=1000)["cloud_corrupted"] == 1
+
+
+async def test_compressed_blob_is_classified_by_stored_size(setup_module, gzip_compression, monkeypatch):
+    """
+    Тест того, что очередь загрузки делит файлы на мелкие и большие по размеру сжатого блоба.
+    """
+    monkeypatch.setattr(tasks, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(tasks, "MULTIPART_THRESHOLD", len(TEXT) // 2)
+    uid = client.post("/files/upload", files={"file": ("small.txt", TEXT + b"small\n")}).json()["uid"]
+    file_record = get_record(uid)
+    assert file_record.stored_size < len(TEXT) // 2 < file_record.size
+
+    jobs = []
+    while (job := tasks.claim_upload_job(allow_large=False)) is not None:
+        jobs.append(job)
+    assert (file_record.id, file_record.stored_size) in {(job.file_id, job.size) for job in jobs}
@@ -0,0 +1,146 @@
+import asyncio
+import io
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from app import tasks
+from app.database import Base
+from app.models import Derivative, FileMetadata
+from app.routers import derivatives
+from tests.test_files import client, engine, TestingSessionLocal
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def setup_module():
+    """
+    Фикстура для настройки и очистки базы данных.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def jpeg_bytes(width: int, height: int, color: str = "red") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+async def test_thumbnail(setup_module):
+    """
+    Тест миниатюры изображения.
+
+    Этот тест проверяет:
+    1. Что ширина округляется до ближайшей из THUMBNAIL_WIDTHS, а пропорции сохраняются.
+    2. Что миниатюра записана в каталог производных и учтена в таблице, а очистка её не видит.
+    3. Что повторный запрос с If-None-Match получает 304.
+    4. Что удаление файла удаляет и миниатюру.
+    """
+    uid = client.post("/files/upload", files={"file": ("photo.jpg", jpeg_bytes(800, 600), "image/jpeg")}).json()["uid"]
+
+    response = client.get(f"/files/{uid}/thumbnail", params={"w": 200})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).size == (256, 192)
+
+    with TestingSessionLocal() as db:
+        derivative = db.query(Derivative).one()
+        assert (derivative.kind, derivative.width) == ("thumbnail", 256)
+        assert os.path.exists(derivative.path)
+        path = derivative.path
+    assert path not in list(tasks.iter_storage_files())
+
+    response = client.get(
+        f"/files/{uid}/thumbnail", params={"w": 256}, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+    client.delete(f"/files/{uid}")
+    assert not os.path.exists(path)
+    with TestingSessionLocal() as db:
+        assert db.query(Derivative).count() == 0
+
+
+async def test_concurrent_thumbnail_requests_build_once(setup_module, monkeypatch):
+    """
+    Тест того, что одновременные запросы одной миниатюры строят её один раз.
+    """
+    calls = []
+    original = derivatives.make_thumbnail
+
+    def counting_make_thumbnail(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(derivatives, "make_thumbnail", counting_make_thumbnail)
+    monkeypatch.setattr(tasks, "media_executor", None)
+    uid = client.post("/files/upload", files={"file": ("a.jpg", jpeg_bytes(300, 300, "blue"))}).json()["uid"]
+    with TestingSessionLocal() as db:
+        file_record = db.query(FileMetadata).filter(FileMetadata.uid == uid).one()
+        db.expunge(file_record)
+
+    path = derivatives.derivative_path(file_record.sha256, derivatives.THUMBNAIL, 64)
+    results = await asyncio.gather(*(derivatives.generate_thumbnail(file_record, path, 64) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert [created for created, _ in results].count(True) == 1
+    assert Image.open(path).size == (64, 64)
+
+
+async def test_thumbnail_of_non_image(setup_module):
+    """
+    Тест отказа в миниатюре для файла, который не является изображением.
+    """
+    uid = client.post("/files/upload", files={"file": ("notes.txt", b"plain text", "text/plain")}).json()["uid"]
+    assert client.get(f"/files/{uid}/thumbnail").status_code == 415
+
+    uid = client.post("/files/upload", files={"file": ("fake.png", b"not an image", "image/png")}).json()["uid"]
+    assert client.get(f"/files/{uid}/thumbnail").status_code == 415
+
+
+async def test_thumbnail_of_oversized_image(setup_module):
+    """
+    Тест отказа в миниатюре изображения больше предела Pillow по числу пикселей.
+    """
+    from tests.test_media import png
+
+    # Заголовок PNG 20000x20000 и пустой IDAT: Pillow проверяет размер до декодирования.
+    idat = b"IDAT" + zlib.compress(b"")
+    content = png(20000, 20000) + struct.pack(">I", len(idat) - 4) + idat + struct.pack(">I", zlib.crc32(idat))
+    uid = client.post("/files/upload", files={"file": ("huge.png", content, "image/png")}).json()["uid"]
+    assert client.get(f"/files/{uid}/thumbnail").status_code == 413
+
+
+async def test_thumbnail_worker_crash_restarts_pool(setup_module, monkeypatch):
+    """
+    Тест падения процесса пула при построении миниатюры.
+
+    Этот тест проверяет:
+    1. Что клиент получает 503, а не 500.
+    2. Что пул пересоздаётся, и следующий запрос строит миниатюру.
+    """
+    class BrokenExecutor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("worker died")
+
+    restarts = []
+    monkeypatch.setattr(tasks, "media_executor", BrokenExecutor())
+    monkeypatch.setattr(
+        tasks, "restart_media_executor", lambda: restarts.append(setattr(tasks, "media_executor", None))
+    )
+    uid = client.post("/files/upload", files={"file": ("crash.jpg", jpeg_bytes(300, 200, "green"))}).json()["uid"]
+
+    response = client.get(f"/files/{uid}/thumbnail")
+    assert response.status_code == 503
+    assert len(restarts) == 1
+
+    assert client.get(f"/files/{uid}/thumbnail").status_code == 200
@@ -0,0 +1,152 @@
+import os
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app import tasks
+from app.database import Base
+from app.models import FileMetadata as FileModel, UploadState
+from app.routers import direct
+from tests.conftest import BUCKET, PART_SIZE
+from tests.test_files import client, engine, TestingSessionLocal
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def setup_module():
+    """
+    Фикстура для настройки и очистки базы данных.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+async def test_direct_upload(setup_module, s3):
+    """
+    Тест прямой загрузки одним PUT.
+
+    Этот тест проверяет:
+    1. Что выдаётся подписанная ссылка на ключ uid.
+    2. Что после завершения запись берёт размер из хранилища и не имеет локальной копии.
+    3. Что повторное завершение возвращает ту же запись.
+    """
+    content = b"direct content"
+    response = client.post("/files/direct", params={"filename": "direct.txt", "size": len(content)})
+    assert response.status_code == 200
+    data = response.json()
+    uid = data["uid"]
+    assert f"/{uid}?" in data["url"]
+    assert "Signature" in data["url"]
+
+    # Клиент загружает файл по ссылке сам, минуя сервер.
+    s3.put_object(Bucket=BUCKET, Key=uid, Body=content)
+
+    params = {"filename": "direct.txt", "content_type": "text/plain", "size": len(content)}
+    response = client.post(f"/files/direct/{uid}/complete", params=params)
+    assert response.status_code == 200
+    assert response.json()["size"] == len(content)
+
+    with TestingSessionLocal() as db:
+        file_record = db.query(FileModel).filter(FileModel.uid == uid).first()
+        assert file_record.upload_state == UploadState.DONE
+        assert file_record.is_local is False
+        assert file_record.md5 is not None
+        assert file_record.storage_url.endswith(f"/{BUCKET}/{uid}")
+
+    response = client.post(f"/files/direct/{uid}/complete", params=params)
+    assert response.status_code == 200
+
+    response = client.get(f"/files/{uid}")
+    assert response.status_code == 200
+    assert response.json()["message"] == "File direct.txt is available"
+
+
+async def test_direct_multipart_upload(setup_module, s3, monkeypatch):
+    """
+    Тест прямой multipart-загрузки по подписанным ссылкам на части.
+    """
+    monkeypatch.setattr(direct, "MULTIPART_THRESHOLD", PART_SIZE)
+    monkeypatch.setattr(direct, "MULTIPART_PART_SIZE", PART_SIZE)
+    content = os.urandom(PART_SIZE + 1000)
+
+    response = client.post("/files/direct", params={"filename": "large.bin", "size": len(content)})
+    data = response.json()
+    uid = data["uid"]
+    assert data["part_size"] == PART_SIZE
+    assert [part["part_number"] for part in data["parts"]] == [1, 2]
+
+    parts = []
+    for part in data["parts"]:
+        start = (part["part_number"] - 1) * PART_SIZE
+        result = s3.upload_part(
+            Bucket=BUCKET, Key=uid, UploadId=data["upload_id"],
+            PartNumber=part["part_number"], Body=content[start:start + PART_SIZE]
+        )
+        parts.append({"part_number": part["part_number"], "etag": result["ETag"]})
+
+    response = client.post(
+        f"/files/direct/{uid}/complete",
+        params={"filename": "large.bin", "size": len(content)},
+        json={"upload_id": data["upload_id"], "parts": list(reversed(parts))}
+    )
+    assert response.status_code == 200
+    assert response.json()["size"] == len(content)
+    assert s3.get_object(Bucket=BUCKET, Key=uid)["Body"].read() == content
+
+
+async def test_direct_upload_rejected(setup_module, s3):
+    """
+    Тест отказов при завершении прямой загрузки.
+
+    Этот тест проверяет:
+    1. Что ключ не из uid отклоняется.
+    2. Что незагруженный файл не заводит запись.
+    3. Что объект другого размера удаляется из хранилища.
+    """
+    sha256 = "a" * 64
+    s3.put_object(Bucket=BUCKET, Key=sha256, Body=b"foreign blob")
+    response = client.post(f"/files/direct/{sha256}/complete", params={"filename": "x"})
+    assert response.status_code == 404
+
+    response = client.post(f"/files/direct/{uuid4()}/complete", params={"filename": "x"})
+    assert response.status_code == 404
+
+    uid = client.post("/files/direct", params={"filename": "short.txt", "size": 100}).json()["uid"]
+    s3.put_object(Bucket=BUCKET, Key=uid, Body=b"short")
+    response = client.post(f"/files/direct/{uid}/complete", params={"filename": "short.txt", "size": 100})
+    assert response.status_code == 400
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET, Prefix=uid)
+
+    with TestingSessionLocal() as db:
+        assert db.query(FileModel).filter(FileModel.uid == uid).first() is None
+
+
+async def test_direct_upload_is_scrubbed(setup_module, s3, monkeypatch):
+    """
+    Тест проверки целостности файла, загруженного напрямую в облако.
+
+    Этот тест проверяет:
+    1. Что запись без SHA-256 попадает в проверку, и целая копия отмечается проверенной.
+    2. Что подменённый в облаке объект считается испорченным.
+    """
+    monkeypatch.setattr(tasks, "SessionLocal", TestingSessionLocal)
+    with TestingSessionLocal() as db:
+        # Объекты записей прошлых тестов остались в их моках S3: проверяется только новая запись.
+        db.query(FileModel).update({FileModel.verified_at: datetime(2100, 1, 1)})
+        db.commit()
+    content = b"scrubbed direct content"
+    uid = client.post("/files/direct", params={"filename": "scrub.txt", "size": len(content)}).json()["uid"]
+    s3.put_object(Bucket=BUCKET, Key=uid, Body=content)
+    params = {"filename": "scrub.txt", "content_type": "text/plain", "size": len(content)}
+    assert client.post(f"/files/direct/{uid}/complete", params=params).status_code == 200
+
+    assert tasks.scrub_files(batch_size=1)["cloud_corrupted"] == 0
+    with TestingSessionLocal() as db:
+        assert db.query(FileModel).filter(FileModel.uid == uid).one().verified_at is not None
+
+    s3.put_object(Bucket=BUCKET, Key=uid, Body=content.upper())
+    assert tasks.scrub_files(batch_size=1)["cloud_corrupted"] == 1
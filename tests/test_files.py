@@ -1,33 +1,38 @@
+import hashlib
+import io
 import os
+import tarfile
 import tempfile
+import zipfile
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.main import app
+from app.routers import files as files_router
 from app.database import Base, get_db
-from app.models import FileMetadata
-from app.configs import LOCAL_STORAGE_PATH
+from app.models import FileMetadata, UploadState
+from app.configs import LOCAL_STORAGE_PATH, LOCAL_STORAGE_TMP_PATH
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 client = TestClient(app)
 
 
-def override_get_db():
+async def override_get_db():
     """
     Переопределение зависимости базы данных для тестов, чтобы использовать тестовую базу данных SQLite.
     """
-    try:
-        db = TestingSessionLocal()
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -116,6 +121,7 @@ async def test_delete_file(setup_module):
     assert os.path.exists(file_path)
     db.close()
 
+    assert client.get(f"/files/{uid}").status_code == 200
     delete_response = client.delete(f"/files/{uid}")
     assert delete_response.status_code == 200
 
@@ -125,3 +131,378 @@ async def test_delete_file(setup_module):
 
     assert not os.path.exists(file_path)
     db.close()
+
+    assert client.get(f"/files/{uid}").status_code == 404
+
+
+async def test_stream_upload_file(setup_module):
+    """
+    Тест потоковой загрузки файла через API.
+
+    Этот тест проверяет:
+    1. Успешную загрузку файла из тела запроса.
+    2. Размер и SHA-256, посчитанные по записанным байтам.
+    3. Наличие файла на диске и его корректное содержимое.
+    """
+    file_content = b"streamed content" * 1024
+    response = client.post(
+        "/files/stream",
+        params={"filename": "stream_test.bin"},
+        content=iter([file_content[:100], file_content[100:]]),
+        headers={"Content-Type": "application/octet-stream"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["size"] == len(file_content)
+    assert data["sha256"] == hashlib.sha256(file_content).hexdigest()
+    assert data["md5"] == hashlib.md5(file_content).hexdigest()
+
+    db = TestingSessionLocal()
+    file_record = db.query(FileMetadata).filter(FileMetadata.uid == data["uid"]).first()
+
+    assert file_record is not None
+    assert file_record.sha256 == data["sha256"]
+    assert file_record.md5 == data["md5"]
+
+    with open(file_record.path, "rb") as f:
+        assert f.read() == file_content
+
+    db.close()
+
+
+async def test_download_file(setup_module):
+    """
+    Тест скачивания файла через API.
+
+    Этот тест проверяет:
+    1. Отдачу файла целиком с Content-Type, ETag и Last-Modified.
+    2. Ответ 304 на повторный запрос с If-None-Match.
+    3. Ответ 206 на запрос диапазона и 416 на диапазон за пределами файла.
+    """
+    file_content = b"0123456789" * 10
+    response = client.post("/files/upload", files={"file": ("video.mp4", file_content, "video/mp4")})
+    uid = response.json()["uid"]
+
+    response = client.get(f"/files/{uid}/download")
+    assert response.status_code == 200
+    assert response.content == file_content
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["etag"] == f'"{hashlib.sha256(file_content).hexdigest()}"'
+    assert "last-modified" in response.headers
+
+    response = client.get(f"/files/{uid}/download", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+    response = client.get(f"/files/{uid}/download", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == file_content[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(file_content)}"
+
+    response = client.get(f"/files/{uid}/download", headers={"Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.content == file_content[-5:]
+
+    response = client.get(f"/files/{uid}/download", headers={"Range": "bytes=1000-"})
+    assert response.status_code == 416
+
+
+async def test_download_redirects_to_cloud_when_local_copy_is_gone(setup_module, monkeypatch):
+    """
+    Тест скачивания файла, локальная копия которого удалена, а копия в облаке есть.
+    """
+    monkeypatch.setattr(files_router, "LOCAL_REHYDRATE_ON_MISS", False)
+    monkeypatch.setattr(
+        files_router, "generate_presigned_download_url",
+        lambda file_name, original_name, content_type: f"https://cloud/{file_name}?signature=1"
+    )
+    response = client.post("/files/upload", files={"file": ("gone.txt", b"gone")})
+    uid = response.json()["uid"]
+
+    db = TestingSessionLocal()
+    file_record = db.query(FileMetadata).filter(FileMetadata.uid == uid).first()
+    file_record.storage_url = "https://cloud/gone.txt"
+    file_record.upload_state = UploadState.DONE
+    db.commit()
+    os.remove(file_record.path)
+    db.close()
+
+    response = client.get(f"/files/{uid}/download", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"].startswith("https://cloud/")
+
+
+async def test_identical_uploads_share_one_blob(setup_module):
+    """
+    Тест хранения одинакового содержимого одним блобом.
+
+    Этот тест проверяет:
+    1. Что повторная загрузка того же содержимого ссылается на тот же файл.
+    2. Что удаление одной из записей не удаляет общий файл.
+    3. Что файл удаляется вместе с последней ссылкой на него.
+    """
+    file_content = b"deduplicated content"
+    first = client.post("/files/upload", files={"file": ("first.txt", file_content)}).json()
+    second = client.post("/files/upload", files={"file": ("second.txt", file_content)}).json()
+
+    assert first["deduplicated"] is False
+    assert second["deduplicated"] is True
+
+    db = TestingSessionLocal()
+    records = db.query(FileMetadata).filter(FileMetadata.uid.in_([first["uid"], second["uid"]])).all()
+    paths = {record.path for record in records}
+    db.close()
+
+    assert len(paths) == 1
+    blob = paths.pop()
+    assert os.path.basename(blob) == hashlib.sha256(file_content).hexdigest()
+
+    assert client.delete(f"/files/{first['uid']}").status_code == 200
+    assert os.path.exists(blob)
+    assert client.get(f"/files/{second['uid']}/download").content == file_content
+
+    assert client.delete(f"/files/{second['uid']}").status_code == 200
+    assert not os.path.exists(blob)
+
+
+async def test_bulk_delete(setup_module):
+    """
+    Тест массового удаления файлов.
+
+    Этот тест проверяет:
+    1. Что по каждому uid возвращается результат, в том числе для несуществующих.
+    2. Что блоб, на который ссылается оставшаяся запись, не удаляется.
+    3. Что блоб без оставшихся ссылок удаляется с диска.
+    """
+    shared = [client.post("/files/upload", files={"file": (f"{i}.txt", b"bulk shared")}).json() for i in range(3)]
+    single = client.post("/files/upload", files={"file": ("single.txt", b"bulk single")}).json()
+
+    db = TestingSessionLocal()
+    shared_blob = db.query(FileMetadata).filter_by(uid=shared[0]["uid"]).one().path
+    single_blob = db.query(FileMetadata).filter_by(uid=single["uid"]).one().path
+    db.close()
+
+    uids = [shared[0]["uid"], "missing", shared[1]["uid"], single["uid"], shared[0]["uid"]]
+    response = client.post("/files/bulk-delete", json={"uids": uids})
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"uid": shared[0]["uid"], "status": "deleted"},
+        {"uid": "missing", "status": "not_found"},
+        {"uid": shared[1]["uid"], "status": "deleted"},
+        {"uid": single["uid"], "status": "deleted"},
+    ]
+
+    assert os.path.exists(shared_blob)
+    assert not os.path.exists(single_blob)
+    assert client.get(f"/files/{shared[0]['uid']}").status_code == 404
+    assert client.get(f"/files/{shared[2]['uid']}/download").content == b"bulk shared"
+
+    response = client.post("/files/bulk-delete", json={"uids": [shared[2]["uid"]]})
+    assert response.json()["results"] == [{"uid": shared[2]["uid"], "status": "deleted"}]
+    assert not os.path.exists(shared_blob)
+
+    assert client.post("/files/bulk-delete", json={"uids": []}).status_code == 422
+
+
+async def test_bulk_get(setup_module):
+    """
+    Тест получения метаданных многих файлов одним запросом.
+    """
+    first = client.post("/files/upload", files={"file": ("first.txt", b"bulk get a", "text/plain")}).json()
+    second = client.post("/files/upload", files={"file": ("second.txt", b"bulk get b", "text/plain")}).json()
+
+    response = client.post("/files/bulk-get", json={"uids": [second["uid"], "missing", first["uid"]]})
+    assert response.status_code == 200
+    data = response.json()
+    assert [f["uid"] for f in data["files"]] == [second["uid"], first["uid"]]
+    assert [f["filename"] for f in data["files"]] == ["second.txt", "first.txt"]
+    assert data["missing"] == ["missing"]
+
+
+async def test_archive(setup_module, monkeypatch):
+    """
+    Тест скачивания файлов архивом.
+
+    Этот тест проверяет:
+    1. Что zip и tar содержат все файлы, а одинаковые имена получают суффиксы.
+    2. Что вытесненный файл читается из облака.
+    3. Что архив с несуществующим файлом не отдаётся.
+    """
+    first = client.post("/files/upload", files={"file": ("report.txt", b"archive a")}).json()
+    second = client.post("/files/upload", files={"file": ("report.txt", b"archive b")}).json()
+    evicted = client.post("/files/upload", files={"file": ("dir/evicted.bin", b"archive cloud")}).json()
+
+    db = TestingSessionLocal()
+    file_record = db.query(FileMetadata).filter_by(uid=evicted["uid"]).one()
+    file_record.storage_url = "https://cloud/evicted.bin"
+    file_record.upload_state = UploadState.DONE
+    db.commit()
+    os.remove(file_record.path)
+    cloud_key = os.path.basename(file_record.path)
+    db.close()
+    monkeypatch.setattr(
+        files_router, "open_cloud_file", lambda key: io.BytesIO(b"archive cloud" if key == cloud_key else b"")
+    )
+
+    uids = [first["uid"], second["uid"], evicted["uid"]]
+    expected = {"report.txt": b"archive a", "report (2).txt": b"archive b", "evicted.bin": b"archive cloud"}
+
+    response = client.post("/files/archive", json={"uids": uids})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == list(expected)
+        assert {name: archive.read(name) for name in archive.namelist()} == expected
+
+    response = client.post("/files/archive", json={"uids": uids, "format": "tar"})
+    assert response.status_code == 200
+    assert len(response.content) % tarfile.RECORDSIZE == 0
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        assert archive.getnames() == list(expected)
+        assert {member.name: archive.extractfile(member).read() for member in archive} == expected
+
+    response = client.post("/files/archive", json={"uids": [first["uid"], "missing"]})
+    assert response.status_code == 404
+    assert response.json()["detail"]["missing"] == ["missing"]
+
+
+async def test_batch_upload(setup_module):
+    """
+    Тест загрузки нескольких файлов одним запросом.
+
+    Этот тест проверяет:
+    1. Что каждый файл получает свою запись и доступен для скачивания.
+    2. Что одинаковое содержимое внутри пачки хранится одним блобом.
+    3. Что запрос без файлов или с оборванным телом отклоняется.
+    4. Что большие части и обычные поля формы разбираются потоком.
+    """
+    response = client.post(
+        "/files/batch",
+        files=[
+            ("files", ("a.txt", b"batch a", "text/plain")),
+            ("files", ("b.txt", b"batch b", "text/plain")),
+            ("files", ("c.txt", b"batch a", "text/plain")),
+        ]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["uploaded"] == 3
+    assert data["failed"] == 0
+    assert [f["filename"] for f in data["files"]] == ["a.txt", "b.txt", "c.txt"]
+    assert [f["deduplicated"] for f in data["files"]] == [False, False, True]
+
+    for f, content in zip(data["files"], (b"batch a", b"batch b", b"batch a")):
+        response = client.get(f"/files/{f['uid']}/download")
+        assert response.status_code == 200
+        assert response.content == content
+
+    db = TestingSessionLocal()
+    uids = [f["uid"] for f in data["files"]]
+    paths = {r.path for r in db.query(FileMetadata).filter(FileMetadata.uid.in_(uids)).all()}
+    db.close()
+    assert len(paths) == 2
+
+    response = client.post("/files/batch", data={"field": "value"})
+    assert response.status_code == 400
+
+    large = os.urandom(3 * 1024 * 1024)
+    response = client.post(
+        "/files/batch",
+        data={"comment": "ignored"},
+        files=[("files", ("large.bin", large, "application/octet-stream")), ("files", ("d.txt", b"batch d"))]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [f["filename"] for f in data["files"]] == ["large.bin", "d.txt"]
+    assert client.get(f"/files/{data['files'][0]['uid']}/download").content == large
+
+    boundary = "truncated"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"e.txt\"\r\n\r\nbatch e\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"f.txt\"\r\n\r\nbatch"
+    ).encode()
+    response = client.post(
+        "/files/batch", content=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 400
+    assert not os.listdir(LOCAL_STORAGE_TMP_PATH)
+
+
+async def test_health():
+    """
+    Тест проверки состояния сервиса со счётчиками пула соединений.
+    """
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+    assert set(response.json()["db_pool"]) == {"size", "checked_in", "checked_out", "overflow"}
+
+
+async def test_metrics(setup_module):
+    """
+    Тест метрик Prometheus.
+
+    Этот тест проверяет:
+    1. Что загрузка попадает в гистограммы размера, записи на диск и коммита.
+    2. Что глубина очереди загрузки в облако отражает ожидающий файл.
+    """
+    def sample(text: str, name: str) -> float:
+        line = next(line for line in text.splitlines() if line.startswith(name + " "))
+        return float(line.split()[-1])
+
+    before = client.get("/metrics").text
+    response = client.post("/files/upload", files={"file": ("metrics.txt", b"metrics content", "text/plain")})
+    assert response.status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    after = response.text
+    assert sample(after, "files_upload_bytes_count") == sample(before, "files_upload_bytes_count") + 1
+    assert sample(after, "files_save_to_disk_seconds_count") > sample(before, "files_save_to_disk_seconds_count")
+    assert sample(after, "files_db_commit_seconds_count") > sample(before, "files_db_commit_seconds_count")
+    assert sample(after, 'files_upload_queue_depth{state="pending"}') >= 1
+    assert 'files_db_pool_connections{state="checked_out"}' in after
+
+
+async def test_list_files(setup_module):
+    """
+    Тест списка файлов.
+
+    Этот тест проверяет:
+    1. Что страницы по курсору идут от новых файлов к старым без пропусков и повторов.
+    2. Что работают фильтры по MIME-типу, размеру, состоянию загрузки и началу имени.
+    3. Что повреждённый курсор отклоняется.
+    """
+    content_type = "application/x-listing"
+    uids = []
+    for i in range(5):
+        response = client.post(
+            "/files/upload",
+            files={"file": (f"list_{i}.bin", b"x" * (i + 1) + b"listing", content_type)}
+        )
+        uids.append(response.json()["uid"])
+
+    listed, cursor = [], None
+    for _ in range(3):
+        params = {"content_type": content_type, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/files", params=params).json()
+        listed += [f["uid"] for f in data["files"]]
+        cursor = data["next_cursor"]
+    assert listed == uids[::-1]
+    assert cursor is None
+
+    data = client.get("/files", params={"content_type": content_type, "min_size": 10, "max_size": 11}).json()
+    assert [f["filename"] for f in data["files"]] == ["list_3.bin", "list_2.bin"]
+
+    data = client.get("/files", params={"name_prefix": "list_4"}).json()
+    assert [f["uid"] for f in data["files"]] == [uids[4]]
+    assert client.get("/files", params={"name_prefix": "list%"}).json()["files"] == []
+
+    data = client.get("/files", params={"content_type": content_type, "upload_state": "done"}).json()
+    assert data["files"] == []
+
+    assert client.get("/files", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/files", params={"upload_state": "lost"}).status_code == 400
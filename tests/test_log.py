@@ -0,0 +1,81 @@
+import json
+import logging
+import queue
+
+from app.log import (
+    BoundedQueueHandler,
+    JsonFormatter,
+    RequestContextFilter,
+    request_id_var,
+    request_sampled_var,
+)
+from tests.test_files import client
+
+
+def make_record(level: int = logging.INFO, message: str = "message", **extra) -> logging.LogRecord:
+    record = logging.LogRecord("file_logger", level, __file__, 1, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    """
+    Тест JSON-формата: стандартные поля, request_id и поля из extra.
+    """
+    record = make_record(message="Upload saved", request_id="abc", size=10)
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "file_logger"
+    assert entry["message"] == "Upload saved"
+    assert entry["request_id"] == "abc"
+    assert entry["size"] == 10
+    assert "msg" not in entry and "args" not in entry
+
+
+def test_request_context_filter():
+    """
+    Тест фильтра контекста запроса.
+
+    Этот тест проверяет:
+    1. Что запись получает request_id текущего запроса.
+    2. Что INFO-записи запроса вне выборки отбрасываются, а предупреждения остаются.
+    """
+    log_filter = RequestContextFilter()
+    id_token = request_id_var.set("req-1")
+    sampled_token = request_sampled_var.set(False)
+    try:
+        info, warning = make_record(), make_record(logging.WARNING)
+        assert not log_filter.filter(info)
+        assert log_filter.filter(warning)
+        assert warning.request_id == "req-1"
+    finally:
+        request_sampled_var.reset(sampled_token)
+        request_id_var.reset(id_token)
+
+    record = make_record()
+    assert log_filter.filter(record)
+    assert record.request_id == "-"
+
+
+def test_bounded_queue_handler_drops_when_full():
+    """
+    Тест того, что переполненная очередь лога не блокирует вызывающего.
+    """
+    handler = BoundedQueueHandler(queue.Queue(1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_request_id_header():
+    """
+    Тест того, что request_id из запроса возвращается в ответе, а без него генерируется.
+    """
+    response = client.get("/health", headers={"X-Request-ID": "client-id"})
+    assert response.headers["x-request-id"] == "client-id"
+
+    response = client.get("/health")
+    assert len(response.headers["x-request-id"]) == 32
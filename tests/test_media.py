@@ -0,0 +1,84 @@
+import struct
+import zlib
+
+import pytest
+
+from app.media import extract_media_info, sniff_mime_type
+
+
+def png(width: int, height: int) -> bytes:
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+
+def jpeg(width: int, height: int) -> bytes:
+    app0 = b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x11\x00\x02\x11\x00\x03\x11\x00"
+    return (
+        b"\xff\xd8"
+        + b"\xff\xe0" + struct.pack(">H", len(app0) + 2) + app0
+        + b"\xff\xc0" + struct.pack(">H", len(sof) + 2) + sof
+        + b"\xff\xd9"
+    )
+
+
+def wav(seconds: int, sample_rate: int = 8000) -> bytes:
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    info = b"INFOISFT" + struct.pack("<I", 5) + b"test\x00\x00"
+    data = b"\x00\x00" * sample_rate * seconds
+    chunks = (
+        b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"LIST" + struct.pack("<I", len(info)) + info
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    return b"RIFF" + struct.pack("<I", len(chunks) + 4) + b"WAVE" + chunks
+
+
+@pytest.mark.parametrize("content, mime_type, dimensions", [
+    (png(640, 480), "image/png", (640, 480)),
+    (jpeg(1920, 1080), "image/jpeg", (1920, 1080)),
+    (b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 8, "image/gif", (32, 16)),
+    (b"BM" + b"\x00" * 16 + struct.pack("<ii", 100, -50) + b"\x00" * 8, "image/bmp", (100, 50)),
+    (
+        b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 8 + (299).to_bytes(3, "little") + (199).to_bytes(3, "little"),
+        "image/webp", (300, 200)
+    ),
+])
+def test_image_dimensions(tmp_path, content, mime_type, dimensions):
+    """
+    Тест определения типа и размеров изображений по заголовку.
+    """
+    path = tmp_path / "image"
+    path.write_bytes(content)
+
+    detected_type, info = extract_media_info(str(path))
+
+    assert detected_type == mime_type
+    assert (info["width"], info["height"]) == dimensions
+
+
+def test_sniff_mime_type():
+    """
+    Тест определения MIME-типа по содержимому, а не по имени или заявленному типу.
+    """
+    assert sniff_mime_type(b"%PDF-1.7\n") == "application/pdf"
+    assert sniff_mime_type(b"\x00\x00\x00\x18ftypisom") == "video/mp4"
+    assert sniff_mime_type(b"\x00\x00\x00\x18ftypqt  ") == "video/quicktime"
+    assert sniff_mime_type(b"\x1a\x45\xdf\xa3\x01\x00\x00\x00\x42\x82\x84webm") == "video/webm"
+    assert sniff_mime_type(b"RIFF\x00\x00\x00\x00WAVEfmt ") == "audio/wav"
+    assert sniff_mime_type("привет, мир".encode()) == "text/plain"
+    assert sniff_mime_type(b"\x00\x01\x02\x03") == "application/octet-stream"
+    assert sniff_mime_type(b"") == "application/octet-stream"
+    # Многобайтовый символ, разрезанный границей прочитанного куска.
+    assert sniff_mime_type(b"a" + ("я" * 2048).encode()[:4095]) == "text/plain"
+
+
+def test_corrupted_image_has_no_dimensions(tmp_path):
+    """
+    Тест того, что обрезанный заголовок не ломает разбор.
+    """
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xe0\x00\x01")
+
+    assert extract_media_info(str(path)) == ("image/jpeg", {})
@@ -0,0 +1,526 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app import cloud_storage, tasks
+from app.cache import metadata_cache
+from app.configs import LOCAL_STORAGE_PATH
+from app.database import Base
+from app.models import Derivative, FileMetadata, UploadState
+from app.utils import derivative_key, derivative_path, storage_path
+from tests.test_files import client, engine, TestingSessionLocal
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def setup_module():
+    """
+    Фикстура для настройки и очистки базы данных.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def queue_session(monkeypatch):
+    """
+    Фикстура, направляющая воркеры очереди в тестовую базу данных.
+    """
+    monkeypatch.setattr(tasks, "SessionLocal", TestingSessionLocal)
+
+
+def upload(name: str, content: bytes = None) -> str:
+    content = content if content is not None else f"content of {name}".encode()
+    response = client.post("/files/upload", files={"file": (name, content)})
+    assert response.status_code == 200
+    return response.json()["uid"]
+
+
+def get_record(uid: str) -> FileMetadata:
+    db = TestingSessionLocal()
+    try:
+        return db.query(FileMetadata).filter(FileMetadata.uid == uid).first()
+    finally:
+        db.close()
+
+
+async def test_upload_is_queued_and_processed(setup_module, monkeypatch):
+    """
+    Тест очереди загрузки в облако.
+
+    Этот тест проверяет:
+    1. Что загруженный файл попадает в очередь в состоянии pending.
+    2. Что воркер захватывает задачу и после успешной загрузки переводит её в done.
+    3. Что запись с новым storage_url сбрасывается из кеша метаданных.
+    """
+    monkeypatch.setattr(tasks, "upload_file_to_cloud", lambda path, name, **kwargs: f"https://cloud/{name}")
+    uid = upload("queued.txt")
+
+    file_record = get_record(uid)
+    assert file_record.upload_state == UploadState.PENDING
+    assert file_record.upload_attempts == 0
+
+    await metadata_cache.set(file_record)
+
+    job = tasks.claim_upload_job()
+    assert job is not None
+    assert get_record(uid).upload_state == UploadState.UPLOADING
+    assert tasks.claim_upload_job() is None
+
+    await tasks.process_upload_job(job)
+
+    file_record = get_record(uid)
+    assert file_record.upload_state == UploadState.DONE
+    assert file_record.storage_url.startswith("https://cloud/")
+    assert file_record.upload_attempts == 1
+    assert await metadata_cache.get(uid) is None
+
+
+async def test_failed_upload_is_retried_with_backoff(setup_module, monkeypatch):
+    """
+    Тест повторных попыток загрузки в облако.
+
+    Этот тест проверяет:
+    1. Что после ошибки задача возвращается в pending с отложенной следующей попыткой.
+    2. Что после исчерпания попыток задача переходит в failed.
+    """
+    def broken_upload(path, name, **kwargs):
+        raise Exception("S3 is down")
+
+    monkeypatch.setattr(tasks, "upload_file_to_cloud", broken_upload)
+    monkeypatch.setattr(tasks, "CLOUD_UPLOAD_MAX_ATTEMPTS", 2)
+    uid = upload("retried.txt")
+
+    await tasks.process_upload_job(tasks.claim_upload_job())
+
+    file_record = get_record(uid)
+    assert file_record.upload_state == UploadState.PENDING
+    assert file_record.upload_error == "S3 is down"
+    assert file_record.next_attempt_at > datetime.utcnow()
+    assert tasks.claim_upload_job() is None
+
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.uid == uid).update(
+        {FileMetadata.next_attempt_at: datetime.utcnow()}
+    )
+    db.commit()
+    db.close()
+
+    await tasks.process_upload_job(tasks.claim_upload_job())
+
+    file_record = get_record(uid)
+    assert file_record.upload_state == UploadState.FAILED
+    assert file_record.upload_attempts == 2
+
+
+async def test_stale_worker_does_not_overwrite_upload(setup_module, monkeypatch):
+    """
+    Тест потери аренды задачи загрузки.
+
+    Этот тест проверяет:
+    1. Что после истечения аренды задачу перехватывает другой воркер.
+    2. Что ошибка и успех воркера, потерявшего аренду, не меняют строку.
+    """
+    monkeypatch.setattr(tasks, "upload_file_to_cloud", lambda path, name, **kwargs: f"https://cloud/{name}")
+    uid = upload("leased.txt")
+
+    stale = tasks.claim_upload_job()
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.uid == uid).update(
+        {FileMetadata.next_attempt_at: datetime.utcnow()}
+    )
+    db.commit()
+    db.close()
+    current = tasks.claim_upload_job()
+    assert current is not None and current.lease != stale.lease
+
+    await tasks.process_upload_job(current)
+    tasks.fail_upload_job(stale, "stale failure")
+    assert tasks.complete_upload_job(stale, "https://cloud/stale") == []
+
+    file_record = get_record(uid)
+    assert file_record.upload_state == UploadState.DONE
+    assert file_record.upload_error is None
+    assert file_record.storage_url != "https://cloud/stale"
+
+
+async def test_long_upload_extends_its_lease(setup_module):
+    """
+    Тест продления аренды во время долгой загрузки.
+
+    Этот тест проверяет:
+    1. Что аренда продлевается, только когда истекла треть её срока.
+    2. Что задача завершается с продлённым сроком аренды.
+    3. Что потерянная аренда прерывает загрузку.
+    """
+    def expire_soon(uid: str) -> datetime:
+        lease = datetime.utcnow() + timedelta(seconds=1)
+        db = TestingSessionLocal()
+        db.query(FileMetadata).filter(FileMetadata.uid == uid).update({FileMetadata.next_attempt_at: lease})
+        db.commit()
+        db.close()
+        return lease
+
+    uid = upload("slow.txt")
+    heartbeat = tasks.UploadHeartbeat(tasks.claim_upload_job())
+    heartbeat()
+    assert get_record(uid).next_attempt_at == heartbeat.job.lease
+
+    heartbeat.job = heartbeat.job._replace(lease=expire_soon(uid))
+    heartbeat()
+    assert heartbeat.job.lease > datetime.utcnow() + timedelta(seconds=tasks.CLOUD_UPLOAD_LEASE_SECONDS - 60)
+    assert get_record(uid).next_attempt_at == heartbeat.job.lease
+    assert tasks.complete_upload_job(heartbeat.job, "https://cloud/slow") == [uid]
+
+    uid = upload("stolen.txt")
+    heartbeat = tasks.UploadHeartbeat(tasks.claim_upload_job())
+    expire_soon(uid)
+    heartbeat.job = heartbeat.job._replace(lease=datetime.utcnow())
+    with pytest.raises(tasks.UploadLeaseLost):
+        heartbeat()
+
+
+async def test_duplicate_content_is_not_uploaded_twice(setup_module, monkeypatch):
+    """
+    Тест дедупликации загрузки в облако.
+
+    Этот тест проверяет:
+    1. Что ожидающий дубликат отмечается загруженным вместе с оригиналом.
+    2. Что дубликат уже загруженного содержимого сразу получает его URL.
+    """
+    uploaded = []
+
+    def counting_upload(path, name, **kwargs):
+        uploaded.append(name)
+        return f"https://cloud/{name}"
+
+    monkeypatch.setattr(tasks, "upload_file_to_cloud", counting_upload)
+    first_uid = upload("original.txt", b"same bytes")
+    second_uid = upload("copy.txt", b"same bytes")
+
+    await tasks.process_upload_job(tasks.claim_upload_job())
+
+    assert tasks.claim_upload_job() is None
+    assert get_record(second_uid).upload_state == UploadState.DONE
+    assert get_record(second_uid).storage_url == get_record(first_uid).storage_url
+
+    third_uid = upload("third.txt", b"same bytes")
+    assert get_record(third_uid).upload_state == UploadState.DONE
+    assert len(uploaded) == 1
+
+
+async def test_storage_layout_migration(setup_module):
+    """
+    Тест переноса файлов из плоского каталога в раскладку по подкаталогам.
+
+    Этот тест проверяет:
+    1. Что файл переезжает по пути storage_path и старый путь удаляется.
+    2. Что path переписывается у всех записей, ссылающихся на файл.
+    3. Что файлы, уже лежащие по нужному пути, не трогаются.
+    """
+    uid = upload("sharded.txt")
+    sharded_path = get_record(uid).path
+
+    old_path = os.path.join(LOCAL_STORAGE_PATH, "0f1e2d3c_legacy.txt")
+    os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
+    with open(old_path, "wb") as f:
+        f.write(b"legacy content")
+
+    db = TestingSessionLocal()
+    for legacy_uid in ("legacy-1", "legacy-2"):
+        db.add(FileMetadata(uid=legacy_uid, original_name="legacy.txt", size=14, path=old_path))
+    db.commit()
+    db.close()
+
+    stats = tasks.migrate_storage_layout(batch_size=1)
+
+    new_path = storage_path("0f1e2d3c_legacy.txt")
+    assert stats["moved"] == 1
+    assert get_record("legacy-1").path == new_path
+    assert get_record("legacy-2").path == new_path
+    assert get_record(uid).path == sharded_path
+    assert not os.path.exists(old_path)
+    with open(new_path, "rb") as f:
+        assert f.read() == b"legacy content"
+
+
+@pytest.fixture
+def cleanup_env(monkeypatch, tmp_path):
+    """
+    Фикстура для очистки: облако на moto, без возрастного порога и с пачками по одному файлу.
+    """
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="cleanup-bucket")
+        monkeypatch.setattr(cloud_storage, "s3_client", s3)
+        monkeypatch.setattr(cloud_storage, "YANDEX_CLOUD_BUCKET_NAME", "cleanup-bucket")
+        monkeypatch.setattr(tasks, "CLEANUP_MIN_AGE_SECONDS", -60)
+        monkeypatch.setattr(tasks, "CLEANUP_BATCH_SIZE", 1)
+        monkeypatch.setattr(tasks, "CLEANUP_CHECKPOINT_PATH", str(tmp_path / "checkpoint.json"))
+        yield s3
+
+
+async def test_clean_unused_files(setup_module, cleanup_env):
+    """
+    Тест очистки неиспользуемых файлов.
+
+    Этот тест проверяет:
+    1. Что в режиме dry-run файлы только считаются.
+    2. Что удаляются локальные файлы и файлы в облаке без записей в базе.
+    3. Что файлы и производные, на которые ссылаются записи, остаются, даже
+       если их storage_url построен для другого адреса хранилища.
+    """
+    s3 = cleanup_env
+    uid = upload("kept.txt")
+    file_record = get_record(uid)
+    kept_path = file_record.path
+    kept_key = os.path.basename(kept_path)
+    derivative_key_ = derivative_key(derivative_path(file_record.sha256, "thumbnail", 64))
+
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.uid == uid).update(
+        {FileMetadata.storage_url: f"https://old-endpoint.example/old-bucket/{kept_key}"}
+    )
+    db.add(Derivative(
+        source=file_record.sha256, kind="thumbnail", width=64,
+        path=derivative_path(file_record.sha256, "thumbnail", 64),
+        storage_url=f"https://old-endpoint.example/old-bucket/{derivative_key_}"
+    ))
+    db.commit()
+    db.close()
+
+    orphan_path = storage_path("ffff0000orphan")
+    os.makedirs(os.path.dirname(orphan_path), exist_ok=True)
+    with open(orphan_path, "wb") as f:
+        f.write(b"orphan")
+    s3.put_object(Bucket="cleanup-bucket", Key=kept_key, Body=b"kept")
+    s3.put_object(Bucket="cleanup-bucket", Key="orphan-key", Body=b"orphan")
+    s3.put_object(Bucket="cleanup-bucket", Key=derivative_key_, Body=b"thumbnail")
+    s3.put_object(Bucket="cleanup-bucket", Key="derivatives/orphan-thumbnail-64.webp", Body=b"orphan")
+
+    stats = tasks.clean_unused_files(dry_run=True)
+    assert stats["local_deleted"] >= 1
+    assert stats["cloud_deleted"] == 2
+    assert os.path.exists(orphan_path)
+
+    stats = tasks.clean_unused_files()
+    assert stats["local_deleted"] >= 1
+    assert stats["cloud_scanned"] == 4
+    assert stats["cloud_deleted"] == 2
+    assert not os.path.exists(orphan_path)
+    assert os.path.exists(kept_path)
+    keys = [obj["Key"] for obj in s3.list_objects_v2(Bucket="cleanup-bucket")["Contents"]]
+    assert sorted(keys) == sorted([kept_key, derivative_key_])
+    assert not os.path.exists(tasks.CLEANUP_CHECKPOINT_PATH)
+
+
+async def test_clean_unused_files_resumes_from_checkpoint(setup_module, cleanup_env):
+    """
+    Тест продолжения очистки с контрольной точки: пройденная фаза не повторяется.
+    """
+    orphan_path = storage_path("eeee0000orphan")
+    os.makedirs(os.path.dirname(orphan_path), exist_ok=True)
+    with open(orphan_path, "wb") as f:
+        f.write(b"orphan")
+    tasks.save_cleanup_checkpoint("cloud", None)
+
+    stats = tasks.clean_unused_files()
+
+    assert stats["local_scanned"] == 0
+    assert os.path.exists(orphan_path)
+
+    stats = tasks.clean_unused_files()
+    assert stats["local_deleted"] >= 1
+    assert not os.path.exists(orphan_path)
+
+
+async def test_local_copies_are_evicted_over_quota_and_rehydrated(setup_module, cleanup_env):
+    """
+    Тест вытеснения локальных копий по квоте.
+
+    Этот тест проверяет:
+    1. Что вытесняется давно не скачанный файл, уже загруженный в облако.
+    2. Что файл без копии в облаке остаётся на диске.
+    3. Что скачивание вытесненного файла возвращает его на диск из облака.
+    """
+    s3 = cleanup_env
+    old_uid = upload("cold.txt", b"cold" * 256)
+    new_uid = upload("hot.txt", b"hot!" * 256)
+    pending_uid = upload("pending.txt", b"wait" * 256)
+
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.is_local.is_(True)).update({FileMetadata.is_local: False})
+    for uid, accessed_at in ((old_uid, datetime(2000, 1, 1)), (new_uid, datetime.utcnow())):
+        file_record = db.query(FileMetadata).filter(FileMetadata.uid == uid).first()
+        key = os.path.basename(file_record.path)
+        s3.upload_file(file_record.path, "cleanup-bucket", key)
+        file_record.storage_url = cloud_storage.cloud_url(key)
+        file_record.upload_state = UploadState.DONE
+        file_record.last_accessed_at = accessed_at
+        file_record.is_local = True
+    db.query(FileMetadata).filter(FileMetadata.uid == pending_uid).update({FileMetadata.is_local: True})
+    db.commit()
+    db.close()
+
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(tasks, "LOCAL_STORAGE_QUOTA_BYTES", 2500)
+    monkeypatch.setattr(tasks, "LOCAL_STORAGE_LOW_WATERMARK", 0.9)
+    try:
+        stats = tasks.evict_local_copies()
+    finally:
+        monkeypatch.undo()
+
+    assert stats == {"usage": 3072, "evicted": 1, "freed": 1024}
+    cold = get_record(old_uid)
+    assert not cold.is_local
+    assert not os.path.exists(cold.path)
+    assert get_record(new_uid).is_local
+    assert os.path.exists(get_record(pending_uid).path)
+
+    response = client.get(f"/files/{old_uid}/download", follow_redirects=False)
+    assert response.status_code == 200
+    assert response.content == b"cold" * 256
+    assert get_record(old_uid).is_local
+    assert os.path.exists(cold.path)
+
+
+async def test_scrub_detects_and_repairs_corrupted_copies(setup_module, cleanup_env):
+    """
+    Тест проверки целостности копий.
+
+    Этот тест проверяет:
+    1. Что испорченная локальная копия удаляется, если целая есть в облаке.
+    2. Что испорченная облачная копия ставится на повторную загрузку.
+    3. Что целые копии только отмечаются проверенными.
+    """
+    s3 = cleanup_env
+    uids = {name: upload(f"{name}.txt", f"scrub {name}".encode()) for name in ("intact", "local", "cloud")}
+
+    db = TestingSessionLocal()
+    for uid in uids.values():
+        file_record = db.query(FileMetadata).filter(FileMetadata.uid == uid).first()
+        key = os.path.basename(file_record.path)
+        cloud_storage.upload_file_to_cloud(file_record.path, key, md5=file_record.md5)
+        file_record.storage_url = cloud_storage.cloud_url(key)
+        file_record.upload_state = UploadState.DONE
+    db.commit()
+    db.close()
+
+    with open(get_record(uids["local"]).path, "wb") as f:
+        f.write(b"scrub LOCAL")
+    s3.put_object(Bucket="cleanup-bucket", Key=get_record(uids["cloud"]).sha256, Body=b"scrub CLOUD")
+
+    tasks.scrub_files(batch_size=1000)
+
+    intact = get_record(uids["intact"])
+    assert intact.verified_at is not None
+    assert intact.is_local and intact.upload_state == UploadState.DONE
+
+    local = get_record(uids["local"])
+    assert not local.is_local
+    assert not os.path.exists(local.path)
+
+    cloud = get_record(uids["cloud"])
+    assert cloud.upload_state == UploadState.PENDING
+    assert os.path.exists(cloud.path)
+
+
+async def test_requeued_blob_is_not_evicted_or_read_from_cloud(setup_module, cleanup_env, monkeypatch):
+    """
+    Тест блоба, облачная копия которого не прошла проверку.
+
+    Этот тест проверяет:
+    1. Что при постановке на повторную загрузку сбрасывается storage_url.
+    2. Что вытеснение по квоте не удаляет единственную целую локальную копию.
+    3. Что испорченная облачная копия не возвращается на диск при скачивании.
+    """
+    s3 = cleanup_env
+    uid = upload("requeued.txt", b"requeued" * 128)
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.is_local.is_(True)).update({FileMetadata.is_local: False})
+    file_record = db.query(FileMetadata).filter(FileMetadata.uid == uid).first()
+    key = os.path.basename(file_record.path)
+    cloud_storage.upload_file_to_cloud(file_record.path, key, md5=file_record.md5)
+    file_record.storage_url = cloud_storage.cloud_url(key)
+    file_record.upload_state = UploadState.DONE
+    file_record.is_local = True
+    db.commit()
+    db.close()
+    s3.put_object(Bucket="cleanup-bucket", Key=key, Body=b"corrupted" * 128)
+
+    tasks.scrub_files(batch_size=1000)
+    file_record = get_record(uid)
+    assert file_record.upload_state == UploadState.PENDING
+    assert file_record.storage_url is None
+
+    monkeypatch.setattr(tasks, "LOCAL_STORAGE_QUOTA_BYTES", 512)
+    stats = tasks.evict_local_copies()
+    assert stats["evicted"] == 0
+    assert os.path.exists(file_record.path)
+
+    # Запись из прошлых версий, оставшаяся в done со ссылкой на испорченную копию.
+    db = TestingSessionLocal()
+    db.query(FileMetadata).filter(FileMetadata.uid == uid).update({
+        FileMetadata.storage_url: cloud_storage.cloud_url(key),
+        FileMetadata.upload_state: UploadState.DONE,
+    })
+    db.commit()
+    db.close()
+    await metadata_cache.invalidate(uid)
+    os.remove(file_record.path)
+
+    response = client.get(f"/files/{uid}/download", follow_redirects=False)
+    assert response.status_code == 502
+    assert not os.path.exists(file_record.path)
+
+
+async def test_media_info_is_extracted(setup_module, monkeypatch):
+    """
+    Тест извлечения свойств медиа в пуле процессов.
+
+    Этот тест проверяет:
+    1. Что MIME-тип определяется по содержимому, а не по заявленному типу.
+    2. Что размеры изображения видны в метаданных без скачивания файла.
+    3. Что повторное содержимое не разбирается второй раз.
+    """
+    from tests.test_media import png
+
+    monkeypatch.setattr(tasks, "MEDIA_WORKERS", 1)
+    extracted = []
+    original = tasks.extract_media_info
+    monkeypatch.setattr(tasks, "extract_media_info", lambda *args: extracted.append(args) or original(*args))
+
+    image = client.post("/files/upload", files={"file": ("photo.bin", png(64, 32), "application/octet-stream")})
+    image_uid = image.json()["uid"]
+    duplicate_uid = client.post("/files/upload", files={"file": ("copy.png", png(64, 32), "image/png")}).json()["uid"]
+
+    assert client.get(f"/files/{image_uid}/metadata").json()["media_state"] == "pending"
+
+    tasks.media_executor = None
+    while jobs := tasks.claim_media_jobs(100):
+        await tasks.process_media_jobs(jobs)
+    image_path = storage_path(hashlib.sha256(png(64, 32)).hexdigest())
+    assert [args[0] for args in extracted].count(image_path) == 1
+
+    for uid in (image_uid, duplicate_uid):
+        data = client.get(f"/files/{uid}/metadata").json()
+        assert data["media_state"] == "done"
+        assert data["detected_type"] == "image/png"
+        assert data["media"] == {"width": 64, "height": 32}
+
+    # Тот же разбор в отдельном процессе пула.
+    monkeypatch.setattr(tasks, "extract_media_info", original)
+    tasks.restart_media_executor()
+    try:
+        uid = client.post("/files/upload", files={"file": ("other.png", png(10, 20))}).json()["uid"]
+        await tasks.process_media_jobs(tasks.claim_media_jobs(100))
+    finally:
+        await tasks.stop_media_workers([])
+    assert client.get(f"/files/{uid}/metadata").json()["media"] == {"width": 10, "height": 20}
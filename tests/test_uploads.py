@@ -0,0 +1,114 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import tasks
+from app.database import Base
+from app.models import UploadSession
+from app.routers.uploads import partial_path
+from tests.test_files import client, engine, TestingSessionLocal
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def setup_module():
+    """
+    Фикстура для настройки и очистки базы данных.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_upload(length: int, filename: str = "resumable.bin") -> str:
+    response = client.post("/files/uploads", params={"filename": filename}, headers={"Upload-Length": str(length)})
+    assert response.status_code == 201
+    assert response.headers["location"].endswith(response.json()["upload_id"])
+    return response.json()["upload_id"]
+
+
+def patch_chunk(upload_id: str, offset: int, chunk: bytes):
+    return client.patch(
+        f"/files/uploads/{upload_id}",
+        content=chunk,
+        headers={"Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"}
+    )
+
+
+async def test_resumable_upload(setup_module):
+    """
+    Тест возобновляемой загрузки.
+
+    Этот тест проверяет:
+    1. Что HEAD возвращает число принятых байтов.
+    2. Что фрагмент с неверным смещением отклоняется.
+    3. Что после последнего фрагмента появляется файл с uid сессии, а сессия удаляется.
+    """
+    content = os.urandom(3000)
+    upload_id = create_upload(len(content))
+
+    response = patch_chunk(upload_id, 0, content[:1000])
+    assert response.status_code == 204
+    assert response.headers["upload-offset"] == "1000"
+
+    response = client.head(f"/files/uploads/{upload_id}")
+    assert response.headers["upload-offset"] == "1000"
+    assert response.headers["upload-length"] == "3000"
+
+    response = patch_chunk(upload_id, 500, content[500:1500])
+    assert response.status_code == 409
+    assert response.headers["upload-offset"] == "1000"
+
+    response = patch_chunk(upload_id, 1000, content[1000:])
+    assert response.status_code == 200
+    data = response.json()
+    assert data["uid"] == upload_id
+    assert data["sha256"] == hashlib.sha256(content).hexdigest()
+
+    assert client.get(f"/files/{upload_id}/download").content == content
+    assert client.head(f"/files/uploads/{upload_id}").status_code == 404
+    assert not os.path.exists(partial_path(upload_id))
+
+
+async def test_resumable_upload_rejects_bad_chunks(setup_module):
+    """
+    Тест отклонения фрагмента без нужного Content-Type и фрагмента длиннее объявленного размера.
+    """
+    upload_id = create_upload(10)
+
+    response = client.patch(
+        f"/files/uploads/{upload_id}", content=b"12345", headers={"Upload-Offset": "0"}
+    )
+    assert response.status_code == 415
+
+    assert patch_chunk(upload_id, 0, b"x" * 11).status_code == 413
+    assert client.head(f"/files/uploads/{upload_id}").headers["upload-offset"] == "0"
+
+    assert client.delete(f"/files/uploads/{upload_id}").status_code == 204
+    assert not os.path.exists(partial_path(upload_id))
+
+
+async def test_stale_upload_sessions_expire(setup_module, monkeypatch):
+    """
+    Тест удаления брошенных сессий вместе с частичными файлами.
+    """
+    stale_id = create_upload(100)
+    fresh_id = create_upload(100)
+
+    db = TestingSessionLocal()
+    db.query(UploadSession).filter(UploadSession.uid == stale_id).update(
+        {UploadSession.updated_at: datetime.utcnow() - timedelta(days=30)}
+    )
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(tasks, "SessionLocal", TestingSessionLocal)
+    assert tasks.expire_upload_sessions() == 1
+
+    assert client.head(f"/files/uploads/{stale_id}").status_code == 404
+    assert not os.path.exists(partial_path(stale_id))
+    assert client.head(f"/files/uploads/{fresh_id}").status_code == 200